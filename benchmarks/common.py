@@ -0,0 +1,28 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Helpers shared by the benchmark scripts
+
+
+######################################################
+######################################################
+
+
+def getProcessError(Proc):
+  # last line of the error output, or the exit status when the process died without any (e.g. killed when out of memory)
+  Lines = Proc.stderr.decode(errors='replace').strip().splitlines()
+  if Lines:
+    return Lines[-1]
+  if Proc.returncode < 0:
+    return "killed by signal {}".format(-Proc.returncode)
+  return "exit code {}".format(Proc.returncode)
@@ -0,0 +1,189 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Measures the time and memory of each pipeline stage on synthetic datasets of increasing sizes.
+# Every size is processed in a separate process so that peak memory values are not shared.
+# Run from the root of the sources tree: python3 benchmarks/stages.py [-s 1000 10000 ...] [-o RESULTSDIR]
+
+
+import argparse
+import contextlib
+import csv
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import getProcessError
+
+
+######################################################
+######################################################
+
+
+DefaultSizes = [1000,10000,100000,1000000]
+
+
+######################################################
+######################################################
+
+
+def getPeakRSS():
+  # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+  RSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin':
+    return RSS/1048576
+  return RSS/1024
+
+
+######################################################
+######################################################
+
+
+def runSize(Size,GUCount,Depth,WorkPath,TraceMemory):
+  from boogiescape import BoogieScape, Synthetic
+
+  InputPath = os.path.join(WorkPath,"input")
+  OutputPath = os.path.join(WorkPath,"output")
+
+  Results = list()
+
+  Start = time.perf_counter()
+  Synthetic.generateZone(InputPath,Size,GUCount,Depth)
+  Results.append({ 'size' : Size, 'stage' : 'generate', 'seconds' : time.perf_counter()-Start,
+                   'python_peak_mb' : None, 'rss_peak_mb' : getPeakRSS() })
+
+  BS = BoogieScape.BoogieScape(InputPath,OutputPath,{ 'overwrite' : True, 'export_graph_view' : False })
+
+  if TraceMemory:
+    tracemalloc.start()
+
+  # stages of the pipeline for the benchmark options
+  with open(os.devnull,'w') as DevNull, contextlib.redirect_stdout(DevNull):
+    for Name,Stage in BS._getStages():
+      if TraceMemory:
+        tracemalloc.reset_peak()
+      Start = time.perf_counter()
+      Stage()
+      Seconds = time.perf_counter()-Start
+      Results.append({ 'size' : Size, 'stage' : Name, 'seconds' : Seconds,
+                       'python_peak_mb' : tracemalloc.get_traced_memory()[1]/1048576 if TraceMemory else None,
+                       'rss_peak_mb' : getPeakRSS() })
+
+  return Results
+
+
+######################################################
+######################################################
+
+
+def getScalingExponent(Points):
+  # slope of the log-log least squares fit, 1.0 being a linear scaling
+  Points = [(math.log(X),math.log(Y)) for X,Y in Points if Y > 0]
+  if len(Points) < 2:
+    return None
+  MeanX = sum(P[0] for P in Points)/len(Points)
+  MeanY = sum(P[1] for P in Points)/len(Points)
+  Den = sum((P[0]-MeanX)**2 for P in Points)
+  if not Den:
+    return None
+  return sum((P[0]-MeanX)*(P[1]-MeanY) for P in Points)/Den
+
+
+######################################################
+######################################################
+
+
+def writeResults(Results,ResultsPath):
+  os.makedirs(ResultsPath,exist_ok=True)
+
+  Curves = dict()
+  for Stage in dict.fromkeys(R['stage'] for R in Results):
+    Points = [(R['size'],R['seconds']) for R in Results if R['stage'] == Stage]
+    Curves[Stage] = { 'points' : Points, 'exponent' : getScalingExponent(Points) }
+
+  with open(os.path.join(ResultsPath,"stages.json"),'w') as File:
+    json.dump({ 'python' : sys.version, 'results' : Results, 'curves' : Curves },File,indent=2)
+
+  with open(os.path.join(ResultsPath,"stages.csv"),'w',newline='') as File:
+    Writer = csv.DictWriter(File,fieldnames=['size','stage','seconds','python_peak_mb','rss_peak_mb'])
+    Writer.writeheader()
+    Writer.writerows(Results)
+
+  return Curves
+
+
+######################################################
+######################################################
+
+
+def main():
+  Parser = argparse.ArgumentParser(description="Pipeline stages benchmark")
+  Parser.add_argument('-s','--sizes',type=int,nargs='+',default=DefaultSizes,help='Numbers of SU of the datasets')
+  Parser.add_argument('--su-per-gu',type=int,default=1000,help='Number of SU per GU catchment')
+  Parser.add_argument('--depth',type=int,default=20,help='Number of SU rows in flow chains')
+  Parser.add_argument('--tracemalloc',action='store_true',help='Trace Python allocations peaks (slows down stages)')
+  Parser.add_argument('-o','--results',type=str,default='benchmark-results',help='Results directory')
+  Parser.add_argument('--single',type=str,default=None,help=argparse.SUPPRESS)
+  Args = Parser.parse_args()
+
+  # child process: one size in the given work directory
+  if Args.single:
+    Size = Args.sizes[0]
+    Results = runSize(Size,max(1,Size//Args.su_per_gu),Args.depth,Args.single,Args.tracemalloc)
+    json.dump(Results,sys.stdout)
+    return
+
+  Env = dict(os.environ)
+  Env['PYTHONPATH'] = os.pathsep.join(filter(None,[os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                   Env.get('PYTHONPATH')]))
+
+  Results = list()
+
+  for Size in Args.sizes:
+    with tempfile.TemporaryDirectory() as WorkPath:
+      Command = [sys.executable,os.path.abspath(__file__),'--single',WorkPath,'--sizes',str(Size),
+                 '--su-per-gu',str(Args.su_per_gu),'--depth',str(Args.depth)]
+      if Args.tracemalloc:
+        Command.append('--tracemalloc')
+      Proc = subprocess.run(Command,env=Env,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+
+    if Proc.returncode:
+      print("{:>9} units  failed ({})".format(Size,getProcessError(Proc)))
+      continue
+
+    for Result in json.loads(Proc.stdout.decode()):
+      Results.append(Result)
+      print("{:>9} units  {:18} {:9.3f}s  RSS peak {:8.1f} MB{}".format(Result['size'],Result['stage'],Result['seconds'],
+            Result['rss_peak_mb'],
+            "  Python peak {:8.1f} MB".format(Result['python_peak_mb']) if Result['python_peak_mb'] is not None else ""))
+
+  Curves = writeResults(Results,Args.results)
+
+  print()
+  for Stage,Curve in Curves.items():
+    if Curve['exponent'] is not None:
+      print("{:18} time ~ size^{:.2f}".format(Stage,Curve['exponent']))
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  main()
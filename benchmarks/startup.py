@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Measures the import time of the core pipeline, with and without the graph view stack.
+# Run from the root of the sources tree: python3 benchmarks/startup.py [-n RUNS]
+
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import getProcessError
+
+
+######################################################
+######################################################
+
+
+HeavyModules = ['matplotlib','pygraphviz','pydot']
+
+CheckCode = """
+import sys
+import boogiescape.BoogieScape
+Loaded = [M for M in {} if M in sys.modules]
+if Loaded:
+  sys.exit('heavy modules loaded by core pipeline: ' + ', '.join(Loaded))
+""".format(HeavyModules)
+
+Cases = [("core pipeline","import boogiescape.BoogieScape"),
+         ("core pipeline + graph view","import boogiescape.BoogieScape, boogiescape.GraphView")]
+
+
+######################################################
+######################################################
+
+
+def timeImport(Code,Runs,Env):
+  Times = list()
+  for i in range(Runs):
+    Start = time.perf_counter()
+    Proc = subprocess.run([sys.executable,'-c',Code],env=Env,stdout=subprocess.DEVNULL,stderr=subprocess.PIPE)
+    Times.append(time.perf_counter()-Start)
+    if Proc.returncode:
+      return None,getProcessError(Proc)
+
+  return Times,None
+
+
+######################################################
+######################################################
+
+
+def main():
+  Parser = argparse.ArgumentParser(description="Startup time benchmark")
+  Parser.add_argument('-n','--runs',type=int,default=10,help='Number of runs per case')
+  Args = Parser.parse_args()
+
+  Env = dict(os.environ)
+  Env['PYTHONPATH'] = os.pathsep.join(filter(None,[os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                   Env.get('PYTHONPATH')]))
+
+  Proc = subprocess.run([sys.executable,'-c',CheckCode],env=Env)
+  if Proc.returncode:
+    sys.exit(Proc.returncode)
+
+  for Name,Code in Cases:
+    Times,Error = timeImport(Code,Args.runs,Env)
+    if Times is None:
+      print("{:30} unavailable ({})".format(Name,Error))
+    else:
+      print("{:30} median {:.3f}s  min {:.3f}s  ({} runs)".format(Name,statistics.median(Times),min(Times),len(Times)))
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,226 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import os
+import sys
+import time
+import traceback
+
+from . import BoogieScape
+from .__main__ import addPipelineArguments
+
+
+######################################################
+######################################################
+
+
+ZoneInputFiles = ['RS.shp','SU.shp','RE.shp']
+
+
+######################################################
+######################################################
+
+
+def findZones(RootPath):
+  # every subdirectory containing the RS, SU and RE input files is a zone
+  Zones = list()
+  for Name in sorted(os.listdir(RootPath)):
+    ZonePath = os.path.join(RootPath,Name)
+    if os.path.isdir(ZonePath) and all(os.path.isfile(os.path.join(ZonePath,F)) for F in ZoneInputFiles):
+      Zones.append((Name,ZonePath,None))
+  return Zones
+
+
+######################################################
+######################################################
+
+
+def readManifest(FilePath):
+  # one zone per line: input path and optional output path, relative to the manifest location.
+  # Zones are named after their input directory, with a numeric suffix for names already used.
+  Zones = list()
+  Names = set()
+  BaseDir = os.path.dirname(os.path.abspath(FilePath))
+
+  with open(FilePath) as File:
+    for Line in File:
+      Line = Line.strip()
+      if not Line or Line.startswith('#'):
+        continue
+
+      Items = Line.split()
+      InputPath = os.path.join(BaseDir,Items[0])
+      OutputPath = None
+      if len(Items) > 1:
+        OutputPath = os.path.join(BaseDir,Items[1])
+
+      BaseName = os.path.basename(os.path.normpath(InputPath))
+      Name = BaseName
+      Suffix = 2
+      while Name in Names:
+        Name = "{}-{}".format(BaseName,Suffix)
+        Suffix += 1
+      Names.add(Name)
+
+      Zones.append((Name,InputPath,OutputPath))
+
+  return Zones
+
+
+######################################################
+######################################################
+
+
+def runZone(Name,InputPath,OutputPath,ExtraArgs,LogPath):
+  Result = { 'zone' : Name, 'input' : InputPath, 'output' : OutputPath, 'log' : LogPath,
+             'status' : 'ok', 'error' : None }
+
+  Start = time.perf_counter()
+
+  with open(LogPath,'w') as Log, contextlib.redirect_stdout(Log):
+    try:
+      BS = BoogieScape.BoogieScape(InputPath,OutputPath,ExtraArgs)
+      BS.run()
+    except BoogieScape.BoogieScapeError as E:
+      Result['status'] = 'failed'
+      Result['error'] = str(E)
+    except Exception as E:
+      Result['status'] = 'failed'
+      Result['error'] = "{}: {}".format(type(E).__name__,E)
+      traceback.print_exc(file=Log)
+
+  Result['duration'] = time.perf_counter()-Start
+
+  return Result
+
+
+######################################################
+######################################################
+
+
+def runBatch(Zones,OutputRoot,ExtraArgs,Workers=1):
+  # a worker process which dies (crash, killed when out of memory, ...) breaks the pool and all its pending zones:
+  # the zones which had started (their log being created) are failed, the others are run again in a new pool
+  os.makedirs(OutputRoot,exist_ok=True)
+
+  Jobs = list()
+  for Name,InputPath,OutputPath in Zones:
+    if OutputPath is None:
+      OutputPath = os.path.join(OutputRoot,Name)
+    LogPath = os.path.join(OutputRoot,Name+".log")
+    if os.path.exists(LogPath):
+      os.remove(LogPath)
+    Jobs.append((Name,InputPath,OutputPath,ExtraArgs,LogPath))
+
+  Results = [None]*len(Jobs)
+  Pending = list(range(len(Jobs)))
+
+  while Pending:
+    NotStarted = list()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Executor:
+      Futures = [Executor.submit(runZone,*Jobs[i]) for i in Pending]
+
+      for i,Future in zip(Pending,Futures):
+        Job = Jobs[i]
+        try:
+          Result = Future.result()
+        except Exception as E:
+          if isinstance(E,concurrent.futures.BrokenExecutor) and not os.path.exists(Job[4]):
+            NotStarted.append(i)
+            continue
+          # the worker process itself failed (crash, killed, ...)
+          Result = { 'zone' : Job[0], 'input' : Job[1], 'output' : Job[2], 'log' : Job[4],
+                     'status' : 'failed', 'error' : "{}: {}".format(type(E).__name__,E), 'duration' : None }
+
+        print("-- Zone {}... {}".format(Result['zone'],Result['status'] if Result['error'] is None else
+                                                    "{} ({})".format(Result['status'],Result['error'])))
+        Results[i] = Result
+
+    # zones never starting in a new pool are failed too
+    if NotStarted == Pending:
+      for i in NotStarted:
+        Job = Jobs[i]
+        Results[i] = { 'zone' : Job[0], 'input' : Job[1], 'output' : Job[2], 'log' : Job[4],
+                       'status' : 'failed', 'error' : "worker processes failed before running the zone", 'duration' : None }
+        print("-- Zone {}... failed ({})".format(Job[0],Results[i]['error']))
+      NotStarted = list()
+
+    Pending = NotStarted
+
+  return Results
+
+
+######################################################
+######################################################
+
+
+def writeReport(Results,FilePath,Duration=None):
+  Report = { 'zones' : len(Results),
+             'succeeded' : len([R for R in Results if R['status'] == 'ok']),
+             'failed' : len([R for R in Results if R['status'] != 'ok']),
+             'duration' : Duration,
+             'results' : Results }
+
+  with open(FilePath,'w') as File:
+    json.dump(Report,File,indent=2)
+
+  return Report
+
+
+######################################################
+######################################################
+
+
+def main():
+
+  Parser = argparse.ArgumentParser(description="Batch processing of multiple zones with BoogieScape")
+
+  Parser.add_argument('ZONES',type=str,help='Root directory containing one subdirectory per zone, or manifest file')
+  Parser.add_argument('OUTPUTROOT',type=str,help='Root output path, also receiving the zones logs and the batch report')
+  Parser.add_argument('--workers',type=int,default=os.cpu_count(),metavar='N',help='Number of worker processes (default: number of CPUs)')
+  addPipelineArguments(Parser)
+
+  Args = vars(Parser.parse_args())
+
+  ZonesPath = Args.pop('ZONES')
+  OutputRoot = Args.pop('OUTPUTROOT')
+  Workers = max(1,Args.pop('workers') or 1)
+
+  if os.path.isdir(ZonesPath):
+    Zones = findZones(ZonesPath)
+  else:
+    Zones = readManifest(ZonesPath)
+
+  print("###### Processing {} zones with {} workers".format(len(Zones),Workers))
+
+  Start = time.perf_counter()
+  Results = runBatch(Zones,OutputRoot,Args,Workers)
+  Report = writeReport(Results,os.path.join(OutputRoot,"batch_report.json"),time.perf_counter()-Start)
+
+  print("###### {} succeeded, {} failed".format(Report['succeeded'],Report['failed']))
+
+  if Report['failed']:
+    sys.exit(1)
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  main()
@@ -11,36 +11,43 @@ __email__ = "jean-christophe.fabre@inra.fr"
 ######################################################
 
 
+import collections
+import concurrent.futures
+import contextlib
+import gzip
+import io
 import os
 import shutil
 import sys
+import threading
+import tracemalloc
 import networkx
-import matplotlib.pyplot as plt
+import numpy
 
 try:
     from osgeo import ogr, osr, gdal
 except:
     sys.exit('ERROR: cannot find GDAL/OGR modules')
 
-try:
-    import pygraphviz
-    from networkx.drawing.nx_agraph import graphviz_layout
-except ImportError:
-    try:
-        import pydot
-        from networkx.drawing.nx_pydot import graphviz_layout
-    except ImportError:
-        raise ImportError("Needs Graphviz and either PyGraphviz or pydot")
-
+from . import Cache
+from . import Connectivity
 from . import Data
+from . import FluidX
+from . import Geometry
+from . import Instrumentation
+from . import Topology
+from . import Validation
 
 
 ######################################################
 ######################################################
 
 
-def indentCRStr(Indent,Str):
-  return "{}{}\n".format("  "*Indent,Str)
+class BoogieScapeError(Exception):
+
+  def __init__(self,Text,Code=1):
+    Exception.__init__(self,Text)
+    self.Code = Code
 
 
 ######################################################
@@ -51,9 +58,20 @@ class BoogieScape():
 
   _SHPDriver = ogr.GetDriverByName('ESRI Shapefile')
   _GeoJSONDriver = ogr.GetDriverByName('GeoJSON')
+  _GPKGDriver = ogr.GetDriverByName('GPKG')
+  _FGBDriver = ogr.GetDriverByName('FlatGeobuf')
+
+  _OutputFormats = ['shp+geojson','gpkg','fgb']
+
+  _GraphViewFormats = ['pdf','dot','graphml','edgelist']
+
+  _FieldsKinds = { ogr.OFTInteger: 'int', ogr.OFTInteger64: 'int', ogr.OFTReal: 'real', ogr.OFTString: 'str' }
 
   _ResourcesDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),"resources")
 
+  # progress lines are not printed by threads running in silent mode (concurrent loading)
+  _PrintState = threading.local()
+
   def __init__(self,inputPath,outputPath,extrArgs):
     self._inputPath = inputPath
     self._outputPath = outputPath
@@ -65,6 +83,21 @@ class BoogieScape():
     self._RSData = dict()
     self._SUData = dict()
 
+    self._Indexes = dict()
+
+    self._Cache = None
+    self._InputKeys = dict()
+    self._Inputs = dict()
+    self._ValidationReport = None
+    self._OutputCreated = False
+
+    self._Partitions = list()
+    self._StreamedCounts = dict()
+    self._StreamSources = dict()
+    self._StreamLayers = dict()
+
+    self._Instrumentation = Instrumentation.Instrumentation()
+
     self._APFileShp = 'AP.shp'
     self._APFileJson = 'AP.geojson'
     self._GUFileShp = 'GU.shp'
@@ -75,9 +108,12 @@ class BoogieScape():
     self._RSFileJson = 'RS.geojson'
     self._SUFileShp = 'SU.shp'
     self._SUFileJson = 'SU.geojson'
+    self._GPKGFile = 'outputs.gpkg'
 
     self._DomainFluidXFile = "domain.fluidx"
     self._DatastoreFluidXFile = "datastore.fluidx"
+    self._RunReportFile = "run_report.json"
+    self._ValidationFile = "validation.json"
 
     self._InputREFields = {'OFLD_ID': ogr.OFTInteger64, 'OFLD_PSORD': ogr.OFTInteger64,
                            'OFLD_TO': ogr.OFTString,
@@ -129,6 +165,40 @@ class BoogieScape():
   ######################################################
 
 
+  def getInstrumentation(self):
+    return self._Instrumentation
+
+
+  ######################################################
+
+
+  def _isQuiet(self):
+    # quiet mode suppresses the per-unit and per-field progress lines
+    return bool(self._extraArgs.get("quiet"))
+
+
+  ######################################################
+
+
+  def _isPartitioned(self):
+    # partitioned mode loads the geometries and builds the GU of one partition at a time
+    return bool(self._extraArgs.get("partitioned"))
+
+
+  ######################################################
+
+
+  def setInput(self,UnitsClass,Input):
+    # RS, SU or RE input given as an OGR data source or layer, or as units data (copied before the stages),
+    # instead of the shapefile of the input directory
+    if UnitsClass not in ["RS","SU","RE"]:
+      raise ValueError("{} is not an input units class".format(UnitsClass))
+    self._Inputs[UnitsClass] = Input
+
+
+  ######################################################
+
+
   def getInputPath(self,relPath=None):
     if relPath:
       return os.path.join(self._inputPath,relPath)
@@ -149,9 +219,18 @@ class BoogieScape():
   ######################################################
 
 
+  @staticmethod
+  def _isSilent():
+    return getattr(BoogieScape._PrintState,"Silent",False)
+
+
+  ######################################################
+
+
   @staticmethod
   def _printStage(Text):
-    print("######",Text)
+    if not BoogieScape._isSilent():
+      print("######",Text)
 
 
   ######################################################
@@ -159,7 +238,8 @@ class BoogieScape():
 
   @staticmethod
   def _printActionStarted(Text):
-    print("--",Text+"... ",end='')
+    if not BoogieScape._isSilent():
+      print("--",Text+"... ",end='')
 
 
   ######################################################
@@ -167,7 +247,8 @@ class BoogieScape():
 
   @staticmethod
   def _printActionDone(Text="Done"):
-    print(Text)
+    if not BoogieScape._isSilent():
+      print(Text)
 
 
   ######################################################
@@ -175,33 +256,39 @@ class BoogieScape():
 
   @staticmethod
   def _printActionFailed(Text="Failed",Fatal=1):
-    print(Text)
+    if not BoogieScape._isSilent():
+      print(Text)
 
     if Fatal:
-      sys.exit(Fatal)
+      raise BoogieScapeError(Text,Fatal)
 
 
   ######################################################
 
 
   @staticmethod
-  def _checkLayerFieldsTypes(DataSource,ExpectedFields):
+  def _checkLayerFieldsTypes(Layer,ExpectedFields,Verbose=True):
     FoundFields = dict()
     
-    LayerDefn = DataSource.GetLayer().GetLayerDefn()
+    LayerDefn = Layer.GetLayerDefn()
 
     for i in range(LayerDefn.GetFieldCount()):
       FoundFields[LayerDefn.GetFieldDefn(i).GetName()] = LayerDefn.GetFieldDefn(i).GetType()
 
     for k,v in ExpectedFields.items():
-      BoogieScape._printActionStarted("Checking field {}".format(k))
-      if k in FoundFields:
-        if FoundFields[k] == ExpectedFields[k]:
+      if Verbose:
+        BoogieScape._printActionStarted("Checking field {}".format(k))
+      if k in FoundFields and FoundFields[k] == ExpectedFields[k]:
+        if Verbose:
           BoogieScape._printActionDone()
-        else:
-          BoogieScape._printActionFailed("Failed (wrong type : {} expected, {} found)".format(ExpectedFields[k],FoundFields[k]))
+        continue
+
+      if not Verbose:
+        BoogieScape._printActionStarted("Checking field {}".format(k))
+      if k in FoundFields:
+        BoogieScape._printActionFailed("Failed (wrong type for {} : {} expected, {} found)".format(k,ExpectedFields[k],FoundFields[k]))
       else:
-        BoogieScape._printActionFailed("Failed (not found)")
+        BoogieScape._printActionFailed("Failed ({} not found)".format(k))
 
 
   ######################################################
@@ -233,7 +320,90 @@ class BoogieScape():
 
 
   @staticmethod
-  def _loadShapefile(FilePath,ExpectedFields,UnitsClass):
+  def splitUnitsStrColumn(StrList):
+    # relations strings of all units of a class, identical strings being parsed once
+    Parsed = dict()
+    Ret = list()
+    for Str in StrList:
+      if not Str:
+        Ret.append(None)
+        continue
+      Links = Parsed.get(Str)
+      if Links is None:
+        Links = BoogieScape.splitUnitsStrList(Str)
+        Parsed[Str] = Links
+      Ret.append(Links)
+
+    return Ret
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _readLayerFeatures(Layer,ExpectedFields,WithGeometries=True):
+    # reads the fields values and geometries feature by feature
+    Values = { Field : list() for Field in ExpectedFields }
+    Geometries = list()
+
+    for Feature in Layer:
+      # geometries are kept as WKB, built only by the stages using them
+      Geom = Feature.GetGeometryRef() if WithGeometries else None
+      Geometries.append(bytes(Geom.ExportToWkb()) if Geom is not None else None)
+      for Field in ExpectedFields:
+        Values[Field].append(Feature.GetField(Field))
+
+    return Values,Geometries
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _readLayerBatches(Layer,ExpectedFields,WithGeometries=True):
+    # reads the fields values and geometries by record batches through the Arrow stream API (GDAL >= 3.6),
+    # returns None if not available so that features are read one by one
+    if not hasattr(Layer,"GetArrowStreamAsNumPy"):
+      return None
+
+    Batches = { Field : list() for Field in ExpectedFields }
+    Geometries = list()
+
+    try:
+      Stream = Layer.GetArrowStreamAsNumPy(options=["USE_MASKED_ARRAYS=YES","INCLUDE_FID=NO",
+                                                    "GEOMETRY_NAME=wkb_geometry"])
+      for Batch in Stream:
+        for Field in ExpectedFields:
+          Batches[Field].append(Batch[Field])
+        if WithGeometries:
+          Geometries.extend(bytes(Geom) if Geom is not None else None for Geom in Batch["wkb_geometry"])
+        else:
+          Geometries.extend([None]*len(Batch[next(iter(ExpectedFields))]))
+    except Exception:
+      Layer.ResetReading()
+      return None
+
+    if not Geometries:
+      Layer.ResetReading()
+      return None
+
+    Values = dict()
+    for Field,Type in ExpectedFields.items():
+      if BoogieScape._FieldsKinds.get(Type) in ['int','real']:
+        Values[Field] = numpy.ma.concatenate(Batches[Field])
+      else:
+        Values[Field] = list()
+        for Array in Batches[Field]:
+          Values[Field].extend(V.decode('utf-8') if isinstance(V,bytes) else V for V in Array.tolist())
+
+    return Values,Geometries
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _loadShapefile(FilePath,ExpectedFields,UnitsClass,Verbose=True,WithGeometries=True):
 
     BoogieScape._printActionStarted("Opening input {} file".format(UnitsClass))
     Source = BoogieScape._SHPDriver.Open(FilePath, 0) # 0 means read-only. 1 means writeable.
@@ -242,39 +412,50 @@ class BoogieScape():
     else:
       BoogieScape._printActionDone()
 
-    BoogieScape._checkLayerFieldsTypes(Source,ExpectedFields)
+    return BoogieScape._loadLayer(Source.GetLayer(0),ExpectedFields,UnitsClass,Verbose,WithGeometries)
 
-    BoogieScape._printActionStarted("Loading input {} file".format(UnitsClass))
 
-    UnitsData = dict()
+  ######################################################
+
 
-    Layer = Source.GetLayer(0)
+  @staticmethod
+  def _loadLayer(Layer,ExpectedFields,UnitsClass,Verbose=True,WithGeometries=True):
+
+    BoogieScape._checkLayerFieldsTypes(Layer,ExpectedFields,Verbose)
+
+    BoogieScape._printActionStarted("Loading input {} file".format(UnitsClass))
+
+    if not WithGeometries:
+      Layer.SetIgnoredFields(["OGR_GEOMETRY"])
     Layer.ResetReading()
 
-    for Feature in Layer:
-      Unit = Data.SpatialUnit()
-      Unit.Geometry = ogr.CreateGeometryFromWkb(Feature.GetGeometryRef().ExportToWkb())
-      
-      for Field,Type in ExpectedFields.items():
-        if Field == "OFLD_ID":
-          Unit.Id = Feature.GetField(Field)
-        elif Field == "OFLD_PSORD":
-          Unit.PcsOrd = Feature.GetField(Field)
-        elif Field == "OFLD_TO":
-          ToStrList = Feature.GetField(Field)
-          if ToStrList:
-            Unit.To =  BoogieScape.splitUnitsStrList(ToStrList)
-        elif Field == "OFLD_CHILD":
-          ChildStrList = Feature.GetField(Field)
-          if ChildStrList:
-            Unit.Child =  BoogieScape.splitUnitsStrList(ChildStrList)
-        else:
-          Unit.Attributes[Field] = Feature.GetField(Field)
+    Read = BoogieScape._readLayerBatches(Layer,ExpectedFields,WithGeometries)
+    if Read is None:
+      Read = BoogieScape._readLayerFeatures(Layer,ExpectedFields,WithGeometries)
+    Values,Geometries = Read
 
-      if Unit.Id is None:
-        BoogieScape._printActionFailed("Failed (empty OFLD_ID field)")
+    Count = len(Geometries)
 
-      UnitsData[Unit.Id] = Unit
+    Ids = Values.pop("OFLD_ID",[None]*Count)
+    if isinstance(Ids,numpy.ndarray):
+      Ids = Ids.tolist()
+    if None in Ids:
+      BoogieScape._printActionFailed("Failed (empty OFLD_ID field)")
+
+    PcsOrds = Values.pop("OFLD_PSORD",[None]*Count)
+
+    ToLists = None
+    if "OFLD_TO" in Values:
+      ToLists = BoogieScape.splitUnitsStrColumn(Values.pop("OFLD_TO"))
+    ChildLists = None
+    if "OFLD_CHILD" in Values:
+      ChildLists = BoogieScape.splitUnitsStrColumn(Values.pop("OFLD_CHILD"))
+
+    Kinds = dict()
+    for Field in Values:
+      Kinds[Field] = BoogieScape._FieldsKinds.get(ExpectedFields[Field])
+
+    UnitsData = Data.UnitsStore(UnitsClass,Ids,PcsOrds,Values,Kinds,ToLists,ChildLists,Geometries)
 
     BoogieScape._printActionDone()
 
@@ -285,16 +466,19 @@ class BoogieScape():
 
   
   @staticmethod
-  def _createGISfile(Driver,FilePath):
+  def _createGISfile(Driver,FilePath,Verbose=True):
 
-    BoogieScape._printActionStarted("Creating GIS file {}".format(os.path.basename(FilePath)))
-    if os.path.exists(FilePath):
+    if Verbose:
+      BoogieScape._printActionStarted("Creating GIS file {}".format(os.path.basename(FilePath)))
+    if os.path.exists(FilePath) or (BoogieScape._isVirtualPath(FilePath) and gdal.VSIStatL(FilePath) is not None):
       Driver.DeleteDataSource(FilePath)
     Source = Driver.CreateDataSource(FilePath)
 
     if Source is None:
-      BoogieScape._printActionFailed("Failed (could not create {})".format(APFilePath))
-    else:
+      if not Verbose:
+        BoogieScape._printActionStarted("Creating GIS file {}".format(os.path.basename(FilePath)))
+      BoogieScape._printActionFailed("Failed (could not create {})".format(FilePath))
+    elif Verbose:
       BoogieScape._printActionDone()
 
     return Source
@@ -303,32 +487,148 @@ class BoogieScape():
   ######################################################
 
 
-  def _prepare(self):
+  def _prepare(self,CreateOutput=True):
     BoogieScape._printStage("Preparing")
     
-    BoogieScape._printActionStarted("Checking input directory {}".format(self._inputPath))
-    if os.path.isdir(self._inputPath):
+    if len(self._Inputs) < 3:
+      BoogieScape._printActionStarted("Checking input directory {}".format(self._inputPath))
+      if self._inputPath and os.path.isdir(self._inputPath):
+        BoogieScape._printActionDone()
+      else:
+        BoogieScape._printActionFailed(Fatal=1)
+
+    if CreateOutput:
+      BoogieScape._printActionStarted("Creating output directory {}".format(self._outputPath))
+      if os.path.isdir(self._outputPath):
+        if self._extraArgs.get("overwrite"):
+          shutil.rmtree(self._outputPath, ignore_errors=True)
+        else:
+          BoogieScape._printActionFailed(Text="Failed (directory already exists)",Fatal=1)
+      os.makedirs(self._outputPath)
+      self._OutputCreated = True
       BoogieScape._printActionDone()
+
+    # stages results are cached for input files only
+    if self._extraArgs.get("cache_dir") and not self._Inputs:
+      self._Cache = Cache.StageCache(self._extraArgs["cache_dir"],self._inputPath)
+
+    Inputs = [(self._RSFileShp,self._InputRSFields,"RS"),
+              (self._SUFileShp,self._InputSUFields,"SU"),
+              (self._REFileShp,self._InputREFields,"RE")]
+
+    Workers = self._extraArgs.get("input_workers") or 1
+    if Workers > 1:
+      Loaded = self._loadInputsConcurrently(Inputs,Workers)
     else:
-      BoogieScape._printActionFailed(Fatal=1)
+      Loaded = dict()
+      for FileName,ExpectedFields,UnitsClass in Inputs:
+        Loaded[UnitsClass] = self._loadInput(FileName,ExpectedFields,UnitsClass)
 
-    BoogieScape._printActionStarted("Creating output directory {}".format(self._outputPath))
-    if os.path.isdir(self._outputPath):
-      if self._extraArgs["overwrite"]:
-        shutil.rmtree(self._outputPath, ignore_errors=True)
-      else:
-        BoogieScape._printActionFailed(Text="Failed (directory already exists)",Fatal=1)
-    os.makedirs(self._outputPath)
+    self._RSData = Loaded["RS"]
+    self._SUData = Loaded["SU"]
+    self._REData = Loaded["RE"]
+
+
+  ######################################################
+
+
+  def _loadInputsConcurrently(self,Inputs,Workers):
+    # each input file is loaded by its own thread, errors are reported for all files before failing
+
+    def loadSilently(FileName,ExpectedFields,UnitsClass):
+      BoogieScape._PrintState.Silent = True
+      try:
+        return self._loadInput(FileName,ExpectedFields,UnitsClass)
+      finally:
+        BoogieScape._PrintState.Silent = False
+
+    Loaded = dict()
+    Errors = dict()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(Workers,len(Inputs))) as Executor:
+      Futures = list()
+      for Input in Inputs:
+        Futures.append(Executor.submit(loadSilently,*Input))
+
+      for Input,Future in zip(Inputs,Futures):
+        UnitsClass = Input[2]
+        BoogieScape._printActionStarted("Loading input {} file".format(UnitsClass))
+        try:
+          Loaded[UnitsClass] = Future.result()
+          BoogieScape._printActionDone()
+        except BoogieScapeError as E:
+          Errors[UnitsClass] = str(E)
+          BoogieScape._printActionFailed(str(E),Fatal=0)
+        except Exception as E:
+          Errors[UnitsClass] = "{}: {}".format(type(E).__name__,E)
+          BoogieScape._printActionFailed("Failed ({})".format(Errors[UnitsClass]),Fatal=0)
+
+    if Errors:
+      BoogieScape._printActionStarted("Loading input files")
+      BoogieScape._printActionFailed("Failed (errors in {} input files)".format(", ".join(Errors.keys())))
+
+    return Loaded
+
+
+  ######################################################
+
+
+  def _loadInput(self,FileName,ExpectedFields,UnitsClass):
+    Input = self._Inputs.get(UnitsClass)
+    if isinstance(Input,ogr.DataSource):
+      Input = Input.GetLayer(0)
+    if isinstance(Input,ogr.Layer):
+      return BoogieScape._loadLayer(Input,ExpectedFields,UnitsClass,not self._isQuiet())
+    if Input is not None:
+      BoogieScape._printActionStarted("Copying given {} units".format(UnitsClass))
+      UnitsData = Data.copyUnits(Input)
+      BoogieScape._printActionDone("{} units".format(len(UnitsData)))
+      return UnitsData
+
+    FilePath = self.getInputPath(FileName)
+    WithGeometries = not self._isPartitioned()
+
+    if self._Cache is None:
+      return BoogieScape._loadShapefile(FilePath,ExpectedFields,UnitsClass,not self._isQuiet(),WithGeometries)
+
+    BoogieScape._printActionStarted("Hashing input {} file".format(UnitsClass))
+    Hashes = Cache.hashShapefile(FilePath)
+    self._InputKeys[UnitsClass] = Cache.hashValues(sorted(Hashes.items()),ExpectedFields)
+    if not WithGeometries:
+      self._InputKeys[UnitsClass] = Cache.hashValues(self._InputKeys[UnitsClass],"without-geometries")
+    self._InputKeys[UnitsClass+"-geometry"] = Cache.hashValues(Hashes.get(".shp"),Hashes.get(".shx"))
+    BoogieScape._printActionDone()
+
+    UnitsData = self._Cache.load("load-"+UnitsClass,self._InputKeys[UnitsClass])
+    if UnitsData is not None:
+      BoogieScape._printActionStarted("Loading input {} file from cache".format(UnitsClass))
+      BoogieScape._printActionDone()
+      return UnitsData
+
+    UnitsData = BoogieScape._loadShapefile(FilePath,ExpectedFields,UnitsClass,not self._isQuiet(),WithGeometries)
+    self._Cache.store("load-"+UnitsClass,self._InputKeys[UnitsClass],UnitsData)
+
+    return UnitsData
+
+
+  ######################################################
+
+
+  def _buildIndexes(self):
+    BoogieScape._printActionStarted("Building units indexes")
+    self._Indexes = dict()
+    self._Indexes[("SU","FROM_AP")] = Data.AttributeIndex(self._SUData,"FROM_AP",int)
     BoogieScape._printActionDone()
 
-    ## Opening RS file
-    self._RSData = BoogieScape._loadShapefile(self.getInputPath(self._RSFileShp),self._InputRSFields,"RS")
 
-    ## Opening SU file
-    self._SUData = BoogieScape._loadShapefile(self.getInputPath(self._SUFileShp),self._InputSUFields,"SU")
+  ######################################################
+
 
-    ## Opening RE file
-    self._REData = BoogieScape._loadShapefile(self.getInputPath(self._REFileShp),self._InputREFields,"RE")
+  def _getIndex(self,UnitsClass,Field):
+    # indexes are built on first use, after the validation of the units values
+    if (UnitsClass,Field) not in self._Indexes:
+      self._buildIndexes()
+    return self._Indexes[(UnitsClass,Field)]
 
 
   ######################################################
@@ -336,19 +636,21 @@ class BoogieScape():
 
   def _appendAPFromSource(self,OtherData,OtherClass,PcsOrd):
 
+    FromAPIndex = self._getIndex("SU","FROM_AP")
+    Verbose = not self._isQuiet()
+
     for k,OtherUnit in OtherData.items():
       if OtherUnit.Attributes["AP_ID"] is not None:
         APID = OtherUnit.Attributes["AP_ID"]
-        BoogieScape._printActionStarted("Creating AP#{} from {}#{}".format(APID,OtherClass,OtherUnit.Id))
+        if Verbose:
+          BoogieScape._printActionStarted("Creating AP#{} from {}#{}".format(APID,OtherClass,OtherUnit.Id))
         Unit = Data.SpatialUnit()
         Unit.Geometry = OtherUnit.Geometry.Centroid()
 
         SUList = list()
-        for k,SUUnit in self._SUData.items():
-          FromAP = int(SUUnit.Attributes["FROM_AP"])
-          if FromAP == APID:
-            SUList.append(["SU",SUUnit.Id])
-          
+        for SUId in FromAPIndex.getIds(APID):
+          SUList.append(["SU",SUId])
+
         Unit.Id = APID
         Unit.PcsOrd = int(PcsOrd)
         Unit.To = SUList
@@ -356,7 +658,8 @@ class BoogieScape():
         Unit.Attributes['xposition'] = Unit.Geometry.GetX()
         Unit.Attributes['yposition'] = Unit.Geometry.GetY()
         self._APData[Unit.Id] = Unit
-        BoogieScape._printActionDone()
+        if Verbose:
+          BoogieScape._printActionDone()
 
 
   ######################################################
@@ -365,16 +668,31 @@ class BoogieScape():
   def _createAP(self):
     BoogieScape._printStage("Creating AP")
 
+    CacheKey = None
+    if self._Cache is not None:
+      CacheKey = Cache.hashValues(self._InputKeys["RS"],self._InputKeys["RE"],Cache.hashUnits(self._SUData,["FROM_AP"]))
+      APData = self._Cache.load("AP",CacheKey)
+      if APData is not None:
+        BoogieScape._printActionStarted("Loading AP from cache")
+        self._APData = APData
+        BoogieScape._printActionDone()
+        return
+
+    if self._isQuiet():
+      BoogieScape._printActionStarted("Creating AP from RS and RE")
     self._appendAPFromSource(self._RSData,"RS",1)
     self._appendAPFromSource(self._REData,"RE",2)
+    if self._isQuiet():
+      BoogieScape._printActionDone("{} created".format(len(self._APData)))
 
+    if self._Cache is not None:
+      self._Cache.store("AP",CacheKey,self._APData)
 
-  ######################################################
 
+  ######################################################
 
-  def _createGU(self):
 
-    BoogieScape._printStage("Creating GU")
+  def _buildUnitsGraph(self):
 
     G = networkx.DiGraph()
 
@@ -397,81 +715,264 @@ class BoogieScape():
     BoogieScape._printActionStarted("Building connections in GU graph view")
 
     for FromNode in list(G.nodes):
-      ToList = G.nodes[FromNode]['data'].To
-      for ToUnit in ToList:
-        ToNode = "{}#{}".format(ToUnit[0],ToUnit[1])
-      
+      Unit = G.nodes[FromNode]['data']
+
       # do not connect source RS (GUconnect=1) to downstream
-      if FromNode.startswith("RS") and G.nodes[FromNode]['data'].Attributes["GUconnect"] :
-        pass
-      else :
-        G.add_edge(FromNode,ToNode)
+      if FromNode.startswith("RS") and Unit.Attributes["GUconnect"] :
+        continue
+
+      for ToUnit in Unit.To:
+        G.add_edge(FromNode,"{}#{}".format(ToUnit[0],ToUnit[1]))
 
     BoogieScape._printActionDone()
 
-    if self._extraArgs["export_graph_view"] :
-      BoogieScape._printActionStarted("Printing GU graph view to file")
-      pos = graphviz_layout(G, prog='dot')
-      plt.figure(figsize=(20, 20))
-      networkx.draw(G, pos, node_size=300, alpha=0.5, node_color="blue", with_labels=True)
-      plt.axis('equal')
-      plt.savefig(self.getOutputPath("GU_graph_view.pdf"))
+    return G
+
+
+  ######################################################
+
+
+  def _exportGraphView(self,G):
+    from . import GraphView
+
+    MaxNodes = self._extraArgs.get("graph_view_max_nodes")
+
+    for Format in self._extraArgs.get("graph_view_formats") or ['pdf']:
+      FileName = "GU_graph_view."+GraphView.FileExtensions[Format]
+      BoogieScape._printActionStarted("Printing GU graph view to file {}".format(FileName))
+      if Format == 'pdf' and MaxNodes and G.number_of_nodes() > MaxNodes:
+        BoogieScape._printActionDone("skipped ({} nodes)".format(G.number_of_nodes()))
+        continue
+      try:
+        GraphView.Exporters[Format](G,self.getOutputPath(FileName))
+      except ImportError as E:
+        BoogieScape._printActionFailed("Failed ({})".format(E))
       BoogieScape._printActionDone("done")
-    
 
-    GUId = 1
 
+  ######################################################
+
+
+  def _exportGUGraphViews(self,G):
+    from . import GraphView
+
+    BoogieScape._printActionStarted("Printing GU graph views to GU_graph_views directory")
+
+    # subgraph of each GU: its outlet and the units draining to it
+    Outlets = { "RS#{}".format(Unit.To[0][1]) : Id for Id,Unit in self._GUData.items() }
+    Catchments = Topology.buildCatchments(G,list(Outlets.keys()))
+    Subgraphs = list()
+    for Outlet,Id in Outlets.items():
+      Nodes = Catchments[Outlet].Members+[Outlet]
+      Subgraphs.append(("GU_{}".format(Id),Nodes,list(G.subgraph(Nodes).edges)))
+
+    OutputPath = self.getOutputPath("GU_graph_views")
+    os.makedirs(OutputPath,exist_ok=True)
+    MaxNodes = self._extraArgs.get("graph_view_max_nodes")
+    try:
+      Rendered,Skipped = GraphView.renderSubgraphs(Subgraphs,OutputPath,self._extraArgs.get("graph_view_workers") or 1,
+                                                   MaxNodes)
+    except ImportError as E:
+      BoogieScape._printActionFailed("Failed ({})".format(E))
+
+    if Skipped:
+      BoogieScape._printActionDone("{} rendered, {} skipped (more than {} nodes)".format(len(Rendered),len(Skipped),MaxNodes))
+    else:
+      BoogieScape._printActionDone("{} rendered".format(len(Rendered)))
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _buildGUGeometries(UnitsData,Outlets,Catchments,Mode,Workers):
+    # geometries and positions of the GU by outlet, built by worker processes from the WKB of their SU,
+    # GU geometries being kept as WKB. IDs are given afterwards in the outlets order.
+    Outlets = [UnitStr for UnitStr in Outlets if Catchments[UnitStr].Area > 0]
+    if len(Outlets) < 2:
+      return dict()
+
+    Members = list()
+    for UnitStr in Outlets:
+      Members.append([Data.exportGeometry(UnitsData[UpUnit].RawGeometry) for UpUnit in Catchments[UnitStr].Members
+                      if "area" in UnitsData[UpUnit].Attributes])
+
+    Workers = min(Workers,len(Outlets))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Executor:
+      Results = Executor.map(Geometry.buildGUGeometryFromWKB,Members,[Mode]*len(Members),
+                             chunksize=max(1,len(Members)//(4*Workers)))
+      return dict(zip(Outlets,Results))
+
+
+  ######################################################
+
+
+  def _buildGU(self,G):
+
+    BoogieScape._printActionStarted("Computing GU catchments")
+
+    Outlets = list()
     for k,RSUnit in self._RSData.items():
       if int(RSUnit.Attributes["GUconnect"]) > 0:
-        UnitStr = "RS#{}".format(RSUnit.Id)
+        Outlets.append("RS#{}".format(RSUnit.Id))
+
+    UnitsData = dict(G.nodes(data='data'))
+
+    def getArea(Node):
+      Attributes = UnitsData[Node].Attributes
+      if "area" in Attributes:
+        return Attributes['area']
+      return None
+
+    Catchments = Topology.buildCatchments(G,Outlets,getArea)
+
+    BoogieScape._printActionDone()
+
+    GeometryMode = self._extraArgs.get("gu_geometry") or 'multipolygon'
+
+    Built = dict()
+    Workers = self._extraArgs.get("gu_workers") or 1
+    if Workers > 1:
+      BoogieScape._printActionStarted("Building GU geometries with {} processes".format(Workers))
+      Built = BoogieScape._buildGUGeometries(UnitsData,Outlets,Catchments,GeometryMode,Workers)
+      BoogieScape._printActionDone()
+
+    GUId = 1
+    GULinks = { "SU" : ([],[]), "RE" : ([],[]) }
+    Verbose = not self._isQuiet()
+
+    if not Verbose:
+      BoogieScape._printActionStarted("Creating GU from {} outlets".format(len(Outlets)))
+
+    for UnitStr in Outlets:
+      if Verbose:
         BoogieScape._printActionStarted("Creating GU#{} from {}".format(GUId,UnitStr))
-        
-        MultiPolygon = ogr.Geometry(ogr.wkbMultiPolygon)
-        Area = 0
-        Ancestors = list(networkx.ancestors(G,UnitStr))
-        for UpUnit in Ancestors:
-          if "area" in G.node[UpUnit]['data'].Attributes:
-            Area += G.node[UpUnit]['data'].Attributes['area']
-            MultiPolygon.AddGeometry(G.node[UpUnit]['data'].Geometry)
-         
-        if Area > 0 : 
-          Unit = Data.SpatialUnit()
-          Unit.Id = GUId
-          Unit.PcsOrd = 1
-          Unit.To.append(["RS",RSUnit.Id])
-          Unit.Attributes["area"] = Area
-          Unit.Attributes["xposition"] = MultiPolygon.Centroid().GetX()
-          Unit.Attributes["yposition"] = MultiPolygon.Centroid().GetY()
-          Unit.Geometry = MultiPolygon
-          self._GUData[Unit.Id] = Unit
-
-          for FromUnitStr in Ancestors:
-            FromUnit = BoogieScape.splitUnitsStr(FromUnitStr)
-            if FromUnit[0] == "SU":
-              self._SUData[int(FromUnit[1])].To.append(["GU",Unit.Id])
-            elif FromUnit[0] == "RE":
-              self._REData[int(FromUnit[1])].To.append(["GU",Unit.Id])
-
-          GUId += 1
-          BoogieScape._printActionDone()
+
+      Ancestors = Catchments[UnitStr].Members
+      Area = Catchments[UnitStr].Area
+
+      if Area > 0 :
+        if UnitStr in Built:
+          Geom,X,Y = Built[UnitStr]
         else:
-          BoogieScape._printActionDone("ignored")
+          Geometries = list()
+          for UpUnit in Ancestors:
+            if "area" in UnitsData[UpUnit].Attributes:
+              Geometries.append(UnitsData[UpUnit].Geometry)
+
+          Geom,X,Y = Geometry.buildGUGeometry(Geometries,GeometryMode)
+
+        Unit = Data.SpatialUnit()
+        Unit.Id = GUId
+        Unit.PcsOrd = 1
+        Unit.To.append(["RS",UnitsData[UnitStr].Id])
+        Unit.Attributes["area"] = Area
+        Unit.Attributes["xposition"] = X
+        Unit.Attributes["yposition"] = Y
+        Unit.Geometry = Geom
+        self._GUData[Unit.Id] = Unit
+
+        for FromUnitStr in Ancestors:
+          FromUnit = BoogieScape.splitUnitsStr(FromUnitStr)
+          if FromUnit[0] in GULinks:
+            GULinks[FromUnit[0]][0].append(UnitsData[FromUnitStr].Id)
+            GULinks[FromUnit[0]][1].append(Unit.Id)
+
+        GUId += 1
+        if Verbose:
+          BoogieScape._printActionDone()
+      elif Verbose:
+        BoogieScape._printActionDone("ignored")
+
+    if not Verbose:
+      BoogieScape._printActionDone("{} created, {} ignored".format(GUId-1,len(Outlets)-GUId+1))
+
+    return GULinks
+
+
+  ######################################################
+
+
+  def _createGU(self):
+
+    BoogieScape._printStage("Creating GU")
+
+    GULinks = None
+    CacheKey = None
+    if self._Cache is not None:
+      CacheKey = Cache.hashValues(self._InputKeys["RS"],self._InputKeys["RE"],self._InputKeys["SU-geometry"],
+                                  Cache.hashUnits(self._SUData,["area"],True),
+                                  self._extraArgs.get("gu_geometry") or 'multipolygon')
+      Cached = self._Cache.load("GU",CacheKey)
+      if Cached is not None:
+        self._GUData,GULinks = Cached
+
+    PerGU = self._extraArgs.get("graph_view_per_gu")
+
+    G = None
+    if GULinks is None or self._extraArgs.get("export_graph_view") or PerGU:
+      G = self._buildUnitsGraph()
+
+    if self._extraArgs.get("export_graph_view") :
+      self._exportGraphView(G)
+
+    if GULinks is None:
+      GULinks = self._buildGU(G)
+      if self._Cache is not None:
+        self._Cache.store("GU",CacheKey,(self._GUData,GULinks))
+    else:
+      BoogieScape._printActionStarted("Loading GU from cache")
+      BoogieScape._printActionDone()
+
+    if PerGU:
+      self._exportGUGraphViews(G)
+
+    Data.extendRelations(self._SUData,"To",GULinks["SU"][0],"GU",GULinks["SU"][1])
+    Data.extendRelations(self._REData,"To",GULinks["RE"][0],"GU",GULinks["RE"][1])
 
 
   ######################################################
 
 
   @staticmethod
-  def _writeGISfile(Driver,FilePath,GeometryType,AttributesDef,Data):
+  def _writeGISfile(Driver,FilePath,GeometryType,AttributesDef,Data,Options=None,Verbose=True,Transform=None):
     
     if not len(Data):
       return
 
-    Source = BoogieScape._createGISfile(Driver,FilePath)
+    Source = BoogieScape._createGISfile(Driver,FilePath,Verbose)
 
     LayerName = os.path.splitext(os.path.basename(FilePath))[0]
-    Layer =  Source.CreateLayer(LayerName,None,GeometryType)
-    LayerDefn = Layer.GetLayerDefn()
+    BoogieScape._writeGISlayer(Source,LayerName,GeometryType,AttributesDef,Data,Options,Transform=Transform)
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _writeGISContainer(Driver,FilePath,Layers,Transform=None):
+
+    Source = None
+
+    for LayerName,GeometryType,AttributesDef,Data in Layers:
+      if not len(Data):
+        continue
+
+      if Source is None:
+        Source = BoogieScape._createGISfile(Driver,FilePath)
+
+      BoogieScape._printActionStarted("Writing layer {} to {}".format(LayerName,os.path.basename(FilePath)))
+      BoogieScape._writeGISlayer(Source,LayerName,GeometryType,AttributesDef,Data,Transaction=True,Transform=Transform)
+      BoogieScape._printActionDone()
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _createGISlayer(Source,LayerName,GeometryType,AttributesDef,Options=None):
+
+    Layer =  Source.CreateLayer(LayerName,None,GeometryType,options=Options or [])
 
     FieldDefn = ogr.FieldDefn("OFLD_ID",ogr.OFTInteger)
     Layer.CreateField(FieldDefn)
@@ -486,6 +987,18 @@ class BoogieScape():
       FieldDefn = ogr.FieldDefn(AttrName,Type)
       Layer.CreateField(FieldDefn)
 
+    return Layer
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _writeGISfeatures(Layer,AttributesDef,Data,Transform=None):
+    # Transform is applied to copies of the geometries (e.g. simplification), units geometries being left unchanged
+
+    LayerDefn = Layer.GetLayerDefn()
+
     for k,Unit in Data.items():
       Feature = ogr.Feature(LayerDefn)
 
@@ -505,7 +1018,15 @@ class BoogieScape():
       for AttrName,Type in AttributesDef.items():
         Feature.SetField(AttrName,Unit.Attributes[AttrName])
 
-      Feature.SetGeometry(Unit.Geometry)
+      Geom = Unit.RawGeometry
+      if Transform is not None and Geom is not None:
+        if isinstance(Geom,bytes):
+          Geom = ogr.CreateGeometryFromWkb(Geom)
+        Feature.SetGeometry(Transform(Geom))
+      elif isinstance(Geom,bytes):
+        Feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(Geom))
+      elif Geom is not None:
+        Feature.SetGeometry(Geom)
       Layer.CreateFeature(Feature)
       Feature = None 
 
@@ -513,36 +1034,114 @@ class BoogieScape():
   ######################################################
 
 
-  def _writeFluidXDefinition(self,File,Data,UnitsClass):
-    for Id,Unit in Data.items():
-      File.write(indentCRStr(3,'<unit class="{}" ID="{}" pcsorder="{}">'.format(UnitsClass,Unit.Id,Unit.PcsOrd)))
-      
-      for ToUnit in Unit.To:
-        File.write(indentCRStr(4,'<to class="{}" ID="{}" />'.format(ToUnit[0],ToUnit[1])))
-      for ChildUnit in Unit.Child:
-        File.write(indentCRStr(4,'<childof class="{}" ID="{}" />'.format(ChildUnit[0],ChildUnit[1])))
-      
-      File.write(indentCRStr(3,'</unit>'))
+  @staticmethod
+  def _writeGISlayer(Source,LayerName,GeometryType,AttributesDef,Data,Options=None,Transaction=False,Transform=None):
+
+    Layer = BoogieScape._createGISlayer(Source,LayerName,GeometryType,AttributesDef,Options)
+
+    if Transaction:
+      Layer.StartTransaction()
+
+    BoogieScape._writeGISfeatures(Layer,AttributesDef,Data,Transform)
+
+    if Transaction:
+      Layer.CommitTransaction()
 
 
   ######################################################
 
 
-  def _writeFluidXAttributes(self,File,Data,UnitsClass,ColOrder):
-    
-    File.write(indentCRStr(2,'<attributes unitsclass="{}" colorder="{}">'.format(UnitsClass,";".join(ColOrder))))
-    
-    for Id,Unit in Data.items():
-      File.write("{} ".format(Unit.Id))
+  @staticmethod
+  def _isVirtualPath(FilePath):
+    # GDAL virtual file systems paths, such as /vsimem/
+    return FilePath.startswith("/vsi")
 
-      ValuesList = list()
-      for Name in ColOrder:
-        ValuesList.append(str(Unit.Attributes[Name]))
 
-      File.write(" ".join(ValuesList))
-      File.write("\n")
-    
-    File.write(indentCRStr(2,'</attributes>'))
+  ######################################################
+
+
+  @contextlib.contextmanager
+  def _openFluidXWriter(self,FilePath,Compress=False):
+    if not BoogieScape._isVirtualPath(FilePath):
+      with FluidX.FluidXWriter(FilePath,Compress) as Writer:
+        yield Writer
+      return
+
+    Buffer = io.StringIO()
+    with FluidX.FluidXWriter(Buffer) as Writer:
+      yield Writer
+    Content = Buffer.getvalue().encode()
+    gdal.FileFromMemBuffer(FilePath,gzip.compress(Content) if Compress else Content)
+
+
+  ######################################################
+
+
+  def _writeOutputText(self,FileName,Content):
+    FilePath = self.getOutputPath(FileName)
+    if BoogieScape._isVirtualPath(FilePath):
+      gdal.FileFromMemBuffer(FilePath,Content.encode())
+    else:
+      with open(FilePath,'w') as File:
+        File.write(Content)
+
+
+  ######################################################
+
+
+  def _writeDomainFluidX(self,Writer):
+    Writer.beginDocument()
+    Writer.beginSection(1,'domain')
+
+    Writer.beginSection(2,'definition')
+    Writer.writeDefinition("AP",self._APData.values())
+    Writer.writeDefinition("GU",self._GUData.values())
+    Writer.writeDefinition("RE",self._REData.values())
+    Writer.writeDefinition("RS",self._RSData.values())
+    Writer.writeDefinition("SU",self._SUData.values())
+    Writer.endSection()
+
+    Formats = self._getFluidXFormats()
+    Writer.writeAttributes("AP",self._APData,self._OutputAPAttributes.keys(),Formats["AP"])
+    Writer.writeAttributes("GU",self._GUData,self._OutputGUAttributes.keys(),Formats["GU"])
+    Writer.writeAttributes("RE",self._REData,self._OutputREAttributes.keys(),Formats["RE"])
+    Writer.writeAttributes("RS",self._RSData,self._OutputRSAttributes.keys(),Formats["RS"])
+    Writer.writeAttributes("SU",self._SUData,self._OutputSUAttributes.keys(),Formats["SU"])
+
+
+  ######################################################
+
+
+  def _getFluidXFormats(self):
+    # format specs of the FluidX attributes by units class, from NAME=SPEC or CLASS.NAME=SPEC options
+    Formats = { Class[0] : dict() for Class in self._getOutputClasses() }
+
+    for Option in self._extraArgs.get("fluidx_format") or []:
+      Name,Sep,Spec = Option.partition("=")
+      UnitsClass,Sep,Name = Name.rpartition(".")
+      try:
+        if not Spec or (UnitsClass and UnitsClass not in Formats) or not FluidX.getFormatTypes(Spec):
+          raise ValueError(Option)
+      except ValueError:
+        BoogieScape._printActionStarted("Checking FluidX attributes formats")
+        BoogieScape._printActionFailed("Failed (invalid format {})".format(Option))
+
+      for Class,ClassFormats in Formats.items():
+        if not UnitsClass or UnitsClass == Class:
+          ClassFormats[Name] = Spec
+
+    return Formats
+
+
+  ######################################################
+
+
+  def _writeDatastoreFluidX(self,Writer):
+    Writer.beginDocument()
+    Writer.beginSection(1,'datastore')
+
+    for UnitsClass,Source,LayerName in self._getDatastoreSources():
+      Writer.writeDataitem(UnitsClass,"geovector",Source,UnitsClass,LayerName)
 
 
   ######################################################
@@ -550,59 +1149,129 @@ class BoogieScape():
 
   def _writeFluidXfiles(self):
     BoogieScape._printActionStarted("Creating domain.fluidx file")
-   
-    FXFile = open(self.getOutputPath(self._DomainFluidXFile),'w')
-    FXFile.write(indentCRStr(0,'<?xml version="1.0" standalone="yes"?>'))
-    FXFile.write(indentCRStr(0,'<openfluid>'))
-    FXFile.write(indentCRStr(1,'<domain>'))
 
-    FXFile.write(indentCRStr(2,'<definition>'))
+    FilePath = self.getOutputPath(self._DomainFluidXFile)
+    Compress = self._extraArgs.get("compress_fluidx")
+    if Compress:
+      FilePath += ".gz"
 
-    self._writeFluidXDefinition(FXFile,self._APData,"AP")
-    self._writeFluidXDefinition(FXFile,self._GUData,"GU")
-    self._writeFluidXDefinition(FXFile,self._REData,"RE")
-    self._writeFluidXDefinition(FXFile,self._RSData,"RS")
-    self._writeFluidXDefinition(FXFile,self._SUData,"SU")
+    with self._openFluidXWriter(FilePath,Compress) as Writer:
+      self._writeDomainFluidX(Writer)
 
-    FXFile.write(indentCRStr(2,'</definition>'))
+    BoogieScape._printActionDone()
 
-    self._writeFluidXAttributes(FXFile,self._APData,"AP",self._OutputAPAttributes.keys())
-    self._writeFluidXAttributes(FXFile,self._GUData,"GU",self._OutputGUAttributes.keys())
-    self._writeFluidXAttributes(FXFile,self._REData,"RE",self._OutputREAttributes.keys())
-    self._writeFluidXAttributes(FXFile,self._RSData,"RS",self._OutputRSAttributes.keys())
-    self._writeFluidXAttributes(FXFile,self._SUData,"SU",self._OutputSUAttributes.keys())
+    self._writeDatastoreFluidXfile()
 
-    FXFile.write(indentCRStr(1,'</domain>'))
-    FXFile.write(indentCRStr(0,'</openfluid>'))
 
-    FXFile.close()
+  ######################################################
+
+
+  def _writeDatastoreFluidXfile(self):
+    BoogieScape._printActionStarted("Creating datastore.fluidx file")
+
+    with self._openFluidXWriter(self.getOutputPath(self._DatastoreFluidXFile)) as Writer:
+      self._writeDatastoreFluidX(Writer)
 
     BoogieScape._printActionDone()
 
 
-    BoogieScape._printActionStarted("Creating datastore.fluidx file")
 
-    FXFile = open(self.getOutputPath(self._DatastoreFluidXFile),'w')
- 
-    FXFile.write(indentCRStr(0,'<?xml version="1.0" standalone="yes"?>'))
-    FXFile.write(indentCRStr(0,'<openfluid>'))
-    FXFile.write(indentCRStr(1,'<datastore>'))
+  ######################################################
+
 
-    FXFile.write(indentCRStr(2,'<dataitem id="AP" type="geovector" source="AP.shp" unitclass="AP" />'))
-    FXFile.write(indentCRStr(2,'<dataitem id="GU" type="geovector" source="GU.shp" unitclass="GU" />'))
-    FXFile.write(indentCRStr(2,'<dataitem id="RE" type="geovector" source="RE.shp" unitclass="RE" />'))
-    FXFile.write(indentCRStr(2,'<dataitem id="RS" type="geovector" source="RS.shp" unitclass="RS" />'))
-    FXFile.write(indentCRStr(2,'<dataitem id="SU" type="geovector" source="SU.shp" unitclass="SU" />'))
+  def _getOutputFormat(self):
+    return self._extraArgs.get("output_format") or 'shp+geojson'
 
-    FXFile.write(indentCRStr(1,'</datastore>'))
-    FXFile.write(indentCRStr(0,'</openfluid>'))
 
-    FXFile.close()
+  ######################################################
 
 
-    BoogieScape._printActionDone()
+  def _getOutputClasses(self):
+    return [
+      ("AP",ogr.wkbPoint,self._OutputAPAttributes,self._APData,self._APFileShp,self._APFileJson),
+      ("GU",ogr.wkbMultiPolygon,self._OutputGUAttributes,self._GUData,self._GUFileShp,self._GUFileJson),
+      ("RE",ogr.wkbPoint,self._OutputREAttributes,self._REData,self._REFileShp,self._REFileJson),
+      ("RS",ogr.wkbMultiLineString,self._OutputRSAttributes,self._RSData,self._RSFileShp,self._RSFileJson),
+      ("SU",ogr.wkbPolygon,self._OutputSUAttributes,self._SUData,self._SUFileShp,self._SUFileJson)
+    ]
+
+
+  ######################################################
+
+
+  def _getGeoJSONOptions(self):
+    Precision = self._extraArgs.get("coordinate_precision")
+    if Precision is None:
+      return None
+    return ["COORDINATE_PRECISION={}".format(Precision)]
+
+
+  ######################################################
+
+
+  def _getGeometryTransform(self):
+    # simplification and grid snapping of the output geometries, GIS outputs only
+    return Geometry.getOutputTransform(self._extraArgs.get("snap_grid"),self._extraArgs.get("simplify"))
+
+
+  ######################################################
 
 
+  def _getOutputLayers(self):
+    Format = self._getOutputFormat()
+    Layers = list()
+
+    for UnitsClass,GeometryType,AttributesDef,UnitsData,FileShp,FileJson in self._getOutputClasses():
+      if Format == 'fgb':
+        Layers.append((BoogieScape._FGBDriver,self.getOutputPath(UnitsClass+".fgb"),GeometryType,AttributesDef,UnitsData,
+                       ["SPATIAL_INDEX=YES"]))
+      else:
+        Layers.append((BoogieScape._SHPDriver,self.getOutputPath(FileShp),GeometryType,AttributesDef,UnitsData))
+        Layers.append((BoogieScape._GeoJSONDriver,self.getOutputPath(FileJson),GeometryType,AttributesDef,UnitsData,
+                       self._getGeoJSONOptions()))
+
+    return Layers
+
+
+  ######################################################
+
+
+  def _getDatastoreSources(self):
+    Format = self._getOutputFormat()
+    Sources = list()
+
+    for UnitsClass,GeometryType,AttributesDef,UnitsData,FileShp,FileJson in self._getOutputClasses():
+      if Format == 'gpkg':
+        Sources.append((UnitsClass,self._GPKGFile,UnitsClass))
+      elif Format == 'fgb':
+        Sources.append((UnitsClass,UnitsClass+".fgb",None))
+      else:
+        Sources.append((UnitsClass,FileShp,None))
+
+    return Sources
+
+
+  ######################################################
+
+
+  def _writeQGISProject(self):
+    TemplatePath = os.path.join(BoogieScape._ResourcesDir,"outputs.qgs")
+    Format = self._getOutputFormat()
+
+    with open(TemplatePath) as File:
+      Project = File.read()
+
+    # both the shapefile and GeoJSON groups of the bundled project point to the single output
+    if Format != 'shp+geojson':
+      for UnitsClass,GeometryType,AttributesDef,UnitsData,FileShp,FileJson in self._getOutputClasses():
+        if Format == 'gpkg':
+          Source = "./{}|layername={}".format(self._GPKGFile,UnitsClass)
+        else:
+          Source = "./{}.fgb".format(UnitsClass)
+        Project = Project.replace("./"+FileShp,Source).replace("./"+FileJson,Source)
+
+    self._writeOutputText("outputs.qgs",Project)
+
 
   ######################################################
 
@@ -610,45 +1279,54 @@ class BoogieScape():
   def _writeOutputFiles(self):
     BoogieScape._printStage("Writing output GIS files")
 
-    ##### AP
-    BoogieScape._writeGISfile(BoogieScape._SHPDriver,self.getOutputPath(self._APFileShp),
-                              ogr.wkbPoint,self._OutputAPAttributes,self._APData)
-    BoogieScape._writeGISfile(BoogieScape._GeoJSONDriver,self.getOutputPath(self._APFileJson),
-                              ogr.wkbPoint,self._OutputAPAttributes,self._APData)
-    
-    ##### GU
-    BoogieScape._writeGISfile(BoogieScape._SHPDriver,self.getOutputPath(self._GUFileShp),
-                              ogr.wkbMultiPolygon,self._OutputGUAttributes,self._GUData)
-    BoogieScape._writeGISfile(BoogieScape._GeoJSONDriver,self.getOutputPath(self._GUFileJson),
-                              ogr.wkbMultiPolygon,self._OutputGUAttributes,self._GUData)
-
-    
-    ##### RE
-    BoogieScape._writeGISfile(BoogieScape._SHPDriver,self.getOutputPath(self._REFileShp),
-                              ogr.wkbPoint,self._OutputREAttributes,self._REData)
-    BoogieScape._writeGISfile(BoogieScape._GeoJSONDriver,self.getOutputPath(self._REFileJson),
-                              ogr.wkbPoint,self._OutputREAttributes,self._REData)
-
-    ##### RS
-    BoogieScape._writeGISfile(BoogieScape._SHPDriver,self.getOutputPath(self._RSFileShp),
-                              ogr.wkbMultiLineString,self._OutputRSAttributes,self._RSData)
-    BoogieScape._writeGISfile(BoogieScape._GeoJSONDriver,self.getOutputPath(self._RSFileJson),
-                              ogr.wkbMultiLineString,self._OutputRSAttributes,self._RSData)
-
-    ##### SU
-    BoogieScape._writeGISfile(BoogieScape._SHPDriver,self.getOutputPath(self._SUFileShp),
-                              ogr.wkbPolygon,self._OutputSUAttributes,self._SUData)
-    BoogieScape._writeGISfile(BoogieScape._GeoJSONDriver,self.getOutputPath(self._SUFileJson),
-                              ogr.wkbPolygon,self._OutputSUAttributes,self._SUData)
+    if self._getOutputFormat() == 'gpkg':
+      # all layers share a single file, written sequentially with one transaction per layer
+      Layers = [Class[0:4] for Class in self._getOutputClasses()]
+      BoogieScape._writeGISContainer(BoogieScape._GPKGDriver,self.getOutputPath(self._GPKGFile),Layers,
+                                     self._getGeometryTransform())
+    else:
+      if self._getOutputFormat() == 'fgb' and BoogieScape._FGBDriver is None:
+        BoogieScape._printActionStarted("Checking FlatGeobuf driver")
+        BoogieScape._printActionFailed("Failed (not available in this GDAL version)")
+
+      OutputLayers = self._getOutputLayers()
+      Workers = self._extraArgs.get("output_workers") or 1
+
+      if Workers > 1 and len(OutputLayers) > 1:
+        # layers are written to distinct files, each one by a single thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=Workers) as Executor:
+          Futures = list()
+          for Layer in OutputLayers:
+            Futures.append(Executor.submit(BoogieScape._writeGISfile,*Layer,Verbose=False,
+                                           Transform=self._getGeometryTransform()))
+
+          for Layer,Future in zip(OutputLayers,Futures):
+            BoogieScape._printActionStarted("Writing GIS file {}".format(os.path.basename(Layer[1])))
+            Future.result()
+            BoogieScape._printActionDone()
+      else:
+        for Layer in OutputLayers:
+          BoogieScape._writeGISfile(*Layer,Transform=self._getGeometryTransform())
 
-    
-    shutil.copyfile(os.path.join(BoogieScape._ResourcesDir,"outputs.qgs"), self.getOutputPath("outputs.qgs"))
+    self._writeQGISProject()
 
 
     BoogieScape._printStage("Writing output FluidX files")
     self._writeFluidXfiles()
 
 
+  ######################################################
+
+
+  @staticmethod
+  def _divideAttribute(UnitsData,Name,Divisor):
+    if isinstance(UnitsData,Data.UnitsStore) and UnitsData.hasNumericColumn(Name):
+      UnitsData.setColumn(Name,UnitsData.getColumn(Name) / Divisor,UnitsData.getMask(Name))
+    else:
+      for Key in UnitsData.keys():
+        UnitsData[Key].Attributes[Name] = UnitsData[Key].Attributes[Name] / Divisor
+
+
 ######################################################
 
 
@@ -656,27 +1334,490 @@ class BoogieScape():
     BoogieScape._printStage("Cleanup")
 
     BoogieScape._printActionStarted("Converting RE slope values")
-    for Key in self._REData.keys():
-      self._REData[Key].Attributes['slope'] = self._REData[Key].Attributes['slope'] / 100
+    BoogieScape._divideAttribute(self._REData,'slope',100)
     BoogieScape._printActionDone()
 
     BoogieScape._printActionStarted("Converting RS slope values")
-    for Key in self._RSData.keys():
-      self._RSData[Key].Attributes['slope'] = self._RSData[Key].Attributes['slope'] / 100
+    BoogieScape._divideAttribute(self._RSData,'slope',100)
     BoogieScape._printActionDone()
 
     BoogieScape._printActionStarted("Converting SU slope values")
-    for Key in self._SUData.keys():
-      self._SUData[Key].Attributes['slope'] = self._SUData[Key].Attributes['slope'] / 100
+    BoogieScape._divideAttribute(self._SUData,'slope',100)
+    BoogieScape._printActionDone()
+
+
+  ######################################################
+
+
+  def _getPartitionEdges(self,Offsets):
+    # links between the rows of all RS, SU and RE (numbered from the class offset),
+    # given by the To links (except from GU outlets) and by the AP created from RS and RE
+    Classes = { "RS" : self._RSData, "SU" : self._SUData, "RE" : self._REData }
+    FromAPIndex = self._getIndex("SU","FROM_AP")
+
+    for UnitsClass,UnitsData in Classes.items():
+      for Row,Unit in enumerate(UnitsData.values()):
+        Node = Offsets[UnitsClass]+Row
+
+        if UnitsClass == "RS" and Unit.Attributes["GUconnect"]:
+          continue
+
+        for ToUnit in Unit.To:
+          if ToUnit is not None and ToUnit[0] in Classes and ToUnit[1] in Classes[ToUnit[0]]:
+            yield Node,Offsets[ToUnit[0]]+Classes[ToUnit[0]].getRow(ToUnit[1])
+
+        if UnitsClass != "SU" and Unit.Attributes.get("AP_ID") is not None:
+          for SUId in FromAPIndex.getIds(Unit.Attributes["AP_ID"]):
+            yield Node,Offsets["SU"]+self._SUData.getRow(SUId)
+
+
+  ######################################################
+
+
+  def _buildPartitions(self):
+    BoogieScape._printStage("Partitioning")
+
+    BoogieScape._printActionStarted("Computing connected components")
+    Classes = [("RS",self._RSData),("SU",self._SUData),("RE",self._REData)]
+    Offsets = dict()
+    Count = 0
+    for UnitsClass,UnitsData in Classes:
+      Offsets[UnitsClass] = Count
+      Count += len(UnitsData)
+
+    Labels,ComponentsCount = Topology.findComponents(Count,self._getPartitionEdges(Offsets))
+    Labels = numpy.array(Labels,dtype=numpy.int64)
+    BoogieScape._printActionDone("{} components".format(ComponentsCount))
+
+    BoogieScape._printActionStarted("Grouping components into partitions")
+    # components are packed in their order up to the partition size, larger components are partitions on their own
+    MaxSize = self._extraArgs.get("partition_size") or 100000
+    PartitionByComponent = numpy.empty(ComponentsCount,dtype=numpy.int64)
+    Partition = 0
+    Size = 0
+    for Component,ComponentSize in enumerate(numpy.bincount(Labels,minlength=ComponentsCount).tolist()):
+      if Size and Size+ComponentSize > MaxSize:
+        Partition += 1
+        Size = 0
+      PartitionByComponent[Component] = Partition
+      Size += ComponentSize
+    PartitionsCount = Partition+1 if ComponentsCount else 0
+
+    self._Partitions = [dict() for i in range(PartitionsCount)]
+    for UnitsClass,UnitsData in Classes:
+      PartitionByRow = PartitionByComponent[Labels[Offsets[UnitsClass]:Offsets[UnitsClass]+len(UnitsData)]]
+      Rows = numpy.argsort(PartitionByRow,kind='stable')
+      Bounds = numpy.searchsorted(PartitionByRow[Rows],numpy.arange(PartitionsCount+1))
+      for Partition in range(PartitionsCount):
+        self._Partitions[Partition][UnitsClass] = Rows[Bounds[Partition]:Bounds[Partition+1]]
+    BoogieScape._printActionDone("{} partitions".format(PartitionsCount))
+
+
+  ######################################################
+
+
+  def _loadPartitionGeometries(self,UnitsData,FileName):
+    # geometries of the given units only, read by feature index from the input file
+    Source = BoogieScape._SHPDriver.Open(self.getInputPath(FileName),0)
+    Layer = Source.GetLayer(0)
+    LayerDefn = Layer.GetLayerDefn()
+    Layer.SetIgnoredFields([LayerDefn.GetFieldDefn(i).GetName() for i in range(LayerDefn.GetFieldCount())])
+
+    Geometries = list()
+    for FID in UnitsData.getSourceRows().tolist():
+      Geom = Layer.GetFeature(FID).GetGeometryRef()
+      Geometries.append(bytes(Geom.ExportToWkb()) if Geom is not None else None)
+    UnitsData.setGeometries(Geometries)
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _processPartition(InputPath,OutputPath,ExtraArgs,RSData,SUData,REData):
+    # AP and GU of a partition, built by a pipeline holding only the units of the partition,
+    # GU being numbered from 1 in the partition. Run by worker processes, returning the units data only.
+    BoogieScape._PrintState.Silent = True
+    try:
+      Part = BoogieScape(InputPath,OutputPath,ExtraArgs)
+      Part._RSData = RSData
+      Part._SUData = SUData
+      Part._REData = REData
+
+      Part._loadPartitionGeometries(Part._RSData,Part._RSFileShp)
+      Part._loadPartitionGeometries(Part._SUData,Part._SUFileShp)
+      Part._loadPartitionGeometries(Part._REData,Part._REFileShp)
+
+      Part._appendAPFromSource(Part._RSData,"RS",1)
+      Part._appendAPFromSource(Part._REData,"RE",2)
+      GULinks = Part._buildGU(Part._buildUnitsGraph())
+      return Part._RSData,Part._SUData,Part._REData,Part._APData,Part._GUData,GULinks
+    finally:
+      BoogieScape._PrintState.Silent = False
+
+
+  ######################################################
+
+
+  def _getPartitionArgs(self,Rows):
+    return (self._inputPath,self._outputPath,self._extraArgs,
+            self._RSData.take(Rows["RS"]),self._SUData.take(Rows["SU"]),self._REData.take(Rows["RE"]))
+
+
+  ######################################################
+
+
+  def _getOutputTargets(self):
+    # output layers of each units class as (driver,file path,layer name,geometry type,attributes,options) tuples
+    Format = self._getOutputFormat()
+    Targets = dict()
+
+    for UnitsClass,GeometryType,AttributesDef,UnitsData,FileShp,FileJson in self._getOutputClasses():
+      if Format == 'gpkg':
+        Targets[UnitsClass] = [(BoogieScape._GPKGDriver,self.getOutputPath(self._GPKGFile),UnitsClass,
+                                GeometryType,AttributesDef,None)]
+      elif Format == 'fgb':
+        Targets[UnitsClass] = [(BoogieScape._FGBDriver,self.getOutputPath(UnitsClass+".fgb"),UnitsClass,
+                                GeometryType,AttributesDef,["SPATIAL_INDEX=YES"])]
+      else:
+        Targets[UnitsClass] = [(BoogieScape._SHPDriver,self.getOutputPath(FileShp),os.path.splitext(FileShp)[0],
+                                GeometryType,AttributesDef,None),
+                               (BoogieScape._GeoJSONDriver,self.getOutputPath(FileJson),os.path.splitext(FileJson)[0],
+                                GeometryType,AttributesDef,self._getGeoJSONOptions())]
+
+    return Targets
+
+
+  ######################################################
+
+
+  def _streamOutputUnits(self,Targets,UnitsData):
+    # output files and layers are created at their first units, then kept opened until the end of the stage
+    if not len(UnitsData):
+      return
+
+    for Driver,FilePath,LayerName,GeometryType,AttributesDef,Options in Targets:
+      if FilePath not in self._StreamSources:
+        self._StreamSources[FilePath] = BoogieScape._createGISfile(Driver,FilePath,Verbose=False)
+
+      Key = (FilePath,LayerName)
+      if Key not in self._StreamLayers:
+        self._StreamLayers[Key] = BoogieScape._createGISlayer(self._StreamSources[FilePath],LayerName,
+                                                              GeometryType,AttributesDef,Options)
+
+      Layer = self._StreamLayers[Key]
+      if Driver is BoogieScape._GPKGDriver:
+        Layer.StartTransaction()
+      BoogieScape._writeGISfeatures(Layer,AttributesDef,UnitsData,self._getGeometryTransform())
+      if Driver is BoogieScape._GPKGDriver:
+        Layer.CommitTransaction()
+
+
+  ######################################################
+
+
+  def _processPartitions(self):
+    BoogieScape._printStage("Processing partitions")
+
+    if self._getOutputFormat() == 'fgb' and BoogieScape._FGBDriver is None:
+      BoogieScape._printActionStarted("Checking FlatGeobuf driver")
+      BoogieScape._printActionFailed("Failed (not available in this GDAL version)")
+
+    FilePath = self.getOutputPath(self._DomainFluidXFile)
+    Compress = self._extraArgs.get("compress_fluidx")
+    if Compress:
+      FilePath += ".gz"
+
+    Targets = self._getOutputTargets()
+    ColOrders = { Class[0] : Class[2].keys() for Class in self._getOutputClasses() }
+    Workers = self._extraArgs.get("partition_workers") or 1
+    self._StreamedCounts = { "AP" : 0, "GU" : 0 }
+
+    with FluidX.DomainWriter(FilePath,ColOrders,Compress,self._getFluidXFormats()) as Domain, \
+         contextlib.ExitStack() as Stack:
+      # partitions are processed by worker processes when more than one worker is requested,
+      # and written in their order, with at most two partitions per worker being processed ahead
+      Executor = None
+      if Workers > 1:
+        Executor = Stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=Workers))
+      Pending = collections.deque()
+      Next = 0
+
+      for Index in range(len(self._Partitions)):
+        while Executor is not None and Next < len(self._Partitions) and len(Pending) < 2*Workers:
+          Pending.append(Executor.submit(BoogieScape._processPartition,*self._getPartitionArgs(self._Partitions[Next])))
+          Next += 1
+
+        BoogieScape._printActionStarted("Processing partition {}/{}".format(Index+1,len(self._Partitions)))
+        try:
+          if Executor is not None:
+            Results = Pending.popleft().result()
+          else:
+            Results = BoogieScape._processPartition(*self._getPartitionArgs(self._Partitions[Index]))
+        except BoogieScapeError as E:
+          BoogieScape._printActionFailed(str(E),E.Code)
+        self._Partitions[Index] = None
+
+        Part = BoogieScape(self._inputPath,self._outputPath,self._extraArgs)
+        Part._RSData,Part._SUData,Part._REData,Part._APData,Part._GUData,GULinks = Results
+
+        # GU IDs are shifted after the GU of the previous partitions
+        Offset = self._StreamedCounts["GU"]
+        GUData = dict()
+        for Unit in Part._GUData.values():
+          Unit.Id += Offset
+          GUData[Unit.Id] = Unit
+        Part._GUData = GUData
+        Data.extendRelations(Part._SUData,"To",GULinks["SU"][0],"GU",[Id+Offset for Id in GULinks["SU"][1]])
+        Data.extendRelations(Part._REData,"To",GULinks["RE"][0],"GU",[Id+Offset for Id in GULinks["RE"][1]])
+
+        for UnitsClass,GeometryType,AttributesDef,UnitsData,FileShp,FileJson in Part._getOutputClasses():
+          self._streamOutputUnits(Targets[UnitsClass],UnitsData)
+          Domain.writeUnits(UnitsClass,UnitsData)
+
+        self._StreamedCounts["AP"] += len(Part._APData)
+        self._StreamedCounts["GU"] += len(Part._GUData)
+        BoogieScape._printActionDone("{} units, {} GU".format(len(Part._RSData)+len(Part._SUData)+len(Part._REData),
+                                                            len(Part._GUData)))
+
+    BoogieScape._printActionStarted("Closing output GIS files")
+    self._StreamLayers = dict()
+    self._StreamSources = dict()
+    BoogieScape._printActionDone()
+
+    self._writeQGISProject()
+    self._writeDatastoreFluidXfile()
+
+
+  ######################################################
+
+
+  def _deriveConnectivity(self):
+    BoogieScape._printStage("Deriving SU connectivity")
+
+    Mode = self._extraArgs.get("derive_connectivity")
+
+    BoogieScape._printActionStarted("Connecting SU without OFLD_TO to {} RS or RE".format(Mode))
+    Links,Unmatched = Connectivity.deriveLinks(self._SUData,[("RS",self._RSData),("RE",self._REData)],Mode)
+    for TargetClass,(SUIds,TargetIds) in Links.items():
+      Data.extendRelations(self._SUData,"To",SUIds,TargetClass,TargetIds)
+    BoogieScape._printActionDone("{} links derived, {} SU not connected".format(sum(len(L[0]) for L in Links.values()),
+                                                                                len(Unmatched)))
+
+
+  ######################################################
+
+
+  def _computeProcessOrders(self):
+    BoogieScape._printStage("Computing process orders")
+
+    BoogieScape._printActionStarted("Building units graph")
+    AllData = { "AP" : self._APData, "GU" : self._GUData, "RE" : self._REData, "RS" : self._RSData, "SU" : self._SUData }
+    G = networkx.DiGraph()
+    for UnitsClass,UnitsData in AllData.items():
+      for Id,Unit in UnitsData.items():
+        G.add_node((UnitsClass,Id))
+        for ToUnit in Unit.To:
+          if ToUnit is not None and ToUnit[0] in AllData and ToUnit[1] in AllData[ToUnit[0]]:
+            G.add_edge((UnitsClass,Id),(ToUnit[0],ToUnit[1]))
+    BoogieScape._printActionDone()
+
+    BoogieScape._printActionStarted("Computing topological levels")
+    Levels = Topology.computeLevels(G)
+    BoogieScape._printActionDone("{} levels".format(max(Levels.values(),default=0)))
+
+    BoogieScape._printActionStarted("Setting process orders")
+    for UnitsClass,UnitsData in AllData.items():
+      Ids = list(UnitsData.keys())
+      Data.setPcsOrds(UnitsData,Ids,[Levels[(UnitsClass,Id)] for Id in Ids])
+    BoogieScape._printActionDone()
+
+
+  ######################################################
+
+
+  def _validate(self,WriteReport=True):
+    BoogieScape._printStage("Validating inputs")
+
+    BoogieScape._printActionStarted("Checking input units")
+    Report = Validation.getReport(Validation.validate({ "RS" : self._RSData, "SU" : self._SUData, "RE" : self._REData }))
+    BoogieScape._printActionDone("{} errors, {} warnings".format(Report['errors'],Report['warnings']))
+
+    if not self._isQuiet():
+      for Issue in Report['issues']:
+        print("   [{}] {}: {}".format(Issue['severity'],Issue['code'],Issue['message']))
+
+    self._ValidationReport = Report
+
+    if WriteReport:
+      BoogieScape._printActionStarted("Writing validation report")
+      Validation.writeReport(Report,self.getOutputPath(self._ValidationFile))
+      BoogieScape._printActionDone()
+
+    if not Report['valid']:
+      BoogieScape._printActionStarted("Checking validation results")
+      BoogieScape._printActionFailed("Failed ({} errors, see {})".format(Report['errors'],
+                                     self._ValidationFile if WriteReport else "validation report"),Fatal=2)
+
+    return Report
+
+
+  ######################################################
+
+
+  def _getUnitsCounts(self):
+    Counts = { "AP" : len(self._APData), "GU" : len(self._GUData), "RE" : len(self._REData),
+               "RS" : len(self._RSData), "SU" : len(self._SUData) }
+    # AP and GU of the partitioned mode are not kept once written
+    Counts.update(self._StreamedCounts)
+    return Counts
+
+
+  ######################################################
+
+
+  def _writeRunReport(self):
+    BoogieScape._printActionStarted("Writing run report")
+    self._Instrumentation.writeReport(self.getOutputPath(self._RunReportFile),
+                                      { 'input' : os.path.abspath(self._inputPath),
+                                        'output' : os.path.abspath(self._outputPath),
+                                        'options' : self._extraArgs })
     BoogieScape._printActionDone()
 
 
   ######################################################
 
 
+  def _getStages(self,WriteOutputs=True):
+    ValidateOnly = self._extraArgs.get("validate_only")
+
+    Stages = [("prepare",lambda: self._prepare(WriteOutputs))]
+    if self._extraArgs.get("derive_connectivity"):
+      Stages.append(("connectivity",self._deriveConnectivity))
+    if self._extraArgs.get("validate") or ValidateOnly:
+      Stages.append(("validate",lambda: self._validate(WriteOutputs)))
+    if not ValidateOnly and self._isPartitioned():
+      Stages += [("cleanup",self._cleanup),("partition",self._buildPartitions),
+                 ("process-partitions",self._processPartitions)]
+    elif not ValidateOnly:
+      Stages += [("create-AP",self._createAP),("create-GU",self._createGU)]
+      if self._extraArgs.get("auto_pcsorder"):
+        Stages.append(("process-orders",self._computeProcessOrders))
+      Stages.append(("cleanup",self._cleanup))
+      if WriteOutputs:
+        Stages.append(("write-outputs",self._writeOutputFiles))
+
+    return Stages
+
+
+  ######################################################
+
+
+  def _runStages(self,Stages,WriteReport=False):
+    # failed runs are also ended and reported, once their output directory is created
+    self._Instrumentation.begin()
+    Status = "failed"
+    Error = None
+
+    # Python allocations peaks of the stages are recorded only when tracing
+    TraceMemory = self._extraArgs.get("trace_memory",False) and not tracemalloc.is_tracing()
+    if TraceMemory:
+      tracemalloc.start()
+
+    try:
+      for Name,Stage in Stages:
+        with self._Instrumentation.stage(Name) as Event:
+          Stage()
+          Event['units'] = self._getUnitsCounts()
+      Status = "ok"
+    except BaseException as E:
+      Error = Instrumentation.getErrorText(E)
+      raise
+    finally:
+      self._Instrumentation.end(Status,self._getUnitsCounts(),Error)
+      if WriteReport and self._OutputCreated:
+        self._writeRunReport()
+      if TraceMemory:
+        tracemalloc.stop()
+
+
+  ######################################################
+
+
   def run(self):
-    self._prepare()
-    self._createAP()
-    self._createGU()
-    self._cleanup()
+    if self._isPartitioned():
+      # these stages need the geometries or the graph of the whole domain
+      Unavailable = [Option for Option in ["derive_connectivity","auto_pcsorder","export_graph_view","graph_view_per_gu"]
+                     if self._extraArgs.get(Option)]
+      if Unavailable:
+        BoogieScape._printActionStarted("Checking options")
+        BoogieScape._printActionFailed("Failed ({} not available in partitioned mode)".format(", ".join(Unavailable)))
+      if self._Inputs:
+        BoogieScape._printActionStarted("Checking inputs")
+        BoogieScape._printActionFailed("Failed (partitioned mode reads input files only)")
+
+    self._runStages(self._getStages(),WriteReport=True)
+
+
+  ######################################################
+
+
+  def process(self):
+    # runs the stages without any file output, the results being then available
+    # from getUnitsData(), getDomainFluidX() and getDatastoreFluidX(), and written by writeOutputs()
+    if self._isPartitioned():
+      BoogieScape._printActionStarted("Checking options")
+      BoogieScape._printActionFailed("Failed (partitioned mode writes its results while processing)")
+
+    if self._extraArgs.get("export_graph_view") or self._extraArgs.get("graph_view_per_gu"):
+      BoogieScape._printActionStarted("Checking options")
+      BoogieScape._printActionFailed("Failed (graph views are written to the output directory, use run())")
+
+    self._runStages(self._getStages(WriteOutputs=False))
+    return self.getUnitsData()
+
+
+  ######################################################
+
+
+  def getUnitsData(self):
+    return { "AP" : self._APData, "GU" : self._GUData, "RE" : self._REData, "RS" : self._RSData, "SU" : self._SUData }
+
+
+  ######################################################
+
+
+  def getValidationReport(self):
+    return self._ValidationReport
+
+
+  ######################################################
+
+
+  def getDomainFluidX(self):
+    Buffer = io.StringIO()
+    with FluidX.FluidXWriter(Buffer) as Writer:
+      self._writeDomainFluidX(Writer)
+    return Buffer.getvalue()
+
+
+  ######################################################
+
+
+  def getDatastoreFluidX(self):
+    Buffer = io.StringIO()
+    with FluidX.FluidXWriter(Buffer) as Writer:
+      self._writeDatastoreFluidX(Writer)
+    return Buffer.getvalue()
+
+
+  ######################################################
+
+
+  def writeOutputs(self,OutputPath=None):
+    # output path can be a GDAL virtual path (e.g. /vsimem/zone), existing files are overwritten
+    if OutputPath:
+      self._outputPath = OutputPath
+    if not BoogieScape._isVirtualPath(self._outputPath):
+      os.makedirs(self._outputPath,exist_ok=True)
     self._writeOutputFiles()
@@ -0,0 +1,146 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+
+from . import Data
+
+
+######################################################
+######################################################
+
+
+# to be incremented when the content of cached stages changes
+CacheVersion = 2
+
+
+######################################################
+######################################################
+
+
+def hashValues(*Values):
+  Hash = hashlib.sha256()
+  Hash.update(str(CacheVersion).encode())
+  for Value in Values:
+    Hash.update(pickle.dumps(Value,protocol=4))
+  return Hash.hexdigest()
+
+
+######################################################
+######################################################
+
+
+def hashFiles(FilesPaths):
+  Hash = hashlib.sha256()
+  for FilePath in sorted(FilesPaths):
+    Hash.update(os.path.basename(FilePath).encode())
+    with open(FilePath,'rb') as File:
+      for Chunk in iter(lambda: File.read(1048576),b''):
+        Hash.update(Chunk)
+  return Hash.hexdigest()
+
+
+######################################################
+######################################################
+
+
+def hashShapefile(FilePath):
+  # hashes of all files of the shapefile (.shp, .shx, .dbf, .prj, ...), by extension
+  BasePath = os.path.splitext(FilePath)[0]
+  Hashes = dict()
+  for Path in glob.glob(glob.escape(BasePath)+".*"):
+    Hashes[os.path.splitext(Path)[1].lower()] = hashFiles([Path])
+  return Hashes
+
+
+######################################################
+######################################################
+
+
+def hashUnits(UnitsData,Fields=(),WithRelations=False):
+  Hash = hashlib.sha256()
+
+  if isinstance(UnitsData,Data.UnitsStore):
+    Hash.update(UnitsData.getIds().tobytes())
+    for Field in Fields:
+      if UnitsData.hasNumericColumn(Field):
+        Hash.update(UnitsData.getColumn(Field).tobytes())
+        Mask = UnitsData.getMask(Field)
+        if Mask is not None:
+          Hash.update(Mask.tobytes())
+      else:
+        Hash.update(pickle.dumps(UnitsData.getValues(Field),protocol=4))
+  else:
+    Hash.update(pickle.dumps(list(UnitsData.keys()),protocol=4))
+    for Field in Fields:
+      Hash.update(pickle.dumps([Unit.Attributes[Field] for Unit in UnitsData.values()],protocol=4))
+
+  if WithRelations:
+    Hash.update(pickle.dumps([list(Unit.To) for Unit in UnitsData.values()],protocol=4))
+
+  return Hash.hexdigest()
+
+
+######################################################
+######################################################
+
+
+class StageCache():
+
+  # Persistent storage of pipeline stages results, one pickle file per stage.
+  # Entries are named after the zone, the stage and the key hashing the stage inputs.
+  # Storing a new entry replaces the previous one of the same zone and stage.
+
+  def __init__(self,CacheDir,Zone):
+    self._CacheDir = CacheDir
+    self._ZonePrefix = hashlib.sha256(os.path.abspath(Zone).encode()).hexdigest()[:16]
+    os.makedirs(self._CacheDir,exist_ok=True)
+
+
+  ######################################################
+
+
+  def _getEntryPath(self,Stage,Key):
+    return os.path.join(self._CacheDir,"{}-{}-{}.pickle".format(self._ZonePrefix,Stage,Key))
+
+
+  ######################################################
+
+
+  def load(self,Stage,Key):
+    try:
+      with open(self._getEntryPath(Stage,Key),'rb') as File:
+        return pickle.load(File)
+    except Exception:
+      # unreadable entries, including entries of older code layouts (missing modules or classes), are misses
+      return None
+
+
+  ######################################################
+
+
+  def store(self,Stage,Key,Value):
+    EntryPath = self._getEntryPath(Stage,Key)
+
+    FileDesc,TmpPath = tempfile.mkstemp(dir=self._CacheDir,suffix=".tmp")
+    with os.fdopen(FileDesc,'wb') as File:
+      pickle.dump(Value,File,protocol=4)
+    os.replace(TmpPath,EntryPath)
+
+    for OldPath in glob.glob(os.path.join(glob.escape(self._CacheDir),"{}-{}-*.pickle".format(self._ZonePrefix,Stage))):
+      if OldPath != EntryPath:
+        os.remove(OldPath)
@@ -0,0 +1,252 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Derivation of missing SU links to RS/RE from geometries, using a STR-packed R-tree
+# over the envelopes of the target units (O(n log n) build, O(log n) queries).
+
+
+import heapq
+import math
+
+import numpy
+
+
+######################################################
+######################################################
+
+
+ConnectivityModes = ['nearest','boundary']
+
+
+######################################################
+######################################################
+
+
+def getEnvelopes(Geometries):
+  # (minx,miny,maxx,maxy) rows, OGR envelopes being (minx,maxx,miny,maxy)
+  Boxes = numpy.empty((len(Geometries),4),dtype=numpy.float64)
+  for i,Geom in enumerate(Geometries):
+    MinX,MaxX,MinY,MaxY = Geom.GetEnvelope()
+    Boxes[i] = (MinX,MinY,MaxX,MaxY)
+  return Boxes
+
+
+######################################################
+######################################################
+
+
+def getBoxDistance(Boxes,Box):
+  DX = numpy.maximum(numpy.maximum(Boxes[:,0]-Box[2],Box[0]-Boxes[:,2]),0)
+  DY = numpy.maximum(numpy.maximum(Boxes[:,1]-Box[3],Box[1]-Boxes[:,3]),0)
+  return numpy.hypot(DX,DY)
+
+
+######################################################
+######################################################
+
+
+class STRtree():
+
+  # Read-only R-tree packed with the Sort-Tile-Recursive algorithm.
+  # Level 0 holds the items boxes, each upper level holds the boxes of groups of NodeCapacity
+  # entries of the level below, listed in the _Perms order of that level.
+
+  def __init__(self,Boxes,NodeCapacity=10):
+    self._Capacity = NodeCapacity
+    self._Boxes = [numpy.asarray(Boxes,dtype=numpy.float64).reshape(-1,4)]
+    self._Perms = [None]
+
+    while len(self._Boxes[-1]) > 1:
+      Perm = self._sortTileRecursive(self._Boxes[-1])
+      Sorted = self._Boxes[-1][Perm]
+      Starts = numpy.arange(0,len(Sorted),self._Capacity)
+      NodeBoxes = numpy.empty((len(Starts),4),dtype=numpy.float64)
+      NodeBoxes[:,0] = numpy.minimum.reduceat(Sorted[:,0],Starts)
+      NodeBoxes[:,1] = numpy.minimum.reduceat(Sorted[:,1],Starts)
+      NodeBoxes[:,2] = numpy.maximum.reduceat(Sorted[:,2],Starts)
+      NodeBoxes[:,3] = numpy.maximum.reduceat(Sorted[:,3],Starts)
+      self._Perms.append(Perm)
+      self._Boxes.append(NodeBoxes)
+
+
+  ######################################################
+
+
+  def _sortTileRecursive(self,Boxes):
+    Count = len(Boxes)
+    LeavesCount = int(math.ceil(Count/self._Capacity))
+    SlicesCount = int(math.ceil(math.sqrt(LeavesCount)))
+    SliceSize = SlicesCount*self._Capacity
+
+    CentersX = Boxes[:,0]+Boxes[:,2]
+    CentersY = Boxes[:,1]+Boxes[:,3]
+
+    Perm = numpy.argsort(CentersX,kind='stable')
+    for Start in range(0,Count,SliceSize):
+      Slice = Perm[Start:Start+SliceSize]
+      Perm[Start:Start+SliceSize] = Slice[numpy.argsort(CentersY[Slice],kind='stable')]
+
+    return Perm
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return len(self._Boxes[0])
+
+
+  ######################################################
+
+
+  def _getChildren(self,Level,Node):
+    return self._Perms[Level][Node*self._Capacity:(Node+1)*self._Capacity]
+
+
+  ######################################################
+
+
+  def query(self,Box):
+    # indices of the items whose box intersects the given box
+    if not len(self):
+      return []
+
+    Box = numpy.asarray(Box,dtype=numpy.float64)
+    Found = list()
+    Stack = [(len(self._Boxes)-1,numpy.arange(len(self._Boxes[-1])))]
+
+    while Stack:
+      Level,Entries = Stack.pop()
+      Boxes = self._Boxes[Level][Entries]
+      Hits = Entries[(Boxes[:,0] <= Box[2]) & (Boxes[:,2] >= Box[0]) & (Boxes[:,1] <= Box[3]) & (Boxes[:,3] >= Box[1])]
+      if Level == 0:
+        Found.extend(Hits.tolist())
+      else:
+        for Node in Hits.tolist():
+          Stack.append((Level-1,self._getChildren(Level,Node)))
+
+    return sorted(Found)
+
+
+  ######################################################
+
+
+  def nearest(self,Box,DistanceFunc=None):
+    # (index,distance) of the nearest item, by best-first search on the boxes distances,
+    # which are lower bounds of the exact distances given by DistanceFunc(index)
+    if not len(self):
+      return None,None
+
+    Box = numpy.asarray(Box,dtype=numpy.float64)
+    Top = len(self._Boxes)-1
+    Heap = list()
+    for Node,Distance in enumerate(getBoxDistance(self._Boxes[Top],Box).tolist()):
+      heapq.heappush(Heap,(Distance,0,Top,Node))
+
+    while Heap:
+      Distance,Exact,Level,Index = heapq.heappop(Heap)
+
+      if Exact or (Level == 0 and DistanceFunc is None):
+        return Index,Distance
+
+      if Level == 0:
+        heapq.heappush(Heap,(DistanceFunc(Index),1,0,Index))
+      else:
+        Children = self._getChildren(Level,Index)
+        Distances = getBoxDistance(self._Boxes[Level-1][Children],Box)
+        for Child,ChildDistance in zip(Children.tolist(),Distances.tolist()):
+          heapq.heappush(Heap,(ChildDistance,0,Level-1,Child))
+
+    return None,None
+
+
+######################################################
+######################################################
+
+
+def findNearest(Tree,TargetsGeometries,Geom):
+  Index,Distance = Tree.nearest(getEnvelopes([Geom])[0],lambda i: Geom.Distance(TargetsGeometries[i]))
+  return Index
+
+
+######################################################
+######################################################
+
+
+def findSharedBoundary(Tree,TargetsGeometries,Geom):
+  # target sharing the longest part of the unit boundary, or touching it
+  Boundary = None
+  Best = None
+  BestLength = -1.0
+
+  for Index in Tree.query(getEnvelopes([Geom])[0]):
+    Target = TargetsGeometries[Index]
+    if not Geom.Intersects(Target):
+      continue
+    if Boundary is None:
+      Boundary = Geom.Boundary()
+    Length = 0.0
+    Shared = Boundary.Intersection(Target)
+    if Shared is not None:
+      Length = Shared.Length()
+    if Length > BestLength:
+      Best = Index
+      BestLength = Length
+
+  return Best
+
+
+######################################################
+######################################################
+
+
+def deriveLinks(UnitsData,Targets,Mode='nearest'):
+  # links of the units without To links to the nearest (or sharing boundary) target unit,
+  # Targets being a list of (class,units data) pairs.
+  # Returns the links by target class as (units IDs,targets IDs) lists, and the IDs of the unmatched units.
+
+  TargetsKeys = list()
+  TargetsGeometries = list()
+  for TargetClass,TargetData in Targets:
+    for Id,Unit in TargetData.items():
+      Geom = Unit.Geometry
+      if Geom is not None and not Geom.IsEmpty():
+        TargetsKeys.append((TargetClass,Id))
+        TargetsGeometries.append(Geom)
+
+  Tree = STRtree(getEnvelopes(TargetsGeometries))
+
+  Links = dict()
+  Unmatched = list()
+
+  for Id,Unit in UnitsData.items():
+    if len(Unit.To):
+      continue
+
+    Geom = Unit.Geometry
+    Index = None
+    if Geom is not None and not Geom.IsEmpty():
+      if Mode == 'boundary':
+        Index = findSharedBoundary(Tree,TargetsGeometries,Geom)
+      else:
+        Index = findNearest(Tree,TargetsGeometries,Geom)
+
+    if Index is None:
+      Unmatched.append(Id)
+    else:
+      TargetClass,TargetId = TargetsKeys[Index]
+      ClassLinks = Links.setdefault(TargetClass,([],[]))
+      ClassLinks[0].append(Id)
+      ClassLinks[1].append(TargetId)
+
+  return Links,Unmatched
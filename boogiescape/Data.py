@@ -11,6 +11,37 @@ __email__ = "jean-christophe.fabre@inra.fr"
 ######################################################
 
 
+import collections.abc
+import copy
+
+import numpy
+
+
+######################################################
+######################################################
+
+
+def exportGeometry(Geometry):
+  if Geometry is None or isinstance(Geometry,bytes):
+    return Geometry
+  return bytes(Geometry.ExportToWkb())
+
+
+######################################################
+######################################################
+
+
+def importGeometry(Geometry):
+  if Geometry is None or not isinstance(Geometry,bytes):
+    return Geometry
+  from osgeo import ogr
+  return ogr.CreateGeometryFromWkb(Geometry)
+
+
+######################################################
+######################################################
+
+
 class SpatialUnit():
 
   def __init__(self):
@@ -22,4 +53,959 @@ class SpatialUnit():
 
     self.Attributes = dict()
 
-    self.Geometry = None
\ No newline at end of file
+    self.Geometry = None
+
+
+  ######################################################
+
+
+  def __getstate__(self):
+    # OGR geometries are pickled as WKB
+    State = self.__dict__.copy()
+    State['Geometry'] = exportGeometry(self.Geometry)
+    return State
+
+
+  ######################################################
+
+
+  def __setstate__(self,State):
+    self.__dict__.update(State)
+    self.Geometry = importGeometry(self.Geometry)
+
+
+  ######################################################
+
+
+  @property
+  def RawGeometry(self):
+    return self.Geometry
+
+
+######################################################
+######################################################
+
+
+class Column():
+
+  # Values of a single field for all units of a class.
+  # Integer and real values are held in NumPy arrays, with a mask for missing (None) values.
+  # Any other values (strings, mixed types) are held in an object array.
+
+  __slots__ = ('Values','Mask')
+
+  def __init__(self,Values,Kind):
+    self.Mask = None
+
+    if isinstance(Values,numpy.ndarray):
+      # arrays (possibly masked) read in bulk are kept as is when their type matches the field type
+      Array = numpy.ma.getdata(Values)
+      if (Kind == 'int' and Array.dtype.kind == 'i') or (Kind == 'real' and Array.dtype.kind == 'f'):
+        self.Values = Array.astype(numpy.int64 if Kind == 'int' else numpy.float64,copy=False)
+        Mask = numpy.ma.getmaskarray(Values)
+        if Mask.any():
+          self.Mask = Mask
+        return
+      Values = Values.tolist()
+
+    if (Kind == 'int' or Kind == 'real') and len(Values):
+      if None in Values:
+        Default = 0 if Kind == 'int' else numpy.nan
+        Array = numpy.array([Default if V is None else V for V in Values])
+        Mask = numpy.fromiter((V is None for V in Values),dtype=bool,count=len(Values))
+      else:
+        Array = numpy.array(Values)
+        Mask = None
+
+      # values are converted only when the array type matches the field type, so that they are read back unchanged
+      if (Kind == 'int' and Array.dtype.kind == 'i') or (Kind == 'real' and Array.dtype.kind == 'f'):
+        self.Values = Array.astype(numpy.int64 if Kind == 'int' else numpy.float64,copy=False)
+        self.Mask = Mask
+        return
+
+    self.Values = numpy.empty(len(Values),dtype=object)
+    self.Values[:] = list(Values)
+
+
+  ######################################################
+
+
+  @staticmethod
+  def fromArray(Values,Mask=None):
+    Col = Column([],'str')
+    Col.Values = Values
+    Col.Mask = Mask
+    return Col
+
+
+  ######################################################
+
+
+  def isNumeric(self):
+    return self.Values.dtype != object
+
+
+  ######################################################
+
+
+  def get(self,Row):
+    if self.Mask is not None and self.Mask[Row]:
+      return None
+    if self.Values.dtype == object:
+      return self.Values[Row]
+    return self.Values[Row].item()
+
+
+  ######################################################
+
+
+  def _acceptsValue(self,Value):
+    if isinstance(Value,bool):
+      return False
+    if self.Values.dtype.kind == 'f':
+      return isinstance(Value,float)
+    return isinstance(Value,(int,numpy.integer)) and -2**63 <= Value < 2**63
+
+
+  ######################################################
+
+
+  def set(self,Row,Value):
+    if self.Values.dtype != object:
+      if Value is None:
+        if self.Mask is None:
+          self.Mask = numpy.zeros(len(self.Values),dtype=bool)
+        self.Mask[Row] = True
+        return
+      if not self._acceptsValue(Value):
+        # values not matching the column type are kept as is
+        self.Values = self.toObjectArray()
+        self.Mask = None
+
+    self.Values[Row] = Value
+    if self.Mask is not None:
+      self.Mask[Row] = False
+
+
+  ######################################################
+
+
+  def toObjectArray(self):
+    Values = numpy.empty(len(self.Values),dtype=object)
+    Values[:] = self.tolist()
+    return Values
+
+
+  ######################################################
+
+
+  def tolist(self):
+    Values = self.Values.tolist()
+    if self.Mask is not None:
+      for Row in numpy.flatnonzero(self.Mask).tolist():
+        Values[Row] = None
+    return Values
+
+
+  ######################################################
+
+
+  def take(self,Rows):
+    Mask = None
+    if self.Mask is not None:
+      Mask = self.Mask[Rows]
+    return Column.fromArray(self.Values[Rows],Mask)
+
+
+######################################################
+######################################################
+
+
+class Relations():
+
+  # Links ([class,ID] pairs) of all units of a class, int-encoded in CSR arrays.
+  # Rows modified one at a time are kept as Python lists until the next compaction,
+  # as well as rows with links that cannot be int-encoded without changing their output.
+
+  def __init__(self,RowsLinks):
+    self._ClassNames = list()
+    self._ClassCodes = dict()
+    self._Lists = dict()
+
+    Counts = numpy.zeros(len(RowsLinks),dtype=numpy.int64)
+    Codes = list()
+    Ids = list()
+
+    for Row,Links in enumerate(RowsLinks):
+      if not Links:
+        continue
+      Encoded = self._encodeLinks(Links)
+      if Encoded is None:
+        self._Lists[Row] = [list(Link) if Link is not None else None for Link in Links]
+      else:
+        Counts[Row] = len(Links)
+        Codes.extend(Encoded[0])
+        Ids.extend(Encoded[1])
+
+    self._Offsets = numpy.zeros(len(RowsLinks)+1,dtype=numpy.int64)
+    numpy.cumsum(Counts,out=self._Offsets[1:])
+    self._Codes = numpy.array(Codes,dtype=numpy.int16)
+    self._Ids = numpy.array(Ids,dtype=numpy.int64)
+
+
+  ######################################################
+
+
+  def _getCode(self,ClassName):
+    Code = self._ClassCodes.get(ClassName)
+    if Code is None:
+      Code = len(self._ClassNames)
+      self._ClassNames.append(ClassName)
+      self._ClassCodes[ClassName] = Code
+    return Code
+
+
+  ######################################################
+
+
+  def _encodeLinks(self,Links):
+    Codes = list()
+    Ids = list()
+    for Link in Links:
+      if Link is None or len(Link) != 2 or not isinstance(Link[0],str):
+        return None
+      Id = Link[1]
+      if isinstance(Id,str):
+        try:
+          IntId = int(Id)
+        except ValueError:
+          return None
+        if str(IntId) != Id:
+          return None
+        Id = IntId
+      elif isinstance(Id,bool) or not isinstance(Id,int) or not -2**63 <= Id < 2**63:
+        return None
+      Codes.append(self._getCode(Link[0]))
+      Ids.append(Id)
+    return Codes,Ids
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return len(self._Offsets)-1
+
+
+  ######################################################
+
+
+  def getLinks(self,Row):
+    if Row in self._Lists:
+      return self._Lists[Row]
+    Begin = self._Offsets[Row]
+    End = self._Offsets[Row+1]
+    return [[self._ClassNames[Code],Id] for Code,Id in zip(self._Codes[Begin:End].tolist(),self._Ids[Begin:End].tolist())]
+
+
+  ######################################################
+
+
+  def getCount(self,Row):
+    if Row in self._Lists:
+      return len(self._Lists[Row])
+    return int(self._Offsets[Row+1]-self._Offsets[Row])
+
+
+  ######################################################
+
+
+  def getEditableLinks(self,Row):
+    if Row not in self._Lists:
+      self._Lists[Row] = self.getLinks(Row)
+    return self._Lists[Row]
+
+
+  ######################################################
+
+
+  def setLinks(self,Row,Links):
+    self._Lists[Row] = [list(Link) if Link is not None else None for Link in Links]
+
+
+  ######################################################
+
+
+  def compact(self):
+    RowsLinks = [None]*len(self)
+    for Row in range(len(self)):
+      RowsLinks[Row] = self.getLinks(Row)
+    self.__init__(RowsLinks)
+
+
+  ######################################################
+
+
+  def extend(self,Rows,ClassName,Ids):
+    Rows = numpy.asarray(Rows,dtype=numpy.int64)
+    Ids = numpy.asarray(Ids,dtype=numpy.int64)
+
+    # rows held as lists get their links appended directly
+    if self._Lists:
+      InLists = numpy.fromiter((Row in self._Lists for Row in Rows.tolist()),dtype=bool,count=len(Rows))
+      for Row,Id in zip(Rows[InLists].tolist(),Ids[InLists].tolist()):
+        self._Lists[Row].append([ClassName,Id])
+      Rows = Rows[~InLists]
+      Ids = Ids[~InLists]
+
+    if not len(Rows):
+      return
+
+    Code = self._getCode(ClassName)
+    RowsCount = len(self)
+
+    Order = numpy.argsort(Rows,kind='stable')
+    Rows = Rows[Order]
+    Ids = Ids[Order]
+
+    OldCounts = numpy.diff(self._Offsets)
+    AddedCounts = numpy.bincount(Rows,minlength=RowsCount)
+
+    Offsets = numpy.zeros(RowsCount+1,dtype=numpy.int64)
+    numpy.cumsum(OldCounts+AddedCounts,out=Offsets[1:])
+
+    NewCodes = numpy.empty(Offsets[-1],dtype=numpy.int16)
+    NewIds = numpy.empty(Offsets[-1],dtype=numpy.int64)
+
+    # existing links are shifted by the number of links added to the previous rows
+    Shift = Offsets[:-1]-self._Offsets[:-1]
+    Positions = numpy.arange(len(self._Ids),dtype=numpy.int64)+numpy.repeat(Shift,OldCounts)
+    NewCodes[Positions] = self._Codes
+    NewIds[Positions] = self._Ids
+
+    # added links are placed after the existing ones of their row, in their original order
+    Starts = numpy.cumsum(AddedCounts)-AddedCounts
+    Ranks = numpy.arange(len(Rows),dtype=numpy.int64)-Starts[Rows]
+    Positions = Offsets[Rows]+OldCounts[Rows]+Ranks
+    NewCodes[Positions] = Code
+    NewIds[Positions] = Ids
+
+    self._Offsets = Offsets
+    self._Codes = NewCodes
+    self._Ids = NewIds
+
+
+  ######################################################
+
+
+  def take(self,Rows):
+    return Relations([self.getLinks(Row) for Row in Rows])
+
+
+######################################################
+######################################################
+
+
+class LinksView(collections.abc.Sequence):
+
+  __slots__ = ('_Relations','_Row')
+
+  def __init__(self,Rels,Row):
+    self._Relations = Rels
+    self._Row = Row
+
+
+  ######################################################
+
+
+  def __getitem__(self,Index):
+    return self._Relations.getLinks(self._Row)[Index]
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return self._Relations.getCount(self._Row)
+
+
+  ######################################################
+
+
+  def __iter__(self):
+    return iter(self._Relations.getLinks(self._Row))
+
+
+  ######################################################
+
+
+  def __eq__(self,Other):
+    return list(self) == list(Other)
+
+
+  ######################################################
+
+
+  def __repr__(self):
+    return repr(list(self))
+
+
+  ######################################################
+
+
+  def append(self,Link):
+    self._Relations.getEditableLinks(self._Row).append(Link)
+
+
+  ######################################################
+
+
+  def extend(self,Links):
+    self._Relations.getEditableLinks(self._Row).extend(Links)
+
+
+######################################################
+######################################################
+
+
+class AttributesView(collections.abc.MutableMapping):
+
+  __slots__ = ('_Store','_Row')
+
+  def __init__(self,Store,Row):
+    self._Store = Store
+    self._Row = Row
+
+
+  ######################################################
+
+
+  def __getitem__(self,Name):
+    return self._Store._Columns[Name].get(self._Row)
+
+
+  ######################################################
+
+
+  def __setitem__(self,Name,Value):
+    self._Store._getOrCreateColumn(Name).set(self._Row,Value)
+
+
+  ######################################################
+
+
+  def __delitem__(self,Name):
+    raise TypeError("attributes of stored units cannot be deleted")
+
+
+  ######################################################
+
+
+  def __contains__(self,Name):
+    return Name in self._Store._Columns
+
+
+  ######################################################
+
+
+  def __iter__(self):
+    return iter(self._Store._Columns)
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return len(self._Store._Columns)
+
+
+######################################################
+######################################################
+
+
+class UnitView():
+
+  # SpatialUnit-like access to a single unit of a UnitsStore
+
+  __slots__ = ('_Store','_Row')
+
+  def __init__(self,Store,Row):
+    self._Store = Store
+    self._Row = Row
+
+
+  ######################################################
+
+
+  def getRow(self):
+    return self._Row
+
+
+  ######################################################
+
+
+  @property
+  def Id(self):
+    return self._Store._Ids[self._Row].item()
+
+
+  ######################################################
+
+
+  @property
+  def PcsOrd(self):
+    return self._Store._PcsOrds.get(self._Row)
+
+  @PcsOrd.setter
+  def PcsOrd(self,Value):
+    self._Store._PcsOrds.set(self._Row,Value)
+
+
+  ######################################################
+
+
+  @property
+  def To(self):
+    return LinksView(self._Store._To,self._Row)
+
+  @To.setter
+  def To(self,Links):
+    self._Store._To.setLinks(self._Row,Links)
+
+
+  ######################################################
+
+
+  @property
+  def Child(self):
+    return LinksView(self._Store._Child,self._Row)
+
+  @Child.setter
+  def Child(self,Links):
+    self._Store._Child.setLinks(self._Row,Links)
+
+
+  ######################################################
+
+
+  @property
+  def Attributes(self):
+    return AttributesView(self._Store,self._Row)
+
+
+  ######################################################
+
+
+  @property
+  def Geometry(self):
+    # geometries loaded as WKB are built on each access, changes must be assigned back
+    return importGeometry(self._Store._Geometries[self._Row])
+
+  @Geometry.setter
+  def Geometry(self,Value):
+    self._Store._Geometries[self._Row] = Value
+
+
+  ######################################################
+
+
+  @property
+  def RawGeometry(self):
+    # geometry as stored, WKB bytes or geometry object
+    return self._Store._Geometries[self._Row]
+
+
+######################################################
+######################################################
+
+
+class UnitsStore(collections.abc.Mapping):
+
+  # Columnar storage of all units of a class, mapping units IDs to UnitView objects.
+  # Fields values are held as one Column per field, links as int-encoded Relations.
+
+  def __init__(self,UnitsClass,Ids,PcsOrds,Values,Kinds,To=None,Child=None,Geometries=None):
+    self.UnitsClass = UnitsClass
+
+    Count = len(Ids)
+    Rows = self._getUniqueRows(Ids)
+
+    # position of each unit in the given data (feature index when loaded from a file)
+    self._SourceRows = numpy.arange(Count,dtype=numpy.int64) if Rows is None else numpy.array(Rows,dtype=numpy.int64)
+
+    self._DuplicateIds = list()
+    if Rows is not None:
+      Seen = set()
+      Duplicates = dict()
+      for Id in Ids:
+        if Id in Seen:
+          Duplicates[Id] = None
+        Seen.add(Id)
+      self._DuplicateIds = list(Duplicates)
+
+    if To is None:
+      To = [None]*Count
+    if Child is None:
+      Child = [None]*Count
+    if Geometries is None:
+      Geometries = [None]*Count
+
+    if Rows is not None:
+      Ids = [Ids[Row] for Row in Rows]
+      PcsOrds = PcsOrds[Rows] if isinstance(PcsOrds,numpy.ndarray) else [PcsOrds[Row] for Row in Rows]
+      Values = { Name : FieldValues[Rows] if isinstance(FieldValues,numpy.ndarray) else [FieldValues[Row] for Row in Rows]
+                 for Name,FieldValues in Values.items() }
+      To = [To[Row] for Row in Rows]
+      Child = [Child[Row] for Row in Rows]
+      Geometries = [Geometries[Row] for Row in Rows]
+
+    self._Ids = numpy.array(Ids,dtype=numpy.int64)
+    self._RowById = { Id : Row for Row,Id in enumerate(self._Ids.tolist()) }
+    self._PcsOrds = Column(PcsOrds,'int')
+
+    self._Columns = dict()
+    for Name,FieldValues in Values.items():
+      self._Columns[Name] = Column(FieldValues,Kinds.get(Name))
+
+    self._To = Relations(To)
+    self._Child = Relations(Child)
+    self._Geometries = list(Geometries)
+
+
+  ######################################################
+
+
+  def __getstate__(self):
+    # OGR geometries are pickled as WKB
+    State = self.__dict__.copy()
+    State['_Geometries'] = [exportGeometry(Geom) for Geom in self._Geometries]
+    return State
+
+
+  ######################################################
+
+
+  def __setstate__(self,State):
+    # geometries are kept as WKB until accessed
+    self.__dict__.update(State)
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _getUniqueRows(Ids):
+    # same behaviour as successive dict insertions: a duplicated ID keeps
+    # its first position with the values of its last occurrence
+    Positions = dict()
+    for Row,Id in enumerate(Ids):
+      Positions[Id] = Row
+
+    if len(Positions) == len(Ids):
+      return None
+
+    return list(Positions.values())
+
+
+  ######################################################
+
+
+  def _getOrCreateColumn(self,Name):
+    if Name not in self._Columns:
+      self._Columns[Name] = Column([None]*len(self._Ids),'str')
+    return self._Columns[Name]
+
+
+  ######################################################
+
+
+  def __getitem__(self,Id):
+    return UnitView(self,self._RowById[Id])
+
+
+  ######################################################
+
+
+  def __contains__(self,Id):
+    return Id in self._RowById
+
+
+  ######################################################
+
+
+  def __iter__(self):
+    return iter(self._Ids.tolist())
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return len(self._Ids)
+
+
+  ######################################################
+
+
+  def keys(self):
+    return self._Ids.tolist()
+
+
+  ######################################################
+
+
+  def values(self):
+    return [UnitView(self,Row) for Row in range(len(self._Ids))]
+
+
+  ######################################################
+
+
+  def items(self):
+    return [(Id,UnitView(self,Row)) for Row,Id in enumerate(self._Ids.tolist())]
+
+
+  ######################################################
+
+
+  def getRow(self,Id):
+    return self._RowById[Id]
+
+
+  ######################################################
+
+
+  def getRows(self,Ids):
+    RowById = self._RowById
+    return numpy.fromiter((RowById[Id] for Id in Ids),dtype=numpy.int64,count=len(Ids))
+
+
+  ######################################################
+
+
+  def getSourceRows(self):
+    return self._SourceRows
+
+
+  ######################################################
+
+
+  def take(self,Rows):
+    # new store with the units of the given rows, in the given order
+    Rows = numpy.asarray(Rows,dtype=numpy.int64)
+
+    Store = UnitsStore.__new__(UnitsStore)
+    Store.UnitsClass = self.UnitsClass
+    Store._Ids = self._Ids[Rows]
+    Store._RowById = { Id : Row for Row,Id in enumerate(Store._Ids.tolist()) }
+    Store._PcsOrds = self._PcsOrds.take(Rows)
+    Store._Columns = { Name : Col.take(Rows) for Name,Col in self._Columns.items() }
+    Store._To = self._To.take(Rows.tolist())
+    Store._Child = self._Child.take(Rows.tolist())
+    Store._Geometries = [self._Geometries[Row] for Row in Rows.tolist()]
+    Store._SourceRows = self._SourceRows[Rows]
+    Store._DuplicateIds = list()
+    return Store
+
+
+  ######################################################
+
+
+  def copy(self):
+    # geometries are shared, they are replaced but never modified by the stages
+    Store = self.take(range(len(self)))
+    Store._DuplicateIds = list(self._DuplicateIds)
+    return Store
+
+
+  ######################################################
+
+
+  def getDuplicateIds(self):
+    # IDs defined more than once in the units given at construction
+    return list(self._DuplicateIds)
+
+
+  ######################################################
+
+
+  def getIds(self):
+    return self._Ids
+
+
+  ######################################################
+
+
+  def getFields(self):
+    return list(self._Columns.keys())
+
+
+  ######################################################
+
+
+  def hasNumericColumn(self,Name):
+    return Name in self._Columns and self._Columns[Name].isNumeric()
+
+
+  ######################################################
+
+
+  def getColumn(self,Name):
+    return self._Columns[Name].Values
+
+
+  ######################################################
+
+
+  def getMask(self,Name):
+    return self._Columns[Name].Mask
+
+
+  ######################################################
+
+
+  def getValues(self,Name,Rows=None):
+    # values of all units, or of the given rows (slice or rows array)
+    if Rows is None:
+      return self._Columns[Name].tolist()
+    return self._Columns[Name].take(Rows).tolist()
+
+
+  ######################################################
+
+
+  def setColumn(self,Name,Values,Mask=None):
+    if len(Values) != len(self._Ids):
+      raise ValueError("column {} has {} values for {} units".format(Name,len(Values),len(self._Ids)))
+    self._Columns[Name] = Column.fromArray(numpy.asarray(Values),Mask)
+
+
+  ######################################################
+
+
+  def getGeometries(self):
+    return self._Geometries
+
+
+  ######################################################
+
+
+  def setGeometries(self,Geometries):
+    if len(Geometries) != len(self._Ids):
+      raise ValueError("{} geometries for {} units".format(len(Geometries),len(self._Ids)))
+    self._Geometries = list(Geometries)
+
+
+  ######################################################
+
+
+  def getRelations(self,Name):
+    if Name == "To":
+      return self._To
+    elif Name == "Child":
+      return self._Child
+    raise KeyError(Name)
+
+
+  ######################################################
+
+
+  def extendRelations(self,Name,UnitsIds,LinkedClass,LinkedIds):
+    self.getRelations(Name).extend(self.getRows(UnitsIds),LinkedClass,LinkedIds)
+
+
+  ######################################################
+
+
+  def setPcsOrds(self,UnitsIds,PcsOrds):
+    Values = self._PcsOrds.toObjectArray()
+    Values[self.getRows(UnitsIds)] = PcsOrds
+    self._PcsOrds = Column(Values.tolist(),'int')
+
+
+######################################################
+######################################################
+
+
+def copyUnits(UnitsData):
+  if isinstance(UnitsData,UnitsStore):
+    return UnitsData.copy()
+  return copy.deepcopy(UnitsData)
+
+
+######################################################
+######################################################
+
+
+def extendRelations(UnitsData,Name,UnitsIds,LinkedClass,LinkedIds):
+  if isinstance(UnitsData,UnitsStore):
+    UnitsData.extendRelations(Name,UnitsIds,LinkedClass,LinkedIds)
+  else:
+    for UnitId,LinkedId in zip(UnitsIds,LinkedIds):
+      getattr(UnitsData[UnitId],Name).append([LinkedClass,LinkedId])
+
+
+######################################################
+######################################################
+
+
+def setPcsOrds(UnitsData,UnitsIds,PcsOrds):
+  if isinstance(UnitsData,UnitsStore):
+    UnitsData.setPcsOrds(UnitsIds,PcsOrds)
+  else:
+    for UnitId,PcsOrd in zip(UnitsIds,PcsOrds):
+      UnitsData[UnitId].PcsOrd = PcsOrd
+
+
+######################################################
+######################################################
+
+
+class AttributeIndex():
+
+  def __init__(self,UnitsData,Field,KeyFunc=None):
+    self.Field = Field
+    self._Index = dict()
+
+    if isinstance(UnitsData,UnitsStore):
+      Pairs = zip(UnitsData.getIds().tolist(),UnitsData.getValues(Field))
+    else:
+      Pairs = ((Id,Unit.Attributes[Field]) for Id,Unit in UnitsData.items())
+
+    for Id,Value in Pairs:
+      if Value is None or Value == "":
+        continue
+      if KeyFunc:
+        Value = KeyFunc(Value)
+      if Value in self._Index:
+        self._Index[Value].append(Id)
+      else:
+        self._Index[Value] = [Id]
+
+
+  ######################################################
+
+
+  def getIds(self,Value):
+    return self._Index.get(Value,[])
+
+
+  ######################################################
+
+
+  def getValues(self):
+    return self._Index.keys()
+
+
+  ######################################################
+
+
+  def __len__(self):
+    return len(self._Index)
+
+
+  ######################################################
+
+
+  def __contains__(self,Value):
+    return Value in self._Index
@@ -0,0 +1,335 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+import collections.abc
+import gzip
+import os
+import shutil
+import tempfile
+
+from . import Data
+
+
+######################################################
+######################################################
+
+
+def indentCRStr(Indent,Str):
+  return "{}{}\n".format("  "*Indent,Str)
+
+
+######################################################
+######################################################
+
+
+def getAttributesBlocks(Units,ColOrder,BlockSize=65536):
+  # (IDs,columns values) of consecutive blocks of units, the columns of units stores being read at once
+  if isinstance(Units,Data.UnitsStore):
+    Ids = Units.getIds()
+    for Start in range(0,len(Ids),BlockSize):
+      Rows = slice(Start,Start+BlockSize)
+      yield Ids[Rows].tolist(),[Units.getValues(Name,Rows) for Name in ColOrder]
+    return
+
+  if isinstance(Units,collections.abc.Mapping):
+    Units = Units.values()
+
+  Ids = list()
+  Columns = [list() for Name in ColOrder]
+  for Unit in Units:
+    Ids.append(Unit.Id)
+    Attributes = Unit.Attributes
+    for Values,Name in zip(Columns,ColOrder):
+      Values.append(Attributes[Name])
+    if len(Ids) == BlockSize:
+      yield Ids,Columns
+      Ids = list()
+      Columns = [list() for Name in ColOrder]
+
+  if Ids:
+    yield Ids,Columns
+
+
+######################################################
+######################################################
+
+
+def getFormatTypes(Spec):
+  # number types the format spec can be applied to (e.g. int and float for '03', float only for '.2', int only for 'x')
+  Types = list()
+  for Value in [1,1.0]:
+    try:
+      format(Value,Spec)
+      Types.append(type(Value))
+    except (ValueError,TypeError):
+      pass
+  return tuple(Types)
+
+
+######################################################
+######################################################
+
+
+def formatColumn(Values,Spec=None):
+  # values formatted with str(), or numbers with the given format spec (e.g. '.2f') when it applies to their type
+  if not Spec:
+    return list(map(str,Values))
+
+  Types = getFormatTypes(Spec)
+  Formatter = ("{:"+Spec+"}").format
+  return [Formatter(V) if isinstance(V,Types) else str(V) for V in Values]
+
+
+######################################################
+######################################################
+
+
+class FluidXWriter():
+
+  # Streaming writer for FluidX files.
+  # Lines are accumulated and written by large chunks, optionally gzip-compressed.
+  # Units can be given as any iterable (including generators) of SpatialUnit-like objects.
+  # A text file object (e.g. io.StringIO) can be given instead of a file path, it is not closed by the writer.
+
+  def __init__(self,FilePath,Compress=False,BufferSize=1048576):
+    self._Owned = True
+    if hasattr(FilePath,'write'):
+      self._File = FilePath
+      self._Owned = False
+    elif Compress:
+      self._File = gzip.open(FilePath,'wt')
+    else:
+      self._File = open(FilePath,'w')
+
+    self._BufferSize = BufferSize
+    self._Chunks = list()
+    self._Size = 0
+    self._Opened = list()
+
+
+  ######################################################
+
+
+  def __enter__(self):
+    return self
+
+
+  ######################################################
+
+
+  def __exit__(self,ExcType,ExcValue,Traceback):
+    if ExcType is None:
+      self.close()
+    elif self._Owned:
+      self._File.close()
+
+
+  ######################################################
+
+
+  def write(self,Str):
+    self._Chunks.append(Str)
+    self._Size += len(Str)
+    if self._Size >= self._BufferSize:
+      self.flush()
+
+
+  ######################################################
+
+
+  def flush(self):
+    if self._Chunks:
+      self._File.write("".join(self._Chunks))
+      self._Chunks = list()
+      self._Size = 0
+
+
+  ######################################################
+
+
+  def close(self):
+    while self._Opened:
+      self.endSection()
+    self.flush()
+    if self._Owned:
+      self._File.close()
+
+
+  ######################################################
+
+
+  def beginDocument(self):
+    self.write(indentCRStr(0,'<?xml version="1.0" standalone="yes"?>'))
+    self.beginSection(0,'openfluid')
+
+
+  ######################################################
+
+
+  def beginSection(self,Indent,Tag,Attributes=""):
+    if Attributes:
+      self.write(indentCRStr(Indent,'<{} {}>'.format(Tag,Attributes)))
+    else:
+      self.write(indentCRStr(Indent,'<{}>'.format(Tag)))
+    self._Opened.append((Indent,Tag))
+
+
+  ######################################################
+
+
+  def endSection(self):
+    Indent,Tag = self._Opened.pop()
+    self.write(indentCRStr(Indent,'</{}>'.format(Tag)))
+
+
+  ######################################################
+
+
+  def writeUnit(self,UnitsClass,Id,PcsOrd,To,Child):
+    Lines = ['      <unit class="{}" ID="{}" pcsorder="{}">\n'.format(UnitsClass,Id,PcsOrd)]
+    for ToUnit in To:
+      Lines.append('        <to class="{}" ID="{}" />\n'.format(ToUnit[0],ToUnit[1]))
+    for ChildUnit in Child:
+      Lines.append('        <childof class="{}" ID="{}" />\n'.format(ChildUnit[0],ChildUnit[1]))
+    Lines.append('      </unit>\n')
+    self.write("".join(Lines))
+
+
+  ######################################################
+
+
+  def writeDefinition(self,UnitsClass,Units):
+    for Unit in Units:
+      self.writeUnit(UnitsClass,Unit.Id,Unit.PcsOrd,Unit.To,Unit.Child)
+
+
+  ######################################################
+
+
+  def beginAttributes(self,UnitsClass,ColOrder):
+    self.beginSection(2,'attributes','unitsclass="{}" colorder="{}"'.format(UnitsClass,";".join(ColOrder)))
+
+
+  ######################################################
+
+
+  def writeAttributesRow(self,Id,Values):
+    self.write("{} {}\n".format(Id," ".join(Values)))
+
+
+  ######################################################
+
+
+  def writeAttributesRows(self,Units,ColOrder,Formats=None):
+    # rows are built from whole formatted columns, Formats giving the format spec of columns by name
+    Formats = Formats or dict()
+
+    for Ids,Columns in getAttributesBlocks(Units,ColOrder):
+      Cells = [formatColumn(Values,Formats.get(Name)) for Name,Values in zip(ColOrder,Columns)]
+      Rows = map(" ".join,zip(*Cells)) if Cells else [""]*len(Ids)
+      self.write("".join(["{} {}\n".format(Id,Row) for Id,Row in zip(Ids,Rows)]))
+
+
+  ######################################################
+
+
+  def writeAttributes(self,UnitsClass,Units,ColOrder,Formats=None):
+    # Units can also be given as units data (mapping of units, or units store)
+    ColOrder = list(ColOrder)
+    self.beginAttributes(UnitsClass,ColOrder)
+    self.writeAttributesRows(Units,ColOrder,Formats)
+    self.endSection()
+
+
+  ######################################################
+
+
+  def writeDataitem(self,Id,Type,Source,UnitsClass,Layer=None):
+    if Layer:
+      self.write(indentCRStr(2,'<dataitem id="{}" type="{}" source="{}" layer="{}" unitclass="{}" />'.format(Id,Type,Source,Layer,UnitsClass)))
+    else:
+      self.write(indentCRStr(2,'<dataitem id="{}" type="{}" source="{}" unitclass="{}" />'.format(Id,Type,Source,UnitsClass)))
+
+
+######################################################
+######################################################
+
+
+class DomainWriter():
+
+  # Writer for domain files given by parts (e.g. one partition of the domain at a time).
+  # Units definitions are written as they come, attributes rows are spooled to one temporary file
+  # per units class and appended to the domain file when closing, so that no part is kept in memory.
+
+  def __init__(self,FilePath,ColOrders,Compress=False,Formats=None):
+    # ColOrders gives the attributes columns of each units class, in the order of the attributes sections,
+    # Formats the format specs of the attributes columns of each units class
+    self._ColOrders = { UnitsClass : list(ColOrder) for UnitsClass,ColOrder in ColOrders.items() }
+    self._Formats = Formats or dict()
+    self._SpoolDir = tempfile.mkdtemp(prefix=".fluidx-",dir=os.path.dirname(os.path.abspath(FilePath)))
+    self._Spools = dict()
+
+    self._Writer = FluidXWriter(FilePath,Compress)
+    self._Writer.beginDocument()
+    self._Writer.beginSection(1,'domain')
+    self._Writer.beginSection(2,'definition')
+
+
+  ######################################################
+
+
+  def __enter__(self):
+    return self
+
+
+  ######################################################
+
+
+  def __exit__(self,ExcType,ExcValue,Traceback):
+    if ExcType is None:
+      self.close()
+    else:
+      self._Writer.__exit__(ExcType,ExcValue,Traceback)
+      for Spool in self._Spools.values():
+        Spool.__exit__(ExcType,ExcValue,Traceback)
+      shutil.rmtree(self._SpoolDir,ignore_errors=True)
+
+
+  ######################################################
+
+
+  def writeUnits(self,UnitsClass,UnitsData):
+    self._Writer.writeDefinition(UnitsClass,UnitsData.values())
+
+    if UnitsClass not in self._Spools:
+      self._Spools[UnitsClass] = FluidXWriter(os.path.join(self._SpoolDir,UnitsClass))
+    self._Spools[UnitsClass].writeAttributesRows(UnitsData,self._ColOrders[UnitsClass],self._Formats.get(UnitsClass))
+
+
+  ######################################################
+
+
+  def close(self):
+    self._Writer.endSection()
+
+    for UnitsClass,ColOrder in self._ColOrders.items():
+      self._Writer.beginAttributes(UnitsClass,ColOrder)
+      if UnitsClass in self._Spools:
+        self._Spools[UnitsClass].close()
+        with open(os.path.join(self._SpoolDir,UnitsClass)) as Spool:
+          for Chunk in iter(lambda: Spool.read(self._Writer._BufferSize),""):
+            self._Writer.write(Chunk)
+      self._Writer.endSection()
+
+    self._Writer.close()
+    shutil.rmtree(self._SpoolDir,ignore_errors=True)
@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+from osgeo import ogr
+
+
+######################################################
+######################################################
+
+
+GUGeometryModes = ['multipolygon','dissolve','none']
+
+
+######################################################
+######################################################
+
+
+def buildMultiPolygon(Geometries):
+  MultiPolygon = ogr.Geometry(ogr.wkbMultiPolygon)
+  for Geom in Geometries:
+    MultiPolygon.AddGeometry(Geom)
+  return MultiPolygon
+
+
+######################################################
+######################################################
+
+
+def dissolvePolygons(Geometries):
+  Union = buildMultiPolygon(Geometries).UnionCascaded()
+  return ogr.ForceToMultiPolygon(Union)
+
+
+######################################################
+######################################################
+
+
+def getWeightedCentroid(Geometries):
+  # area-weighted mean of the centroids, equal to the centroid of the union of non-overlapping polygons
+  SumX = 0.0
+  SumY = 0.0
+  SumArea = 0.0
+  for Geom in Geometries:
+    Area = Geom.GetArea()
+    Centroid = Geom.Centroid()
+    SumX += Centroid.GetX()*Area
+    SumY += Centroid.GetY()*Area
+    SumArea += Area
+
+  if SumArea <= 0:
+    return None,None
+
+  return SumX/SumArea,SumY/SumArea
+
+
+######################################################
+######################################################
+
+
+def buildGUGeometry(Geometries,Mode='multipolygon'):
+  # returns the GU geometry (None if not built) and the coordinates of its centroid
+
+  if Mode == 'none':
+    X,Y = getWeightedCentroid(Geometries)
+    return None,X,Y
+
+  if Mode == 'dissolve':
+    Geom = dissolvePolygons(Geometries)
+  else:
+    Geom = buildMultiPolygon(Geometries)
+
+  Centroid = Geom.Centroid()
+  return Geom,Centroid.GetX(),Centroid.GetY()
+
+
+######################################################
+######################################################
+
+
+def buildGUGeometryFromWKB(Geometries,Mode='multipolygon'):
+  # same as buildGUGeometry for members and GU geometry given as WKB, run by worker processes
+  Geom,X,Y = buildGUGeometry([ogr.CreateGeometryFromWkb(WKB) for WKB in Geometries],Mode)
+  if Geom is not None:
+    Geom = bytes(Geom.ExportToWkb())
+  return Geom,X,Y
+
+
+######################################################
+######################################################
+
+
+# GEOS precision reducer, available from GDAL 3.9
+UsePrecisionReducer = hasattr(ogr.Geometry,"SetPrecision")
+
+
+######################################################
+######################################################
+
+
+def roundToGrid(Coord,GridSize):
+  # grid sizes dividing 1 (0.1, 0.25, ...) are applied through their integer inverse,
+  # giving the shortest decimal values instead of values such as 123.50000000000001
+  Scale = 1.0/GridSize
+  if Scale >= 1 and abs(Scale-round(Scale)) < 1e-9*Scale:
+    Scale = round(Scale)
+    return round(Coord*Scale)/Scale
+  return round(Coord/GridSize)*GridSize
+
+
+######################################################
+######################################################
+
+
+def _roundPoints(Geom,GridSize):
+  for i in range(Geom.GetGeometryCount()):
+    _roundPoints(Geom.GetGeometryRef(i),GridSize)
+
+  for i in range(Geom.GetPointCount()):
+    Point = [roundToGrid(Coord,GridSize) for Coord in Geom.GetPoint(i)]
+    if Geom.GetCoordinateDimension() == 3:
+      Geom.SetPoint(i,*Point)
+    else:
+      Geom.SetPoint_2D(i,Point[0],Point[1])
+
+
+######################################################
+######################################################
+
+
+def snapToGrid(Geom,GridSize):
+  # new geometry with coordinates rounded to the grid, through the GEOS precision reducer
+  # when available, which also keeps polygons valid
+  if UsePrecisionReducer:
+    return Geom.SetPrecision(GridSize)
+
+  Snapped = Geom.Clone()
+  _roundPoints(Snapped,GridSize)
+  return Snapped
+
+
+######################################################
+######################################################
+
+
+def getOutputTransform(GridSize=None,Tolerance=None):
+  # function applied to the geometries written to the GIS outputs, None if they are written as is
+  if not GridSize and not Tolerance:
+    return None
+
+  def transform(Geom):
+    if Tolerance:
+      Geom = Geom.SimplifyPreserveTopology(Tolerance)
+    if GridSize:
+      Geom = snapToGrid(Geom,GridSize)
+    return Geom
+
+  return transform
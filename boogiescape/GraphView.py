@@ -0,0 +1,168 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# This module is imported only when a graph view export is requested.
+# DOT, GraphML and edge list files are written directly from the graph, without any layout step,
+# the plotting and graphviz stacks being imported only for PDF renders.
+
+
+import concurrent.futures
+import os
+from xml.sax.saxutils import quoteattr
+
+import networkx
+
+
+######################################################
+######################################################
+
+
+FileExtensions = { 'pdf' : 'pdf', 'dot' : 'dot', 'graphml' : 'graphml', 'edgelist' : 'edges' }
+
+
+######################################################
+######################################################
+
+
+def _getLayoutFunctions():
+  import matplotlib
+  matplotlib.use('Agg')
+  import matplotlib.pyplot as plt
+
+  try:
+    import pygraphviz
+    from networkx.drawing.nx_agraph import graphviz_layout
+  except ImportError:
+    try:
+      import pydot
+      from networkx.drawing.nx_pydot import graphviz_layout
+    except ImportError:
+      raise ImportError("Needs Graphviz and either PyGraphviz or pydot")
+
+  return plt,graphviz_layout
+
+
+######################################################
+######################################################
+
+
+def getNodeClass(Node):
+  return str(Node).split("#")[0]
+
+
+######################################################
+######################################################
+
+
+def exportDOT(G,FilePath):
+  with open(FilePath,'w') as File:
+    File.write("digraph units {\n")
+    File.writelines('  "{}" [class="{}"];\n'.format(Node,getNodeClass(Node)) for Node in G.nodes)
+    File.writelines('  "{}" -> "{}";\n'.format(From,To) for From,To in G.edges)
+    File.write("}\n")
+
+
+######################################################
+######################################################
+
+
+def exportGraphML(G,FilePath):
+  # written directly, the units data held by the nodes being left out
+  with open(FilePath,'w') as File:
+    File.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    File.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    File.write('  <key id="class" for="node" attr.name="class" attr.type="string" />\n')
+    File.write('  <graph edgedefault="directed">\n')
+    File.writelines('    <node id={}><data key="class">{}</data></node>\n'.format(quoteattr(str(Node)),getNodeClass(Node))
+                    for Node in G.nodes)
+    File.writelines('    <edge source={} target={} />\n'.format(quoteattr(str(From)),quoteattr(str(To)))
+                    for From,To in G.edges)
+    File.write('  </graph>\n')
+    File.write('</graphml>\n')
+
+
+######################################################
+######################################################
+
+
+def exportEdgeList(G,FilePath):
+  networkx.write_edgelist(G,FilePath,data=False)
+
+
+######################################################
+######################################################
+
+
+def renderPDF(Nodes,Edges,FilePath,Title=None,Size=None):
+  plt,graphviz_layout = _getLayoutFunctions()
+
+  G = networkx.DiGraph()
+  G.add_nodes_from(Nodes)
+  G.add_edges_from(Edges)
+
+  # figure size in inches follows the graph size by default, up to 20 inches
+  if Size is None:
+    Size = min(20,max(6,len(Nodes)/10))
+
+  pos = graphviz_layout(G, prog='dot')
+  plt.figure(figsize=(Size, Size))
+  networkx.draw(G, pos, node_size=300, alpha=0.5, node_color="blue", with_labels=True)
+  if Title:
+    plt.title(Title)
+  plt.axis('equal')
+  plt.savefig(FilePath)
+  plt.close()
+
+
+######################################################
+######################################################
+
+
+def exportPDF(G,FilePath):
+  renderPDF(list(G.nodes),list(G.edges),FilePath,Size=20)
+
+
+######################################################
+######################################################
+
+
+Exporters = { 'pdf' : exportPDF, 'dot' : exportDOT, 'graphml' : exportGraphML, 'edgelist' : exportEdgeList }
+
+
+######################################################
+######################################################
+
+
+def renderSubgraphs(Subgraphs,OutputPath,Workers=1,MaxNodes=None):
+  # one PDF file per (name,nodes,edges) subgraph, rendered by worker processes,
+  # subgraphs with more than MaxNodes nodes being skipped. Returns the rendered and skipped names.
+  Skipped = list()
+  Jobs = list()
+
+  for Name,Nodes,Edges in Subgraphs:
+    if MaxNodes and len(Nodes) > MaxNodes:
+      Skipped.append(Name)
+    else:
+      Jobs.append((Nodes,Edges,os.path.join(OutputPath,Name+".pdf"),Name))
+
+  if Workers > 1 and len(Jobs) > 1:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Executor:
+      for Future in [Executor.submit(renderPDF,*Job) for Job in Jobs]:
+        Future.result()
+  else:
+    for Job in Jobs:
+      renderPDF(*Job)
+
+  Rendered = [Job[3] for Job in Jobs]
+
+  return Rendered,Skipped
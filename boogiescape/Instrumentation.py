@@ -0,0 +1,159 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+import contextlib
+import datetime
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+
+######################################################
+######################################################
+
+
+def getPeakRSS():
+  # peak resident memory of the process in MB, None if not available on this platform
+  if resource is None:
+    return None
+  RSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin':
+    return RSS/1048576
+  return RSS/1024
+
+
+######################################################
+######################################################
+
+
+def getErrorText(Error):
+  return "{}: {}".format(type(Error).__name__,Error)
+
+
+######################################################
+######################################################
+
+
+class Instrumentation():
+
+  # Collects events of the pipeline stages (elapsed time, peak memory, units counts)
+  # and forwards them to the registered listeners.
+  # The RSS values are the high-water mark of the whole process, which only grows from stage to stage.
+  # Python allocations peaks are recorded only when tracemalloc is tracing.
+
+  def __init__(self):
+    self._Listeners = list()
+    self._Events = list()
+    self._StartTime = None
+    self._StartDate = None
+
+
+  ######################################################
+
+
+  def addListener(self,Listener):
+    # listeners are callables receiving each event as a dict
+    self._Listeners.append(Listener)
+
+
+  ######################################################
+
+
+  def getEvents(self):
+    return list(self._Events)
+
+
+  ######################################################
+
+
+  def emit(self,Event):
+    self._Events.append(Event)
+    for Listener in self._Listeners:
+      Listener(Event)
+
+
+  ######################################################
+
+
+  def begin(self):
+    self._Events = list()
+    self._StartTime = time.perf_counter()
+    self._StartDate = datetime.datetime.now().isoformat(timespec='seconds')
+    self.emit({ 'event' : 'run-started', 'date' : self._StartDate })
+
+
+  ######################################################
+
+
+  def end(self,Status="ok",Units=None,Error=None):
+    self.emit({ 'event' : 'run-done', 'status' : Status, 'error' : Error, 'elapsed' : time.perf_counter()-self._StartTime,
+                'peak_rss_mb' : getPeakRSS(), 'units' : Units or dict() })
+
+
+  ######################################################
+
+
+  @contextlib.contextmanager
+  def stage(self,Name):
+    # the yielded event can be completed by the stage, e.g. with units counts.
+    # Stages raising an exception are recorded as failed, with the error, before the exception is propagated.
+    self.emit({ 'event' : 'stage-started', 'stage' : Name })
+
+    Tracing = tracemalloc.is_tracing()
+    if Tracing:
+      tracemalloc.reset_peak()
+
+    Event = { 'event' : 'stage-done', 'stage' : Name, 'status' : 'ok', 'error' : None, 'units' : dict() }
+    Start = time.perf_counter()
+    try:
+      yield Event
+    except BaseException as E:
+      Event['status'] = 'failed'
+      Event['error'] = getErrorText(E)
+      raise
+    finally:
+      Event['elapsed'] = time.perf_counter()-Start
+      Event['peak_rss_mb'] = getPeakRSS()
+      Event['peak_python_mb'] = tracemalloc.get_traced_memory()[1]/1048576 if Tracing else None
+      self.emit(Event)
+
+
+  ######################################################
+
+
+  def getReport(self,Infos=None):
+    Report = dict(Infos or dict())
+    Report['started'] = self._StartDate
+    Report['stages'] = list()
+
+    for Event in self._Events:
+      if Event['event'] == 'stage-done':
+        Report['stages'].append({ k : v for k,v in Event.items() if k != 'event' })
+      elif Event['event'] == 'run-done':
+        Report.update({ k : v for k,v in Event.items() if k != 'event' })
+
+    return Report
+
+
+  ######################################################
+
+
+  def writeReport(self,FilePath,Infos=None):
+    with open(FilePath,'w') as File:
+      json.dump(self.getReport(Infos),File,indent=2,default=str)
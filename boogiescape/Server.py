@@ -0,0 +1,387 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Long-running job server for repeated runs, avoiding the interpreter start and modules import costs.
+# Zones are processed by a bounded pool of worker processes which stay alive between jobs,
+# jobs being submitted and followed through a localhost HTTP JSON API:
+#   POST /jobs            { "input" : INPUTPATH, "output" : OUTPUTPATH, "options" : { ... }, "wait" : false }
+#   GET  /jobs            all jobs
+#   GET  /jobs/ID[?wait]  status and timing of a job, waiting for its end if asked
+#   GET  /health          server status
+# Output paths must be under the output root of the server, and existing directories are replaced only
+# if they are previous outputs and the job options ask for it ("overwrite" : true).
+# Requests must be sent to a local host name, and POST requests must have a JSON content type.
+
+
+import argparse
+import concurrent.futures
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from osgeo import ogr
+
+from . import Batch
+from .__main__ import addPipelineArguments
+
+
+######################################################
+######################################################
+
+
+def _warmUp():
+  # run once by each worker process, before its first job
+  ogr.RegisterAll()
+  import networkx
+
+
+######################################################
+######################################################
+
+
+# files of which one is always present in the output directories of runs
+OutputMarkers = ["run_report.json","domain.fluidx","validation.json"]
+
+# host names accepted in the Host and Origin headers
+LocalHosts = ["localhost","127.0.0.1","::1"]
+
+
+######################################################
+######################################################
+
+
+class JobServer():
+
+  # Jobs queue and bounded pool of worker processes.
+  # Jobs options are the default options updated with the options given for each job.
+
+  def __init__(self,Workers=1,DefaultArgs=None,MaxQueued=100,OutputRoot="."):
+    self._Workers = max(1,Workers)
+    self._OutputRoot = os.path.realpath(OutputRoot)
+    self._DefaultArgs = dict(DefaultArgs or dict())
+    self._MaxQueued = MaxQueued
+    self._Executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._Workers,initializer=_warmUp)
+    self._Jobs = dict()
+    self._Futures = dict()
+    self._Done = dict()
+    self._Lock = threading.Lock()
+    self._NextId = 1
+
+
+  ######################################################
+
+
+  def getWorkers(self):
+    return self._Workers
+
+
+  ######################################################
+
+
+  def getOutputRoot(self):
+    return self._OutputRoot
+
+
+  ######################################################
+
+
+  def _checkOutputPath(self,OutputPath):
+    # returns the absolute output path, raises ValueError if it is not allowed
+    OutputPath = os.path.realpath(OutputPath)
+    if os.path.commonpath([self._OutputRoot,OutputPath]) != self._OutputRoot or OutputPath == self._OutputRoot:
+      raise ValueError("output path {} is not under the output root {}".format(OutputPath,self._OutputRoot))
+
+    # existing directories are replaced only if they are empty or previous outputs
+    if os.path.exists(OutputPath):
+      if not os.path.isdir(OutputPath):
+        raise ValueError("output path {} is not a directory".format(OutputPath))
+      Content = os.listdir(OutputPath)
+      if Content and not set(Content) & set(OutputMarkers):
+        raise ValueError("output path {} is an existing directory which is not an output directory".format(OutputPath))
+
+    return OutputPath
+
+
+  ######################################################
+
+
+  def _getQueuedCount(self):
+    return len([Job for Job in self._Jobs.values() if Job['status'] in ['queued','running']])
+
+
+  ######################################################
+
+
+  def _submitJob(self,*Args):
+    # a worker process which died (crash, killed when out of memory, ...) breaks the pool,
+    # which is then replaced by a new one. The jobs which were running or queued in the broken pool fail.
+    try:
+      return self._Executor.submit(*Args)
+    except concurrent.futures.BrokenExecutor:
+      self._Executor.shutdown(wait=False)
+      self._Executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._Workers,initializer=_warmUp)
+      return self._Executor.submit(*Args)
+
+
+  ######################################################
+
+
+  def submit(self,InputPath,OutputPath,Options=None):
+    # returns the job, raises ValueError for invalid jobs and RuntimeError if the queue is full
+    if not InputPath or not OutputPath:
+      raise ValueError("input and output paths are required")
+
+    Options = dict(Options or dict())
+    Unknown = [Name for Name in Options if Name not in self._DefaultArgs]
+    if Unknown:
+      raise ValueError("unknown options {}".format(", ".join(Unknown)))
+
+    ExtraArgs = dict(self._DefaultArgs)
+    ExtraArgs.update(Options)
+
+    OutputPath = self._checkOutputPath(OutputPath)
+
+    with self._Lock:
+      if self._getQueuedCount() >= self._MaxQueued:
+        raise RuntimeError("too many queued jobs ({})".format(self._MaxQueued))
+
+      Id = self._NextId
+      Job = { 'id' : Id, 'input' : os.path.abspath(InputPath), 'output' : OutputPath, 'log' : OutputPath+".log",
+              'options' : Options, 'status' : 'queued', 'error' : None,
+              'submitted' : time.time(), 'duration' : None, 'elapsed' : None }
+
+      # the job is registered only once submitted
+      Future = self._submitJob(Batch.runZone,str(Id),Job['input'],Job['output'],ExtraArgs,Job['log'])
+      self._NextId += 1
+      self._Jobs[Id] = Job
+      self._Futures[Id] = Future
+      self._Done[Id] = threading.Event()
+
+    Future.add_done_callback(lambda F: self._setResult(Id,F))
+
+    return self.getJob(Id)
+
+
+  ######################################################
+
+
+  def _setResult(self,Id,Future):
+    with self._Lock:
+      Job = self._Jobs[Id]
+      try:
+        Result = Future.result()
+        Job['status'] = Result['status']
+        Job['error'] = Result['error']
+        Job['duration'] = Result['duration']
+      except Exception as E:
+        # the worker process itself failed (crash, killed, ...)
+        Job['status'] = 'failed'
+        Job['error'] = "{}: {}".format(type(E).__name__,E)
+      Job['elapsed'] = time.time()-Job['submitted']
+    self._Done[Id].set()
+
+
+  ######################################################
+
+
+  def getJob(self,Id,Wait=False):
+    # returns a copy of the job, None if it does not exist
+    Future = self._Futures.get(Id)
+    if Future is None:
+      return None
+
+    # the job is updated once its result is set, after the end of the future
+    if Wait:
+      self._Done[Id].wait()
+
+    with self._Lock:
+      Job = dict(self._Jobs[Id])
+
+    if Job['status'] == 'queued' and Future.running():
+      Job['status'] = 'running'
+    return Job
+
+
+  ######################################################
+
+
+  def getJobs(self):
+    return [self.getJob(Id) for Id in sorted(self._Futures.keys())]
+
+
+  ######################################################
+
+
+  def shutdown(self,Wait=True):
+    self._Executor.shutdown(wait=Wait,cancel_futures=not Wait)
+
+
+######################################################
+######################################################
+
+
+class JobRequestHandler(http.server.BaseHTTPRequestHandler):
+
+  # the job server is given by the HTTP server (JobServer attribute)
+
+  def log_message(self,Format,*Args):
+    if not self.server.Quiet:
+      http.server.BaseHTTPRequestHandler.log_message(self,Format,*Args)
+
+
+  ######################################################
+
+
+  def _isLocalRequest(self):
+    # rejects requests forwarded from other host names, such as web pages in browsers (DNS rebinding)
+    Hosts = LocalHosts+[self.server.server_address[0]]
+
+    Host = urllib.parse.urlsplit("//"+self.headers.get('Host','')).hostname
+    if Host not in Hosts:
+      return False
+
+    Origin = self.headers.get('Origin')
+    if Origin is not None and urllib.parse.urlsplit(Origin).hostname not in Hosts:
+      return False
+
+    return True
+
+
+  ######################################################
+
+
+  def _sendJSON(self,Code,Content):
+    Body = json.dumps(Content,indent=2).encode()
+    self.send_response(Code)
+    self.send_header("Content-Type","application/json")
+    self.send_header("Content-Length",str(len(Body)))
+    self.end_headers()
+    self.wfile.write(Body)
+
+
+  ######################################################
+
+
+  def do_GET(self):
+    URL = urllib.parse.urlparse(self.path)
+    Parts = list(filter(None,URL.path.split('/')))
+    Query = urllib.parse.parse_qs(URL.query,keep_blank_values=True)
+    Jobs = self.server.JobServer
+
+    if not self._isLocalRequest():
+      self._sendJSON(403,{ 'error' : "forbidden host or origin" })
+    elif Parts == ['health']:
+      self._sendJSON(200,{ 'status' : 'ok', 'workers' : Jobs.getWorkers(), 'jobs' : len(Jobs.getJobs()) })
+    elif Parts == ['jobs']:
+      self._sendJSON(200,Jobs.getJobs())
+    elif len(Parts) == 2 and Parts[0] == 'jobs' and Parts[1].isdigit():
+      Job = Jobs.getJob(int(Parts[1]),'wait' in Query)
+      if Job is None:
+        self._sendJSON(404,{ 'error' : "job {} not found".format(Parts[1]) })
+      else:
+        self._sendJSON(200,Job)
+    else:
+      self._sendJSON(404,{ 'error' : "{} not found".format(URL.path) })
+
+
+  ######################################################
+
+
+  def do_POST(self):
+    if urllib.parse.urlparse(self.path).path.rstrip('/') != '/jobs':
+      self._sendJSON(404,{ 'error' : "{} not found".format(self.path) })
+      return
+
+    if not self._isLocalRequest():
+      self._sendJSON(403,{ 'error' : "forbidden host or origin" })
+      return
+
+    if self.headers.get_content_type() != "application/json":
+      self._sendJSON(415,{ 'error' : "application/json content expected" })
+      return
+
+    try:
+      Request = json.loads(self.rfile.read(int(self.headers.get('Content-Length',0))) or b"{}")
+      if not isinstance(Request,dict):
+        raise ValueError("JSON object expected")
+      Job = self.server.JobServer.submit(Request.get('input'),Request.get('output'),Request.get('options'))
+    except ValueError as E:
+      self._sendJSON(400,{ 'error' : str(E) })
+      return
+    except RuntimeError as E:
+      self._sendJSON(503,{ 'error' : str(E) })
+      return
+
+    if Request.get('wait'):
+      Job = self.server.JobServer.getJob(Job['id'],True)
+    self._sendJSON(202 if Job['status'] in ['queued','running'] else 200,Job)
+
+
+######################################################
+######################################################
+
+
+def createHTTPServer(Jobs,Host="127.0.0.1",Port=8765,Quiet=False):
+  Server = http.server.ThreadingHTTPServer((Host,Port),JobRequestHandler)
+  Server.JobServer = Jobs
+  Server.Quiet = Quiet
+  return Server
+
+
+######################################################
+######################################################
+
+
+def main():
+
+  Parser = argparse.ArgumentParser(description="Job server running BoogieScape zones in warm worker processes")
+
+  Parser.add_argument('--host',type=str,default='127.0.0.1',help='Listening address (default: 127.0.0.1)')
+  Parser.add_argument('--port',type=int,default=8765,help='Listening port (default: 8765)')
+  Parser.add_argument('--workers',type=int,default=os.cpu_count(),metavar='N',help='Number of worker processes (default: number of CPUs)')
+  Parser.add_argument('--max-queued',type=int,default=100,metavar='N',help='Maximum number of queued and running jobs (default: 100)')
+  Parser.add_argument('--output-root',type=str,required=True,metavar='PATH',help='Directory under which jobs outputs are written')
+  addPipelineArguments(Parser)
+
+  Args = vars(Parser.parse_args())
+
+  Host = Args.pop('host')
+  Port = Args.pop('port')
+  Workers = max(1,Args.pop('workers') or 1)
+  MaxQueued = Args.pop('max_queued')
+  OutputRoot = Args.pop('output_root')
+
+  Jobs = JobServer(Workers,Args,MaxQueued,OutputRoot)
+  Server = createHTTPServer(Jobs,Host,Port,Args['quiet'])
+
+  print("###### Serving jobs on http://{}:{}/ with {} workers, writing outputs under {}".format(Host,Server.server_address[1],Workers,
+                                                                                              Jobs.getOutputRoot()))
+
+  try:
+    Server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    Server.server_close()
+    Jobs.shutdown(Wait=False)
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  main()
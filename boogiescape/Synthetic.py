@@ -0,0 +1,251 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Generator of synthetic RS/SU/RE input shapefiles, for tests and benchmarks.
+#
+# The landscape is made of GU catchments placed side by side. Each catchment is a grid of
+# square SU with a given depth (number of rows): every SU flows to the SU below it,
+# and the bottom row flows to a chain of RS reaches ending at the catchment outlet (GUconnect=1).
+# Outlets flow to the first reach of the next catchment. RE are placed in the upper corner of the
+# catchments and flow to their first reach. RE and first reaches are AP sources for the top SU rows.
+
+
+import argparse
+import math
+import os
+import random
+
+from osgeo import ogr
+
+from . import BoogieScape
+
+
+######################################################
+######################################################
+
+
+CellSize = 100.0
+
+
+######################################################
+######################################################
+
+
+def _createLayer(Driver,FilePath,GeometryType,Fields):
+  if os.path.exists(FilePath):
+    Driver.DeleteDataSource(FilePath)
+  Source = Driver.CreateDataSource(FilePath)
+  Layer = Source.CreateLayer(os.path.splitext(os.path.basename(FilePath))[0],None,GeometryType)
+  for Name,Type in Fields.items():
+    Layer.CreateField(ogr.FieldDefn(Name,Type))
+  return Source,Layer
+
+
+######################################################
+######################################################
+
+
+def _addFeature(Layer,Values,Geometry):
+  Feature = ogr.Feature(Layer.GetLayerDefn())
+  for Name,Value in Values.items():
+    if Value is not None:
+      Feature.SetField(Name,Value)
+  Feature.SetGeometry(Geometry)
+  Layer.CreateFeature(Feature)
+
+
+######################################################
+######################################################
+
+
+def _makeSquare(X,Y,Size):
+  Ring = ogr.Geometry(ogr.wkbLinearRing)
+  for PX,PY in [(X,Y),(X+Size,Y),(X+Size,Y+Size),(X,Y+Size),(X,Y)]:
+    Ring.AddPoint_2D(PX,PY)
+  Polygon = ogr.Geometry(ogr.wkbPolygon)
+  Polygon.AddGeometry(Ring)
+  return Polygon
+
+
+######################################################
+######################################################
+
+
+def _makeReach(X,Y,Length):
+  # reaches run along the lower boundary of the bottom SU, without touching the neighbour SU
+  Line = ogr.Geometry(ogr.wkbLineString)
+  Line.AddPoint_2D(X+Length*0.1,Y)
+  Line.AddPoint_2D(X+Length*0.9,Y)
+  MultiLine = ogr.Geometry(ogr.wkbMultiLineString)
+  MultiLine.AddGeometry(Line)
+  return MultiLine
+
+
+######################################################
+######################################################
+
+
+def _makePoint(X,Y):
+  Point = ogr.Geometry(ogr.wkbPoint)
+  Point.AddPoint_2D(X,Y)
+  return Point
+
+
+######################################################
+######################################################
+
+
+def getLayout(SUCount,GUCount,Depth):
+  # number of SU of each catchment and number of columns (and RS reaches) of each catchment
+  GUCount = max(1,min(GUCount,SUCount))
+  Depth = max(1,Depth)
+  PerGU = SUCount // GUCount
+
+  Counts = [PerGU]*GUCount
+  Counts[-1] += SUCount-PerGU*GUCount
+  Columns = [max(1,int(math.ceil(Count/Depth))) for Count in Counts]
+
+  return Counts,Columns
+
+
+######################################################
+######################################################
+
+
+def generateZone(OutputPath,SUCount=1000,GUCount=10,Depth=10,RECount=None,Seed=0,SULinks=True):
+  Rand = random.Random(Seed)
+  Driver = ogr.GetDriverByName('ESRI Shapefile')
+  os.makedirs(OutputPath,exist_ok=True)
+
+  # field definitions are the ones expected by the pipeline
+  BS = BoogieScape.BoogieScape(OutputPath,OutputPath,{})
+  GUCount = max(1,min(GUCount,SUCount))
+  Depth = max(1,Depth)
+  if RECount is None:
+    RECount = GUCount
+
+  Counts,Columns = getLayout(SUCount,GUCount,Depth)
+  Offsets = [0]
+  for Cols in Columns:
+    Offsets.append(Offsets[-1]+Cols)
+
+  def getReachId(GU,Column):
+    return Offsets[GU]+Column+1
+
+  def getX(GU,Column):
+    return (Offsets[GU]+Column+GU)*CellSize
+
+  REByGU = dict()
+  for i in range(RECount):
+    REByGU.setdefault(i % GUCount,[]).append(i+1)
+
+  def getRSAPId(GU):
+    return RECount+GU+1
+
+
+  ## RS
+  Source,Layer = _createLayer(Driver,os.path.join(OutputPath,'RS.shp'),ogr.wkbMultiLineString,BS._InputRSFields)
+  for GU in range(GUCount):
+    for Column in range(Columns[GU]):
+      IsOutlet = (Column == Columns[GU]-1)
+      if not IsOutlet:
+        To = "RS#{}".format(getReachId(GU,Column+1))
+      elif GU < GUCount-1:
+        To = "RS#{}".format(getReachId(GU+1,0))
+      else:
+        To = None
+      X = getX(GU,Column)
+      _addFeature(Layer,{ 'OFLD_ID' : getReachId(GU,Column), 'OFLD_PSORD' : Depth+Column+1, 'OFLD_TO' : To,
+                          'slope' : Rand.uniform(0.5,10), 'length' : CellSize, 'width' : Rand.uniform(0.5,2),
+                          'height' : 2.0, 'drainarea' : CellSize*CellSize*Depth*(Column+1), 'nmanning' : 0.2,
+                          'AP_ID' : getRSAPId(GU) if Column == 0 else None,
+                          'xposition' : X+CellSize/2, 'yposition' : 0.0, 'GUconnect' : 1 if IsOutlet else 0 },
+                  _makeReach(X,0.0,CellSize))
+  Source = None
+
+
+  ## SU
+  Source,Layer = _createLayer(Driver,os.path.join(OutputPath,'SU.shp'),ogr.wkbPolygon,BS._InputSUFields)
+  Id = 1
+  for GU in range(GUCount):
+    for Local in range(Counts[GU]):
+      Column = Local // Depth
+      Row = Local % Depth
+      if Row > 0:
+        To = "SU#{}".format(Id-1)
+      elif SULinks:
+        To = "RS#{}".format(getReachId(GU,Column))
+      else:
+        To = None
+
+      FromAP = "0"
+      if Row == Depth-1:
+        if GU in REByGU:
+          FromAP = str(REByGU[GU][Column % len(REByGU[GU])])
+        elif Column == 0:
+          FromAP = str(getRSAPId(GU))
+
+      X = getX(GU,Column)
+      Y = Row*CellSize
+      _addFeature(Layer,{ 'OFLD_ID' : Id, 'OFLD_TO' : To, 'OFLD_PSORD' : Depth-Row,
+                          'slope' : Rand.uniform(0.5,20), 'area' : CellSize*CellSize,
+                          'xposition' : X+CellSize/2, 'yposition' : Y+CellSize/2,
+                          'flowdist' : Rand.uniform(10,CellSize), 'SCSlanduse' : Rand.choice([0,211,221]),
+                          'SCSsoil' : Rand.choice(['A','B','C']), 'AWC' : '0.027;0.040;0.020', 'clay' : '32.0;32.0;34.0',
+                          'soilbulkd' : '1550.2;1635.0;1661.4', 'zsoillayer' : '0.25;0.60;0.80', 'nmanning' : 0.05,
+                          'Ksat' : '1.6E-06;1.6E-06;7.9E-07', 'zrootmax' : 0.8, 'soilcode' : '-', 'equipment' : '-',
+                          'pRHt_ini' : 0.8, 'rotation' : 'cerealesPaille;soja', 'FROM_AP' : FromAP },
+                  _makeSquare(X,Y,CellSize))
+      Id += 1
+  Source = None
+
+
+  ## RE
+  Source,Layer = _createLayer(Driver,os.path.join(OutputPath,'RE.shp'),ogr.wkbPoint,BS._InputREFields)
+  for GU,REIds in REByGU.items():
+    for Index,REId in enumerate(REIds):
+      X = getX(GU,0)+CellSize*(Index+0.5)/len(REIds)
+      Y = (Depth-0.5)*CellSize
+      _addFeature(Layer,{ 'OFLD_ID' : REId, 'OFLD_PSORD' : 1, 'OFLD_TO' : "RS#{}".format(getReachId(GU,0)),
+                          'areamax' : 1000.0, 'inivolume' : 0.0, 'volumemax' : 5000.0, 'drainarea' : 10000.0,
+                          'slope' : Rand.uniform(0.5,10), 'AP_ID' : REId, 'xposition' : X, 'yposition' : Y },
+                  _makePoint(X,Y))
+  Source = None
+
+
+######################################################
+######################################################
+
+
+def main():
+  Parser = argparse.ArgumentParser(description="Generator of synthetic BoogieScape input datasets")
+
+  Parser.add_argument('OUTPUTPATH',type=str,help='Output path')
+  Parser.add_argument('--su',type=int,default=1000,help='Number of SU (default: 1000)')
+  Parser.add_argument('--gu',type=int,default=10,help='Number of GU catchments (default: 10)')
+  Parser.add_argument('--depth',type=int,default=10,help='Number of SU rows in flow chains (default: 10)')
+  Parser.add_argument('--re',type=int,default=None,help='Number of RE (default: one per GU)')
+  Parser.add_argument('--seed',type=int,default=0,help='Random seed (default: 0)')
+  Parser.add_argument('--no-su-links',action='store_true',help='Leave OFLD_TO empty for the SU flowing to RS')
+
+  Args = Parser.parse_args()
+
+  generateZone(Args.OUTPUTPATH,Args.su,Args.gu,Args.depth,Args.re,Args.seed,not Args.no_su_links)
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  main()
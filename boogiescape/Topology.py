@@ -0,0 +1,157 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+import networkx
+
+
+######################################################
+######################################################
+
+
+class Catchment():
+
+  def __init__(self,Outlet):
+    self.Outlet = Outlet
+    self.Members = list()
+    self.Area = 0
+
+
+######################################################
+######################################################
+
+
+def _getAcyclicView(G):
+  if networkx.is_directed_acyclic_graph(G):
+    return G,None
+
+  # strongly connected components are collapsed so that cyclic inputs are handled like networkx.ancestors() does
+  C = networkx.condensation(G)
+  return C,networkx.get_node_attributes(C,'members')
+
+
+######################################################
+######################################################
+
+
+def buildCatchments(G,Outlets,AreaFunc=None):
+
+  # Units are labelled from downstream to upstream with the set of outlets they drain to,
+  # without traversing outlets. Labels are shared along identical downstream paths,
+  # so the whole sweep is O(V+E) on tree-like networks.
+
+  Catchments = dict()
+  for Outlet in Outlets:
+    Catchments[Outlet] = Catchment(Outlet)
+
+  DAG,MembersMap = _getAcyclicView(G)
+
+  Empty = frozenset()
+  Contributions = dict()
+
+  for Node in reversed(list(networkx.topological_sort(DAG))):
+    Labels = Empty
+    for Succ in DAG.successors(Node):
+      SuccLabels = Contributions[Succ]
+      if not Labels:
+        Labels = SuccLabels
+      elif SuccLabels and SuccLabels is not Labels:
+        Labels = Labels | SuccLabels
+
+    if MembersMap is None:
+      Nodes = (Node,)
+    else:
+      Nodes = tuple(sorted(MembersMap[Node],key=str))
+
+    if Labels:
+      for UnitNode in Nodes:
+        Area = None
+        if AreaFunc:
+          Area = AreaFunc(UnitNode)
+        for Outlet in Labels:
+          Catchments[Outlet].Members.append(UnitNode)
+          if Area is not None:
+            Catchments[Outlet].Area += Area
+
+    if len(Nodes) == 1 and Nodes[0] in Catchments:
+      Contributions[Node] = frozenset(Nodes)
+    else:
+      Contributions[Node] = Labels
+
+  return Catchments
+
+
+######################################################
+######################################################
+
+
+def computeLevels(G):
+
+  # Level of each node in one linear pass over the topological generations:
+  # 1 for nodes without upstream nodes, otherwise 1 + the highest level of the upstream nodes.
+  # Nodes of a same cycle share the same level.
+
+  DAG,MembersMap = _getAcyclicView(G)
+
+  Levels = dict()
+  for Level,Nodes in enumerate(networkx.topological_generations(DAG),1):
+    for Node in Nodes:
+      if MembersMap is None:
+        Levels[Node] = Level
+      else:
+        for Member in MembersMap[Node]:
+          Levels[Member] = Level
+
+  return Levels
+
+
+######################################################
+######################################################
+
+
+def findComponents(Count,Edges):
+
+  # Weakly connected components of nodes 0..Count-1 linked by the (node,node) edges,
+  # with a union-find on plain lists instead of a graph object.
+  # Components are numbered in the order of their first node.
+
+  Parents = list(range(Count))
+
+  def findRoot(Node):
+    Root = Node
+    while Parents[Root] != Root:
+      Root = Parents[Root]
+    while Parents[Node] != Root:
+      Parents[Node],Node = Root,Parents[Node]
+    return Root
+
+  for From,To in Edges:
+    FromRoot = findRoot(From)
+    ToRoot = findRoot(To)
+    if FromRoot != ToRoot:
+      if FromRoot < ToRoot:
+        Parents[ToRoot] = FromRoot
+      else:
+        Parents[FromRoot] = ToRoot
+
+  # roots are the smallest node of each component
+  Labels = [0]*Count
+  ComponentsCount = 0
+  for Node in range(Count):
+    Root = findRoot(Node)
+    if Root == Node:
+      Labels[Node] = ComponentsCount
+      ComponentsCount += 1
+    else:
+      Labels[Node] = Labels[Root]
+
+  return Labels,ComponentsCount
@@ -0,0 +1,254 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+__license__ = "GPLv3"
+__author__ = "Jean-Christophe Fabre <jean-christophe.fabre@inra.fr>"
+__email__ = "jean-christophe.fabre@inra.fr"
+
+
+######################################################
+######################################################
+
+
+# Pre-flight checks of the input units, run before the expensive stages.
+# All checks are linear in the number of units and links, and every issue is collected
+# as a dict (severity, code, class, id, field, message) instead of stopping at the first one.
+
+
+import json
+
+import networkx
+
+from . import Data
+from . import Topology
+
+
+######################################################
+######################################################
+
+
+def makeIssue(Severity,Code,UnitsClass,Id,Message,Field=None):
+  return { 'severity' : Severity, 'code' : Code, 'class' : UnitsClass, 'id' : Id, 'field' : Field, 'message' : Message }
+
+
+######################################################
+######################################################
+
+
+def _parseInt(Value):
+  # integer value of a field (possibly stored as string), None if missing, raises ValueError if invalid
+  if Value is None or Value == "":
+    return None
+  if isinstance(Value,float):
+    if not Value.is_integer():
+      raise ValueError(Value)
+    return int(Value)
+  return int(Value)
+
+
+######################################################
+######################################################
+
+
+def checkDuplicates(UnitsClass,UnitsData,Issues):
+  if isinstance(UnitsData,Data.UnitsStore):
+    for Id in UnitsData.getDuplicateIds():
+      Issues.append(makeIssue('error','duplicate-id',UnitsClass,Id,
+                              "{}#{} is defined more than once, only its last definition is used".format(UnitsClass,Id),
+                              "OFLD_ID"))
+
+
+######################################################
+######################################################
+
+
+def resolveLinkId(Link):
+  # integer ID of a [class,ID] link, IDs being possibly kept as strings (e.g. "1" or "012"),
+  # None if it is not an integer
+  try:
+    return _parseInt(Link[1])
+  except (ValueError,TypeError):
+    return None
+
+
+######################################################
+######################################################
+
+
+def checkLinks(Units,Issues):
+  for UnitsClass,UnitsData in Units.items():
+    for Field,Name in [("OFLD_TO","To"),("OFLD_CHILD","Child")]:
+      for Id,Unit in UnitsData.items():
+        for Link in getattr(Unit,Name):
+          if Link is None:
+            Issues.append(makeIssue('error','malformed-link',UnitsClass,Id,
+                                    "{}#{} has a malformed link (CLASS#ID expected)".format(UnitsClass,Id),Field))
+            continue
+          LinkId = resolveLinkId(Link)
+          if LinkId is None:
+            Issues.append(makeIssue('error','invalid-link-id',UnitsClass,Id,
+                                    "{}#{} links to {}#{}, not an integer ID".format(UnitsClass,Id,Link[0],Link[1]),Field))
+          elif Link[0] not in Units or LinkId not in Units[Link[0]]:
+            Issues.append(makeIssue('error','dangling-link',UnitsClass,Id,
+                                    "{}#{} links to {}#{} which does not exist".format(UnitsClass,Id,Link[0],Link[1]),Field))
+
+
+######################################################
+######################################################
+
+
+def checkValues(Units,Issues):
+  # fields used by the AP and GU stages
+
+  APSources = dict()
+  for UnitsClass in ["RS","RE"]:
+    for Id,Unit in Units.get(UnitsClass,dict()).items():
+      try:
+        APID = _parseInt(Unit.Attributes.get("AP_ID"))
+      except ValueError:
+        Issues.append(makeIssue('error','invalid-value',UnitsClass,Id,
+                                "{}#{} has an invalid AP_ID value".format(UnitsClass,Id),"AP_ID"))
+        continue
+      if APID is None:
+        continue
+      if APID in APSources:
+        Issues.append(makeIssue('error','duplicate-ap',UnitsClass,Id,
+                                "AP#{} is created from both {} and {}#{}".format(APID,APSources[APID],UnitsClass,Id),"AP_ID"))
+      else:
+        APSources[APID] = "{}#{}".format(UnitsClass,Id)
+
+  for Id,Unit in Units.get("RS",dict()).items():
+    try:
+      if _parseInt(Unit.Attributes.get("GUconnect")) is None:
+        Issues.append(makeIssue('error','missing-value',"RS",Id,"RS#{} has no GUconnect value".format(Id),"GUconnect"))
+    except ValueError:
+      Issues.append(makeIssue('error','invalid-value',"RS",Id,"RS#{} has an invalid GUconnect value".format(Id),"GUconnect"))
+
+  for Id,Unit in Units.get("SU",dict()).items():
+    Value = Unit.Attributes.get("FROM_AP")
+    try:
+      APID = _parseInt(Value)
+    except ValueError:
+      Issues.append(makeIssue('error','invalid-value',"SU",Id,
+                              "SU#{} has an invalid FROM_AP value ({})".format(Id,Value),"FROM_AP"))
+      continue
+    # 0 means no AP
+    if APID and APID not in APSources:
+      Issues.append(makeIssue('warning','dangling-ap',"SU",Id,
+                              "SU#{} is connected to AP#{} which is not created by any RS or RE".format(Id,APID),"FROM_AP"))
+
+    if Unit.Attributes.get("area") is None:
+      Issues.append(makeIssue('error','missing-value',"SU",Id,"SU#{} has no area value".format(Id),"area"))
+
+
+######################################################
+######################################################
+
+
+def buildLinksGraph(Units):
+  # graph of the To links between existing units, nodes are (class,ID) tuples
+  G = networkx.DiGraph()
+  for UnitsClass,UnitsData in Units.items():
+    for Id,Unit in UnitsData.items():
+      FromNode = (UnitsClass,Id)
+      G.add_node(FromNode)
+      for Link in Unit.To:
+        if Link is None:
+          continue
+        LinkId = resolveLinkId(Link)
+        if Link[0] in Units and LinkId is not None and LinkId in Units[Link[0]]:
+          G.add_edge(FromNode,(Link[0],LinkId))
+  return G
+
+
+######################################################
+######################################################
+
+
+def getOutlets(Units):
+  Outlets = list()
+  for Id,Unit in Units.get("RS",dict()).items():
+    try:
+      if (_parseInt(Unit.Attributes.get("GUconnect")) or 0) > 0:
+        Outlets.append(("RS",Id))
+    except ValueError:
+      pass
+  return Outlets
+
+
+######################################################
+######################################################
+
+
+def checkGraph(Units,Issues):
+  G = buildLinksGraph(Units)
+
+  for Component in networkx.strongly_connected_components(G):
+    Nodes = sorted(Component,key=str)
+    if len(Nodes) > 1 or G.has_edge(Nodes[0],Nodes[0]):
+      Issues.append(makeIssue('error','cycle',Nodes[0][0],Nodes[0][1],
+                              "cycle of To links between {}".format(", ".join("{}#{}".format(*Node) for Node in Nodes)),
+                              "OFLD_TO"))
+
+  Outlets = getOutlets(Units)
+  if not Outlets:
+    Issues.append(makeIssue('error','no-outlet',"RS",None,"no RS is a GU outlet (GUconnect > 0)","GUconnect"))
+    return
+
+  SUData = Units.get("SU",dict())
+
+  def getArea(Node):
+    if Node[0] == "SU":
+      return 1
+    return None
+
+  Catchments = Topology.buildCatchments(G,Outlets,getArea)
+
+  Reached = set()
+  for Outlet,Catchment in Catchments.items():
+    Reached.update(Catchment.Members)
+    if not Catchment.Area:
+      Issues.append(makeIssue('warning','empty-catchment',"RS",Outlet[1],
+                              "no SU drains to the outlet RS#{}, its GU is not created".format(Outlet[1]),"GUconnect"))
+
+  for Id in SUData.keys():
+    if ("SU",Id) not in Reached:
+      Issues.append(makeIssue('warning','no-outlet-reached',"SU",Id,
+                              "SU#{} does not drain to any outlet, it is not part of any GU".format(Id),"OFLD_TO"))
+
+
+######################################################
+######################################################
+
+
+def validate(Units):
+  # Units maps the input units classes to their units data
+  Issues = list()
+
+  for UnitsClass,UnitsData in Units.items():
+    checkDuplicates(UnitsClass,UnitsData,Issues)
+
+  checkLinks(Units,Issues)
+  checkValues(Units,Issues)
+  checkGraph(Units,Issues)
+
+  return Issues
+
+
+######################################################
+######################################################
+
+
+def getReport(Issues):
+  Errors = len([Issue for Issue in Issues if Issue['severity'] == 'error'])
+  return { 'valid' : Errors == 0, 'errors' : Errors, 'warnings' : len(Issues)-Errors, 'issues' : Issues }
+
+
+######################################################
+######################################################
+
+
+def writeReport(Report,FilePath):
+  with open(FilePath,'w') as File:
+    json.dump(Report,File,indent=2)
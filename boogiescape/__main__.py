@@ -12,8 +12,58 @@ __email__ = "jean-christophe.fabre@inra.fr"
 
 
 import argparse
+import sys
 
 from . import BoogieScape
+from . import Connectivity
+from . import Geometry
+
+
+######################################################
+######################################################
+
+
+def addPipelineArguments(Parser):
+  Parser.add_argument('--overwrite',action='store_true',help='Overwrite outputs')
+  Parser.add_argument('--export-graph-view',action='store_true',help='Export GU graph view as pdf')
+  Parser.add_argument('--graph-view-formats',nargs='+',choices=BoogieScape.BoogieScape._GraphViewFormats,default=['pdf'],metavar='FORMAT',
+                      help='Formats of the exported GU graph view: pdf (default, needs Graphviz), dot, graphml, edgelist')
+  Parser.add_argument('--graph-view-per-gu',action='store_true',help='Render one GU graph view per GU catchment as pdf')
+  Parser.add_argument('--graph-view-max-nodes',type=int,default=None,metavar='N',
+                      help='Skip the pdf renders of graph views with more than N nodes')
+  Parser.add_argument('--graph-view-workers',type=int,default=1,metavar='N',help='Number of processes rendering per GU graph views (default: 1)')
+  Parser.add_argument('--gu-geometry',choices=Geometry.GUGeometryModes,default='multipolygon',
+                      help='GU geometries: multipolygon of SU (default), dissolved SU, or none for attributes only')
+  Parser.add_argument('--gu-workers',type=int,default=1,metavar='N',help='Number of processes building the GU geometries (default: 1)')
+  Parser.add_argument('--output-format',choices=BoogieScape.BoogieScape._OutputFormats,default='shp+geojson',
+                      help='Output GIS files: shapefiles and GeoJSON files (default), single GeoPackage, or FlatGeobuf files')
+  Parser.add_argument('--coordinate-precision',type=int,default=None,metavar='N',
+                      help='Number of decimals of the coordinates written to GeoJSON files (default: full precision)')
+  Parser.add_argument('--snap-grid',type=float,default=None,metavar='SIZE',
+                      help='Snap the coordinates of the output geometries to a grid of the given size')
+  Parser.add_argument('--simplify',type=float,default=None,metavar='TOLERANCE',
+                      help='Simplify the output geometries, preserving their topology, with the given tolerance')
+  Parser.add_argument('--compress-fluidx',action='store_true',help='Write domain.fluidx as a gzip-compressed file')
+  Parser.add_argument('--fluidx-format',action='append',default=None,metavar='[CLASS.]NAME=SPEC',
+                      help='Python format spec of an attribute in domain.fluidx, for all or one units class '
+                           '(e.g. xposition=.2f), repeatable (default: shortest representation)')
+  Parser.add_argument('--cache-dir',type=str,default=None,metavar='DIR',help='Directory for caching stages results between runs')
+  Parser.add_argument('--input-workers',type=int,default=1,metavar='N',help='Number of threads loading the input files (default: 1)')
+  Parser.add_argument('--output-workers',type=int,default=1,metavar='N',help='Number of threads writing the output GIS files (default: 1)')
+  Parser.add_argument('--derive-connectivity',choices=Connectivity.ConnectivityModes,default=None,
+                      help='Connect SU without OFLD_TO to the nearest RS or RE, or to the RS or RE sharing their boundary')
+  Parser.add_argument('--auto-pcsorder',action='store_true',
+                      help='Compute the process orders of all units from the topological levels of the To links graph')
+  Parser.add_argument('--partitioned',action='store_true',
+                      help='Process the independent GU catchments by partitions, loading only the geometries of the processed partitions')
+  Parser.add_argument('--partition-size',type=int,default=100000,metavar='N',
+                      help='Maximum number of input units of a partition, except for larger catchments (default: 100000)')
+  Parser.add_argument('--partition-workers',type=int,default=1,metavar='N',help='Number of processes processing partitions (default: 1)')
+  Parser.add_argument('--validate',action='store_true',help='Check the input units before the AP and GU stages, failing on errors')
+  Parser.add_argument('--validate-only',action='store_true',help='Check the input units and write the validation report only')
+  Parser.add_argument('--trace-memory',action='store_true',
+                      help='Trace the Python allocations to report the peak Python memory of each stage (slower)')
+  Parser.add_argument('--quiet',action='store_true',help='Do not print per-unit and per-field progress lines')
 
 
 ######################################################
@@ -26,8 +76,7 @@ def main():
 
   Parser.add_argument('INPUTPATH',type=str,help='Input path')
   Parser.add_argument('OUTPUTPATH',type=str,help='Output path')
-  Parser.add_argument('--overwrite',action='store_true',help='Overwrite outputs')
-  Parser.add_argument('--export-graph-view',action='store_true',help='Export GU graph view as pdf')
+  addPipelineArguments(Parser)
 
 
   Args = vars(Parser.parse_args())
@@ -40,4 +89,7 @@ def main():
 
 
   BS = BoogieScape.BoogieScape(InPath,OutPath,Args)
-  BS.run()
+  try:
+    BS.run()
+  except BoogieScape.BoogieScapeError as E:
+    sys.exit(E.Code)
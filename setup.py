@@ -17,13 +17,18 @@ setup(name = 'boogiescape',
       packages = ['boogiescape'],
       entry_points = {
           'console_scripts': [
-              'boogiescape = boogiescape.__main__:main'
+              'boogiescape = boogiescape.__main__:main',
+              'boogiescape-batch = boogiescape.Batch:main',
+              'boogiescape-server = boogiescape.Server:main'
           ]
       },
       test_suite='tests',
       install_requires = [
         'argparse',
         'networkx',
-        'pydot'
-      ]
+        'numpy'
+      ],
+      extras_require = {
+        'graphview': ['matplotlib','pydot']
+      }
 )
\ No newline at end of file
@@ -56,6 +56,14 @@ class MainTest(unittest.TestCase):
     self.assertEqual(len(Res),3)
 
 
+  ######################################################
+
+
+  def testUnitsClassSplitColumn(self):
+    Res = BoogieScape.BoogieScape.splitUnitsStrColumn(["TU#99",None,"","TU#99;UT#101","TU#99"])
+    self.assertEqual(Res,[[["TU","99"]],None,None,[["TU","99"],["UT","101"]],[["TU","99"]]])
+
+
 ######################################################
 ######################################################
 
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import pickle
+import unittest
+
+import numpy
+
+from boogiescape import Data
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @staticmethod
+  def _makeUnits(FromAPList):
+    UnitsData = dict()
+    Id = 1
+    for FromAP in FromAPList:
+      Unit = Data.SpatialUnit()
+      Unit.Id = Id
+      Unit.Attributes["FROM_AP"] = FromAP
+      UnitsData[Id] = Unit
+      Id += 1
+    return UnitsData
+
+
+  ######################################################
+
+
+  def testAttributeIndex(self):
+    Index = Data.AttributeIndex(self._makeUnits(["3","1","3",None,"","2","3"]),"FROM_AP",int)
+    self.assertEqual(len(Index),3)
+    self.assertEqual(Index.getIds(3),[1,3,7])
+    self.assertEqual(Index.getIds(1),[2])
+    self.assertEqual(Index.getIds(2),[6])
+    self.assertEqual(Index.getIds(99),[])
+    self.assertTrue(3 in Index)
+    self.assertFalse("3" in Index)
+
+
+  ######################################################
+
+
+  def testAttributeIndexNoKeyFunc(self):
+    Index = Data.AttributeIndex(self._makeUnits(["A","B","A"]),"FROM_AP")
+    self.assertEqual(Index.getIds("A"),[1,3])
+    self.assertEqual(sorted(Index.getValues()),["A","B"])
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _makeStore():
+    return Data.UnitsStore("SU",[1,2,3],[1,None,2],
+                           {'slope' : [1.5,None,3.0], 'code' : ['A','B',None], 'landuse' : [4,5,6]},
+                           {'slope' : 'real', 'code' : 'str', 'landuse' : 'int'},
+                           [[["RS","1"]],None,[["SU","1"],["RS","2"]]],None,["G1","G2","G3"])
+
+
+  ######################################################
+
+
+  def testUnitsStore(self):
+    Store = self._makeStore()
+    self.assertEqual(len(Store),3)
+    self.assertEqual(list(Store.keys()),[1,2,3])
+    self.assertEqual(Store[1].Id,1)
+    self.assertEqual(Store[2].PcsOrd,None)
+    self.assertEqual(Store[3].PcsOrd,2)
+    self.assertEqual(list(Store[3].To),[["SU",1],["RS",2]])
+    self.assertEqual(len(Store[2].To),0)
+    self.assertEqual(len(Store[1].Child),0)
+    self.assertEqual(Store[3].Geometry,"G3")
+    self.assertEqual(Store[1].Attributes['slope'],1.5)
+    self.assertIsNone(Store[2].Attributes['slope'])
+    self.assertIsNone(Store[3].Attributes['code'])
+    self.assertIs(type(Store[2].Attributes['landuse']),int)
+    self.assertTrue('slope' in Store[1].Attributes)
+    self.assertFalse('area' in Store[1].Attributes)
+    self.assertEqual(dict(Store[1].Attributes),{'slope' : 1.5, 'code' : 'A', 'landuse' : 4})
+    self.assertTrue(Store.hasNumericColumn('slope'))
+    self.assertFalse(Store.hasNumericColumn('code'))
+
+
+  ######################################################
+
+
+  def testUnitsStoreArrays(self):
+    Store = Data.UnitsStore("SU",[1,2,3],numpy.ma.array([1,2,3],mask=[False,True,False]),
+                            {'area' : numpy.ma.array([1.0,2.0,3.0],mask=[False,False,True]),
+                             'code' : numpy.array([1,2,3])},
+                            {'area' : 'real', 'code' : 'str'})
+    self.assertEqual(Store[2].PcsOrd,None)
+    self.assertEqual(Store[1].Attributes['area'],1.0)
+    self.assertIsNone(Store[3].Attributes['area'])
+    self.assertTrue(Store.hasNumericColumn('area'))
+    self.assertFalse(Store.hasNumericColumn('code'))
+    self.assertIs(type(Store[3].Attributes['code']),int)
+
+
+  ######################################################
+
+
+  def testUnitsStorePcsOrds(self):
+    Store = self._makeStore()
+    Data.setPcsOrds(Store,[3,1],[7,8])
+    self.assertEqual([Unit.PcsOrd for Unit in Store.values()],[8,None,7])
+
+    UnitsData = self._makeUnits(["1","2"])
+    Data.setPcsOrds(UnitsData,[2],[5])
+    self.assertEqual(UnitsData[2].PcsOrd,5)
+
+
+  ######################################################
+
+
+  def testUnitsStoreRawGeometries(self):
+    Store = Data.UnitsStore("RE",[1,2],[1,1],{},{},None,None,[b"WKB1",None])
+    self.assertEqual(Store[1].RawGeometry,b"WKB1")
+    self.assertIsNone(Store[2].Geometry)
+
+    Store = pickle.loads(pickle.dumps(Store))
+    self.assertEqual(Store[1].RawGeometry,b"WKB1")
+
+    Store[2].Geometry = "G2"
+    self.assertEqual(Store[2].Geometry,"G2")
+
+
+  ######################################################
+
+
+  def testUnitsStoreDuplicates(self):
+    Store = Data.UnitsStore("SU",[5,7,5],[1,2,3],{'area' : [1.0,2.0,3.0]},{'area' : 'real'})
+    self.assertEqual(list(Store.keys()),[5,7])
+    self.assertEqual(Store[5].Attributes['area'],3.0)
+    self.assertEqual(Store[5].PcsOrd,3)
+
+
+  ######################################################
+
+
+  def testUnitsStoreValues(self):
+    Store = self._makeStore()
+    Store[1].Attributes['slope'] = 2.5
+    Store[2].Attributes['slope'] = 0.5
+    Store[3].Attributes['slope'] = None
+    self.assertEqual(Store.getValues('slope'),[2.5,0.5,None])
+    self.assertTrue(Store.hasNumericColumn('slope'))
+
+    # values not matching the column type are kept unchanged
+    Store[1].Attributes['landuse'] = 4.5
+    self.assertEqual(Store.getValues('landuse'),[4.5,5,6])
+    Store[1].Attributes['newfield'] = "X"
+    self.assertEqual(Store.getValues('newfield'),["X",None,None])
+
+    Store.setColumn('slope',Store.getColumn('slope') / 10,Store.getMask('slope'))
+    self.assertEqual(Store.getValues('slope'),[0.25,0.05,None])
+
+
+  ######################################################
+
+
+  def testUnitsStoreRelations(self):
+    Store = self._makeStore()
+    Store[2].To.append(["RS",3])
+    Store.extendRelations("To",[3,1,3,2],"GU",[1,1,2,2])
+    self.assertEqual(list(Store[1].To),[["RS",1],["GU",1]])
+    self.assertEqual(list(Store[2].To),[["RS",3],["GU",2]])
+    self.assertEqual(list(Store[3].To),[["SU",1],["RS",2],["GU",1],["GU",2]])
+    Store.getRelations("To").compact()
+    self.assertEqual(list(Store[2].To),[["RS",3],["GU",2]])
+
+    Store[1].Child = [["AP",4]]
+    self.assertEqual(list(Store[1].Child),[["AP",4]])
+
+
+  ######################################################
+
+
+  def testUnitsStoreTake(self):
+    Store = self._makeStore()
+    Store[2].To.append(["RS",3])
+    Part = Store.take([2,1])
+    self.assertEqual(list(Part.keys()),[3,2])
+    self.assertEqual(Part.getSourceRows().tolist(),[2,1])
+    self.assertEqual(list(Part[2].To),[["RS",3]])
+    self.assertEqual(Part[3].Attributes['landuse'],Store[3].Attributes['landuse'])
+
+    Part.setGeometries([b"WKB3",None])
+    self.assertEqual(Part[3].RawGeometry,b"WKB3")
+    self.assertRaises(ValueError,Part.setGeometries,[None])
+
+    # source rows of the units given at construction, the last definition of duplicates being kept
+    Store = Data.UnitsStore("SU",[5,7,5],[1,2,3],{},{})
+    self.assertEqual(Store.getSourceRows().tolist(),[2,1])
+
+
+  ######################################################
+
+
+  def testCopyUnits(self):
+    for UnitsData in [self._makeStore(),self._makeUnits(["1","2","3"])]:
+      Copy = Data.copyUnits(UnitsData)
+      Copy[2].Attributes['FROM_AP'] = "99"
+      Copy[2].To.append(["RS",1])
+      self.assertNotEqual(UnitsData[2].Attributes.get('FROM_AP'),"99")
+      self.assertEqual(list(UnitsData[2].To),[])
+      self.assertEqual(list(Copy.keys()),list(UnitsData.keys()))
+
+
+  ######################################################
+
+
+  def testUnitsStoreIrregularRelations(self):
+    Store = Data.UnitsStore("SU",[1,2],[1,1],{},{},[[["RS","007"]],[None]])
+    self.assertEqual(list(Store[1].To),[["RS","007"]])
+    self.assertEqual(list(Store[2].To),[None])
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import random
+import unittest
+
+import networkx
+
+from boogiescape import Topology
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @staticmethod
+  def _makeGraph(Edges):
+    G = networkx.DiGraph()
+    G.add_edges_from(Edges)
+    return G
+
+
+  ######################################################
+
+
+  def _checkAgainstAncestors(self,G,Outlets):
+    Catchments = Topology.buildCatchments(G,Outlets,lambda Node: 1)
+    self.assertEqual(list(Catchments.keys()),Outlets)
+    for Outlet in Outlets:
+      Ancestors = networkx.ancestors(G,Outlet)
+      self.assertEqual(sorted(Catchments[Outlet].Members),sorted(Ancestors))
+      self.assertEqual(Catchments[Outlet].Area,len(Ancestors))
+
+
+  ######################################################
+
+
+  def testTree(self):
+    G = self._makeGraph([("SU#1","SU#2"),("SU#2","RS#1"),("SU#3","RS#1"),("RS#1","RS#2"),
+                         ("SU#4","RS#2"),("RE#1","RS#3")])
+    Catchments = Topology.buildCatchments(G,["RS#2","RS#3"])
+    self.assertEqual(sorted(Catchments["RS#2"].Members),["RS#1","SU#1","SU#2","SU#3","SU#4"])
+    self.assertEqual(Catchments["RS#3"].Members,["RE#1"])
+    self.assertEqual(Catchments["RS#2"].Area,0)
+
+
+  ######################################################
+
+
+  def testAreas(self):
+    G = self._makeGraph([("SU#1","RS#1"),("SU#2","RS#1"),("RS#1","RS#2")])
+    Areas = {"SU#1" : 1.5, "SU#2" : 2.5}
+    Catchments = Topology.buildCatchments(G,["RS#2"],lambda Node: Areas.get(Node))
+    self.assertEqual(Catchments["RS#2"].Area,4.0)
+
+
+  ######################################################
+
+
+  def testMultipleOutlets(self):
+    G = self._makeGraph([("SU#1","RS#1"),("SU#1","RS#2"),("SU#2","SU#1")])
+    self._checkAgainstAncestors(G,["RS#1","RS#2"])
+
+
+  ######################################################
+
+
+  def testCycle(self):
+    G = self._makeGraph([("SU#1","SU#2"),("SU#2","SU#1"),("SU#2","RS#1"),("SU#3","SU#1")])
+    self._checkAgainstAncestors(G,["RS#1"])
+
+
+  ######################################################
+
+
+  def testRandomNetworks(self):
+    Random = random.Random(42)
+    for Trial in range(20):
+      G = networkx.DiGraph()
+      RSCount = 30
+      Outlets = list()
+      for i in range(RSCount):
+        G.add_node("RS#{}".format(i))
+        # outlets are never connected downstream
+        if Random.random() < 0.2:
+          Outlets.append("RS#{}".format(i))
+        elif i > 0:
+          G.add_edge("RS#{}".format(i),"RS#{}".format(Random.randrange(i)))
+      for i in range(100):
+        Target = Random.choice(["RS#{}".format(Random.randrange(RSCount)),"SU#{}".format(Random.randrange(100))])
+        G.add_edge("SU#{}".format(i),Target)
+      self._checkAgainstAncestors(G,Outlets)
+
+
+  ######################################################
+
+
+  def testLevels(self):
+    G = networkx.DiGraph([("SU#1","SU#2"),("SU#2","RS#1"),("SU#3","RS#1"),("RS#1","RS#2"),("AP#1","SU#1")])
+    G.add_node("RE#1")
+    Levels = Topology.computeLevels(G)
+    self.assertEqual(Levels,{ "AP#1" : 1, "SU#3" : 1, "RE#1" : 1, "SU#1" : 2, "SU#2" : 3, "RS#1" : 4, "RS#2" : 5 })
+
+    # units of a cycle share their level
+    G.add_edge("RS#2","SU#2")
+    Levels = Topology.computeLevels(G)
+    self.assertEqual(Levels["SU#2"],3)
+    self.assertEqual(Levels["RS#1"],3)
+    self.assertEqual(Levels["RS#2"],3)
+
+    for From,To in G.edges:
+      if not networkx.has_path(G,To,From):
+        self.assertLess(Levels[From],Levels[To])
+
+
+  ######################################################
+
+
+  def testComponents(self):
+    Labels,Count = Topology.findComponents(7,[(3,1),(5,6),(6,3),(2,2)])
+    self.assertEqual(Labels,[0,1,2,1,3,1,1])
+    self.assertEqual(Count,4)
+
+    Labels,Count = Topology.findComponents(0,[])
+    self.assertEqual((Labels,Count),([],0))
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
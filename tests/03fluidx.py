@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from boogiescape import Data
+from boogiescape import FluidX
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  ExpectedDomain = """<?xml version="1.0" standalone="yes"?>
+<openfluid>
+  <domain>
+    <definition>
+      <unit class="SU" ID="1" pcsorder="1">
+        <to class="RS" ID="4" />
+        <childof class="AP" ID="2" />
+      </unit>
+      <unit class="SU" ID="2" pcsorder="None">
+      </unit>
+    </definition>
+    <attributes unitsclass="SU" colorder="slope;code">
+1 0.5 A
+2 None B
+    </attributes>
+  </domain>
+</openfluid>
+"""
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _writeDomain(FilePath,Compress=False,BufferSize=1048576):
+    Store = Data.UnitsStore("SU",[1,2],[1,None],{'slope' : [0.5,None], 'code' : ['A','B']},
+                            {'slope' : 'real', 'code' : 'str'},[[["RS","4"]],None],[[["AP","2"]],None])
+
+    with FluidX.FluidXWriter(FilePath,Compress,BufferSize) as Writer:
+      Writer.beginDocument()
+      Writer.beginSection(1,'domain')
+      Writer.beginSection(2,'definition')
+      Writer.writeDefinition("SU",(Unit for Unit in Store.values()))
+      Writer.endSection()
+      Writer.writeAttributes("SU",Store.values(),['slope','code'])
+
+
+  ######################################################
+
+
+  def testDomain(self):
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"domain.fluidx")
+      self._writeDomain(FilePath,BufferSize=16)
+      with open(FilePath) as File:
+        self.assertEqual(File.read(),self.ExpectedDomain)
+
+
+  ######################################################
+
+
+  def testCompressedDomain(self):
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"domain.fluidx.gz")
+      self._writeDomain(FilePath,Compress=True)
+      with gzip.open(FilePath,'rt') as File:
+        self.assertEqual(File.read(),self.ExpectedDomain)
+
+
+  ######################################################
+
+
+  def testDomainToBuffer(self):
+    Buffer = io.StringIO()
+    self._writeDomain(Buffer)
+    self.assertFalse(Buffer.closed)
+    self.assertEqual(Buffer.getvalue(),self.ExpectedDomain)
+
+
+  ######################################################
+
+
+  def testAttributesFormats(self):
+    Store = Data.UnitsStore("SU",[1,2,3],[1,1,1],{'x' : [0.1+0.2,None,2.0], 'n' : [1,2,3], 'code' : ['A','B','C']},
+                            {'x' : 'real', 'n' : 'int', 'code' : 'str'})
+    Units = { Id : Unit for Id,Unit in Store.items() }
+
+    for UnitsData in [Store,Units,Store.values()]:
+      Buffer = io.StringIO()
+      with FluidX.FluidXWriter(Buffer) as Writer:
+        Writer.writeAttributesRows(UnitsData,['x','n','code'])
+      self.assertEqual(Buffer.getvalue(),"1 0.30000000000000004 1 A\n2 None 2 B\n3 2.0 3 C\n")
+
+      Buffer = io.StringIO()
+      with FluidX.FluidXWriter(Buffer) as Writer:
+        Writer.writeAttributesRows(UnitsData,['x','n','code'],{ 'x' : '.3f', 'n' : '03d', 'code' : '.2f' })
+      self.assertEqual(Buffer.getvalue(),"1 0.300 001 A\n2 None 002 B\n3 2.000 003 C\n")
+
+    # specs applied only to the number types they support
+    self.assertEqual(FluidX.formatColumn([1,2.5,None],'.2'),["1","2.5","None"])
+    self.assertEqual(FluidX.formatColumn([10,2.5],'x'),["a","2.5"])
+    self.assertEqual(FluidX.formatColumn([10,2.5],'>5'),["   10","  2.5"])
+    self.assertEqual(FluidX.getFormatTypes('.3'),(float,))
+    self.assertEqual(FluidX.getFormatTypes('d'),(int,))
+    self.assertEqual(FluidX.getFormatTypes('z!'),())
+
+    Buffer = io.StringIO()
+    with FluidX.FluidXWriter(Buffer) as Writer:
+      Writer.writeAttributesRows(Store,[])
+    self.assertEqual(Buffer.getvalue(),"1 \n2 \n3 \n")
+
+    Blocks = list(FluidX.getAttributesBlocks(Store,['n'],BlockSize=2))
+    self.assertEqual(Blocks,[([1,2],[[1,2]]),([3],[[3]])])
+
+
+  ######################################################
+
+
+  def testDomainWriter(self):
+    Store = Data.UnitsStore("SU",[1,2],[1,None],{'slope' : [0.5,None], 'code' : ['A','B']},
+                            {'slope' : 'real', 'code' : 'str'},[[["RS","4"]],None],[[["AP","2"]],None])
+
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"domain.fluidx")
+      with FluidX.DomainWriter(FilePath,{ "SU" : ['slope','code'] }) as Writer:
+        Writer.writeUnits("SU",Store.take([0]))
+        Writer.writeUnits("SU",Store.take([1]))
+      with open(FilePath) as File:
+        self.assertEqual(File.read(),self.ExpectedDomain)
+      self.assertEqual(os.listdir(TmpDir),["domain.fluidx"])
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
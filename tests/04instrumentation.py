@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from boogiescape import Instrumentation
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  def testStagesEvents(self):
+    Instr = Instrumentation.Instrumentation()
+    Events = list()
+    Instr.addListener(Events.append)
+
+    Instr.begin()
+    with Instr.stage("first") as Event:
+      Event['units'] = { "SU" : 3 }
+    with self.assertRaises(ValueError):
+      with Instr.stage("second"):
+        raise ValueError("bad value")
+    Instr.end("ok",{ "SU" : 3 })
+
+    self.assertEqual([E['event'] for E in Events],
+                     ['run-started','stage-started','stage-done','stage-started','stage-done','run-done'])
+    self.assertEqual(Events[2]['units'],{ "SU" : 3 })
+    self.assertGreaterEqual(Events[2]['elapsed'],0)
+    self.assertEqual((Events[2]['status'],Events[2]['error']),('ok',None))
+    self.assertEqual((Events[4]['status'],Events[4]['error']),('failed',"ValueError: bad value"))
+
+
+  ######################################################
+
+
+  def testReport(self):
+    Instr = Instrumentation.Instrumentation()
+    Instr.begin()
+    with Instr.stage("first"):
+      pass
+    Instr.end("ok",{ "GU" : 2 })
+
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"report.json")
+      Instr.writeReport(FilePath,{ 'input' : "zone" })
+      with open(FilePath) as File:
+        Report = json.load(File)
+
+    self.assertEqual(Report['input'],"zone")
+    self.assertEqual(Report['status'],"ok")
+    self.assertEqual(Report['units'],{ "GU" : 2 })
+    self.assertEqual([S['stage'] for S in Report['stages']],["first"])
+
+
+  ######################################################
+
+
+  def testFailedReport(self):
+    Instr = Instrumentation.Instrumentation()
+    Instr.begin()
+    try:
+      with Instr.stage("first"):
+        raise RuntimeError("stage failure")
+    except RuntimeError as E:
+      Instr.end("failed",None,Instrumentation.getErrorText(E))
+
+    Report = Instr.getReport()
+    self.assertEqual(Report['status'],"failed")
+    self.assertEqual(Report['error'],"RuntimeError: stage failure")
+    self.assertEqual(Report['stages'][0]['status'],"failed")
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import unittest
+
+from boogiescape import Data
+from boogiescape import Validation
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @staticmethod
+  def _makeUnits(RS,SU,RE):
+    # units given as (ID,To,attributes) tuples
+    def makeStore(UnitsClass,Units,Kinds):
+      Fields = sorted(Kinds)
+      return Data.UnitsStore(UnitsClass,[U[0] for U in Units],[1]*len(Units),
+                             { F : [U[2].get(F) for U in Units] for F in Fields },Kinds,[U[1] for U in Units])
+
+    return { "RS" : makeStore("RS",RS,{ 'GUconnect' : 'int', 'AP_ID' : 'int' }),
+             "SU" : makeStore("SU",SU,{ 'FROM_AP' : 'str', 'area' : 'real' }),
+             "RE" : makeStore("RE",RE,{ 'AP_ID' : 'int' }) }
+
+
+  ######################################################
+
+
+  @staticmethod
+  def _getCodes(Issues):
+    return sorted((Issue['code'],Issue['class'],Issue['id']) for Issue in Issues)
+
+
+  ######################################################
+
+
+  def testValid(self):
+    Units = self._makeUnits([(1,[["RS",2]],{ 'GUconnect' : 0, 'AP_ID' : 5 }),(2,None,{ 'GUconnect' : 1 })],
+                            [(1,[["SU",2]],{ 'FROM_AP' : "5", 'area' : 1.0 }),(2,[["RS",1]],{ 'FROM_AP' : "0", 'area' : 1.0 })],
+                            [(1,[["RS",1]],{ 'AP_ID' : 6 })])
+    Report = Validation.getReport(Validation.validate(Units))
+    self.assertTrue(Report['valid'])
+    self.assertEqual(Report['issues'],[])
+
+
+  ######################################################
+
+
+  def testStringLinkIds(self):
+    # units data given as SpatialUnit dicts, with links IDs kept as strings as parsed from OFLD_TO
+    def makeUnit(Id,To,Attributes):
+      Unit = Data.SpatialUnit()
+      Unit.Id = Id
+      Unit.To = To
+      Unit.Attributes = Attributes
+      return Unit
+
+    Units = { "RS" : { 1 : makeUnit(1,[],{ 'GUconnect' : 1 }) },
+              "SU" : { 1 : makeUnit(1,[["RS","1"]],{ 'FROM_AP' : "0", 'area' : 1.0 }),
+                       2 : makeUnit(2,[["SU","001"],["RS","x"],["RS","3"]],{ 'FROM_AP' : "0", 'area' : 1.0 }) },
+              "RE" : dict() }
+
+    self.assertEqual(self._getCodes(Validation.validate(Units)),
+                     [('dangling-link','SU',2),('invalid-link-id','SU',2)])
+
+
+  ######################################################
+
+
+  def testIssues(self):
+    Units = self._makeUnits([(1,[["RS",2]],{ 'GUconnect' : 0, 'AP_ID' : 5 }),(2,None,{ 'GUconnect' : 1 }),
+                             (3,None,{ 'GUconnect' : 1 }),(4,None,{ 'GUconnect' : None })],
+                            [(1,[["SU",2]],{ 'FROM_AP' : "x", 'area' : 1.0 }),(2,[["RS",1],["RS",9]],{ 'FROM_AP' : "7", 'area' : 1.0 }),
+                             (3,[["SU",4]],{ 'FROM_AP' : "0", 'area' : 1.0 }),(4,[["SU",3]],{ 'FROM_AP' : "0", 'area' : None }),
+                             (4,[["SU",3]],{ 'FROM_AP' : "0", 'area' : None })],
+                            [(1,[["RS",1]],{ 'AP_ID' : 5 }),(2,[None],{})])
+    Issues = Validation.validate(Units)
+
+    self.assertEqual(self._getCodes(Issues),
+                     [('cycle','SU',3),
+                      ('dangling-ap','SU',2),
+                      ('dangling-link','SU',2),
+                      ('duplicate-ap','RE',1),
+                      ('duplicate-id','SU',4),
+                      ('empty-catchment','RS',3),
+                      ('invalid-value','SU',1),
+                      ('malformed-link','RE',2),
+                      ('missing-value','RS',4),
+                      ('missing-value','SU',4),
+                      ('no-outlet-reached','SU',3),
+                      ('no-outlet-reached','SU',4)])
+
+    Report = Validation.getReport(Issues)
+    self.assertFalse(Report['valid'])
+    self.assertEqual(Report['warnings'],4)
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
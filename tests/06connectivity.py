@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import random
+import unittest
+
+import numpy
+
+from boogiescape import Connectivity
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @staticmethod
+  def _makeBoxes(Count,Seed):
+    Random = random.Random(Seed)
+    Boxes = list()
+    for i in range(Count):
+      X = Random.uniform(0,1000)
+      Y = Random.uniform(0,1000)
+      Boxes.append((X,Y,X+Random.uniform(0,20),Y+Random.uniform(0,20)))
+    return numpy.array(Boxes)
+
+
+  ######################################################
+
+
+  def testQuery(self):
+    for Count in [0,1,7,500]:
+      Boxes = self._makeBoxes(Count,Count)
+      Tree = Connectivity.STRtree(Boxes,NodeCapacity=4)
+      self.assertEqual(len(Tree),Count)
+      for Box in [(100,100,300,250),(0,0,1000,1000),(-10,-10,-5,-5)]:
+        Expected = [i for i,B in enumerate(Boxes.tolist())
+                    if B[0] <= Box[2] and B[2] >= Box[0] and B[1] <= Box[3] and B[3] >= Box[1]]
+        self.assertEqual(Tree.query(Box),Expected)
+
+
+  ######################################################
+
+
+  def testNearest(self):
+    Boxes = self._makeBoxes(500,1)
+    Tree = Connectivity.STRtree(Boxes,NodeCapacity=4)
+    Centers = (Boxes[:,:2]+Boxes[:,2:])/2
+
+    for Box in [(10,10,12,12),(500,500,501,501),(2000,-50,2001,-40)]:
+      Index,Distance = Tree.nearest(Box)
+      self.assertAlmostEqual(Distance,Connectivity.getBoxDistance(Boxes,numpy.array(Box)).min())
+
+      # exact distances between centers, boxes distances being lower bounds
+      Center = numpy.array([(Box[0]+Box[2])/2,(Box[1]+Box[3])/2])
+      Distances = numpy.hypot(*(Centers-Center).T)
+      Index,Distance = Tree.nearest(Box,lambda i: float(Distances[i]))
+      self.assertEqual(Index,int(numpy.argmin(Distances)))
+      self.assertAlmostEqual(Distance,Distances.min())
+
+    self.assertEqual(Connectivity.STRtree(numpy.empty((0,4))).nearest((0,0,1,1)),(None,None))
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import argparse
+import concurrent.futures
+import json
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from boogiescape import Server
+from boogiescape.__main__ import addPipelineArguments
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    Parser = argparse.ArgumentParser()
+    addPipelineArguments(Parser)
+    Defaults = vars(Parser.parse_args([]))
+
+    cls.OutputRoot = os.path.join(os.path.dirname(os.path.realpath(__file__)),'_outputs')
+    os.makedirs(cls.OutputRoot,exist_ok=True)
+
+    cls.Jobs = Server.JobServer(2,Defaults,MaxQueued=4,OutputRoot=cls.OutputRoot)
+    cls.HTTPServer = Server.createHTTPServer(cls.Jobs,Port=0,Quiet=True)
+    cls.Thread = threading.Thread(target=cls.HTTPServer.serve_forever,daemon=True)
+    cls.Thread.start()
+    cls.URL = "http://127.0.0.1:{}".format(cls.HTTPServer.server_address[1])
+
+
+  ######################################################
+
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.HTTPServer.shutdown()
+    cls.HTTPServer.server_close()
+    cls.Jobs.shutdown()
+
+
+  ######################################################
+
+
+  def _request(self,Path,Content=None,Headers=None):
+    Data = json.dumps(Content).encode() if Content is not None else None
+    Headers = dict(Headers or { 'Content-Type' : "application/json" })
+    try:
+      with urllib.request.urlopen(urllib.request.Request(self.URL+Path,Data,Headers)) as Response:
+        return Response.status,json.loads(Response.read())
+    except urllib.error.HTTPError as E:
+      return E.code,json.loads(E.read())
+
+
+  ######################################################
+
+
+  def testJobs(self):
+    InputPath = os.path.join(os.path.dirname(os.path.realpath(__file__)),'datasets','zone0')
+    OutputPath = os.path.join(self.OutputRoot,'zone0-server')
+
+    # the second run of the zone reuses the worker processes
+    for Run in range(2):
+      Code,Job = self._request("/jobs",{ 'input' : InputPath, 'output' : OutputPath, 'wait' : True,
+                                         'options' : { 'output_format' : 'gpkg', 'overwrite' : True } })
+      self.assertEqual(Code,200)
+      self.assertEqual(Job['status'],'ok',Job['error'])
+      self.assertIsNotNone(Job['duration'])
+      self.assertTrue(os.path.isfile(os.path.join(OutputPath,'outputs.gpkg')))
+
+    Code,Found = self._request("/jobs/{}".format(Job['id']))
+    self.assertEqual(Found['status'],'ok')
+
+    Code,Job = self._request("/jobs",{ 'input' : InputPath+"-missing", 'output' : OutputPath+"-missing" })
+    Code,Job = self._request("/jobs/{}?wait".format(Job['id']))
+    self.assertEqual(Job['status'],'failed')
+
+    Code,Jobs = self._request("/jobs")
+    self.assertEqual(len([Job for Job in Jobs if Job['output'] in [OutputPath,OutputPath+"-missing"]]),3)
+
+
+  ######################################################
+
+
+  def testBrokenWorker(self):
+    InputPath = os.path.join(os.path.dirname(os.path.realpath(__file__)),'datasets','zone0')
+    OutputPath = os.path.join(self.OutputRoot,'zone0-server-restarted')
+
+    # a worker process killed while running breaks the pool, which is replaced for the next jobs
+    Killed = self.Jobs._Executor.submit(os._exit,1)
+    self.assertRaises(concurrent.futures.BrokenExecutor,Killed.result)
+
+    Code,Job = self._request("/jobs",{ 'input' : InputPath, 'output' : OutputPath, 'wait' : True,
+                                       'options' : { 'overwrite' : True } })
+    self.assertEqual(Code,200)
+    self.assertEqual(Job['status'],'ok',Job['error'])
+
+
+  ######################################################
+
+
+  def testInvalidRequests(self):
+    self.assertEqual(self._request("/jobs",{ 'input' : "in", 'output' : "out", 'options' : { 'unknown' : 1 } })[0],400)
+    self.assertEqual(self._request("/jobs",{ 'input' : "in" })[0],400)
+    self.assertEqual(self._request("/jobs/999")[0],404)
+    self.assertEqual(self._request("/health")[1]['workers'],2)
+
+
+  ######################################################
+
+
+  def testRejectedRequests(self):
+    InputPath = os.path.join(os.path.dirname(os.path.realpath(__file__)),'datasets','zone0')
+
+    # outputs outside the output root, or replacing a directory which is not an output directory
+    Code,Error = self._request("/jobs",{ 'input' : InputPath, 'output' : os.path.join(self.OutputRoot,'..','zone0-outside') })
+    self.assertEqual(Code,400)
+    self.assertIn("output root",Error['error'])
+    self.assertEqual(self._request("/jobs",{ 'input' : InputPath, 'output' : self.OutputRoot })[0],400)
+    self.assertEqual(self._request("/jobs",{ 'input' : InputPath, 'output' : os.path.dirname(InputPath),
+                                             'options' : { 'overwrite' : True } })[0],400)
+
+    NotOutputPath = os.path.join(self.OutputRoot,'zone0-not-output')
+    os.makedirs(NotOutputPath,exist_ok=True)
+    with open(os.path.join(NotOutputPath,'notes.txt'),'w') as File:
+      File.write("not an output")
+    self.assertEqual(self._request("/jobs",{ 'input' : InputPath, 'output' : NotOutputPath,
+                                             'options' : { 'overwrite' : True } })[0],400)
+    self.assertTrue(os.path.isfile(os.path.join(NotOutputPath,'notes.txt')))
+
+    # requests from web pages
+    OutputPath = os.path.join(self.OutputRoot,'zone0-rejected')
+    self.assertEqual(self._request("/jobs",{ 'input' : InputPath, 'output' : OutputPath },{ 'Content-Type' : "text/plain" })[0],415)
+    self.assertEqual(self._request("/jobs",{ 'input' : InputPath, 'output' : OutputPath },
+                                   { 'Content-Type' : "application/json", 'Origin' : "http://example.com" })[0],403)
+    self.assertEqual(self._request("/health",None,{ 'Host' : "example.com" })[0],403)
+    self.assertEqual(len([Job for Job in self._request("/jobs")[1] if Job['output'] == OutputPath]),0)
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
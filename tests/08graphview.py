@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+__author__  = "Jean-Christophe Fabre"
+__email__   = "jean-christophe.fabre@inra.fr"
+__license__ = "see LICENSE file"
+
+
+import os
+import tempfile
+import unittest
+
+import networkx
+
+from boogiescape import GraphView
+
+
+######################################################
+######################################################
+
+
+class MainTest(unittest.TestCase):
+
+  @staticmethod
+  def _makeGraph():
+    G = networkx.DiGraph([("SU#1","SU#2"),("SU#2","RS#1"),("RE#1","RS#1")])
+    G.add_node("SU#3",data=object())
+    return G
+
+
+  ######################################################
+
+
+  def testDOT(self):
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"graph.dot")
+      GraphView.exportDOT(self._makeGraph(),FilePath)
+      with open(FilePath) as File:
+        Content = File.read()
+
+    self.assertTrue(Content.startswith("digraph units {\n"))
+    self.assertIn('  "SU#3" [class="SU"];\n',Content)
+    self.assertIn('  "SU#2" -> "RS#1";\n',Content)
+    self.assertEqual(Content.count("->"),3)
+
+
+  ######################################################
+
+
+  def testGraphML(self):
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"graph.graphml")
+      GraphView.exportGraphML(self._makeGraph(),FilePath)
+      G = networkx.read_graphml(FilePath)
+
+    self.assertEqual(set(G.nodes),{"SU#1","SU#2","SU#3","RS#1","RE#1"})
+    self.assertEqual(set(G.edges),{("SU#1","SU#2"),("SU#2","RS#1"),("RE#1","RS#1")})
+    self.assertEqual(G.nodes["RE#1"]["class"],"RE")
+
+
+  ######################################################
+
+
+  def testEdgeList(self):
+    with tempfile.TemporaryDirectory() as TmpDir:
+      FilePath = os.path.join(TmpDir,"graph.edges")
+      GraphView.exportEdgeList(self._makeGraph(),FilePath)
+      with open(FilePath) as File:
+        self.assertEqual(File.read().splitlines(),["SU#1 SU#2","SU#2 RS#1","RE#1 RS#1"])
+
+
+  ######################################################
+
+
+  def testSubgraphsCap(self):
+    # subgraphs above the cap are skipped without rendering
+    Rendered,Skipped = GraphView.renderSubgraphs([("GU_1",["SU#1","RS#1"],[("SU#1","RS#1")]),
+                                                  ("GU_2",["SU#2","SU#3","RS#2"],[])],"unused",2,MaxNodes=1)
+    self.assertEqual(Rendered,[])
+    self.assertEqual(Skipped,["GU_1","GU_2"])
+
+
+######################################################
+######################################################
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -5,10 +5,39 @@ __email__   = "jean-christophe.fabre@inra.fr"
 __license__ = "see LICENSE file"
 
 
+import filecmp
+import json
 import os
+import random
+import shutil
+import time
+import tracemalloc
 import unittest
+import unittest.mock
 
+from osgeo import gdal, ogr
+
+from boogiescape import Batch
 from boogiescape import BoogieScape
+from boogiescape import Data
+from boogiescape import Geometry
+from boogiescape import Synthetic
+
+
+######################################################
+######################################################
+
+
+ProcessPartition = BoogieScape.BoogieScape._processPartition
+
+def processPartitionSlowly(*Args):
+  # partition processing recording the process and time span of each partition, next to the output directory
+  Start = time.time()
+  time.sleep(0.5)
+  Results = ProcessPartition(*Args)
+  with open(Args[1]+'.spans','a') as File:
+    File.write("{} {} {}\n".format(os.getpid(),Start,time.time()))
+  return Results
 
 
 ######################################################
@@ -37,6 +66,548 @@ class MainTest(unittest.TestCase):
     BS.run()
 
 
+  ######################################################
+
+
+  def testZone0GraphViews(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-graphviews'),
+                                 {'overwrite' : True,'export_graph_view' : True,
+                                  'graph_view_formats' : ['dot','graphml','edgelist'],
+                                  'graph_view_per_gu' : True,'graph_view_workers' : 2})
+    BS.run()
+
+    for FileName in ['GU_graph_view.dot','GU_graph_view.graphml','GU_graph_view.edges']:
+      self.assertTrue(os.path.isfile(os.path.join(self._getOutput('zone0-graphviews'),FileName)))
+    self.assertEqual(sorted(os.listdir(os.path.join(self._getOutput('zone0-graphviews'),'GU_graph_views'))),
+                     sorted("GU_{}.pdf".format(Id) for Id in BS._GUData.keys()))
+
+
+  ######################################################
+
+
+  def testZone0ParallelOutputs(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-seq'),
+                                 {'overwrite' : True,'export_graph_view' : False})
+    BS.run()
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-par'),
+                                 {'overwrite' : True,'export_graph_view' : False,'output_workers' : 4})
+    BS.run()
+
+    Files = sorted(os.listdir(self._getOutput('zone0-seq')))
+    self.assertEqual(Files,sorted(os.listdir(self._getOutput('zone0-par'))))
+    Files.remove('run_report.json')
+    Match,Mismatch,Errors = filecmp.cmpfiles(self._getOutput('zone0-seq'),self._getOutput('zone0-par'),Files,shallow=False)
+    self.assertEqual(Mismatch,[])
+    self.assertEqual(Errors,[])
+
+
+  ######################################################
+
+
+  def testZone0GUGeometryModes(self):
+    Features = dict()
+    for Mode in ['multipolygon','dissolve','none']:
+      BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-gu-'+Mode),
+                                   {'overwrite' : True,'export_graph_view' : False,'gu_geometry' : Mode})
+      BS.run()
+
+      Layer = ogr.Open(os.path.join(self._getOutput('zone0-gu-'+Mode),'GU.shp')).GetLayer(0)
+      Features[Mode] = dict()
+      for Feature in Layer:
+        Geom = Feature.GetGeometryRef()
+        Features[Mode][Feature.GetField('OFLD_ID')] = (Geom.Clone() if Geom is not None else None,
+                                                       Feature.GetField('xposition'),Feature.GetField('yposition'))
+
+    def getPartsCount(Geom):
+      # shapefiles read single part multipolygons as polygons
+      if ogr.GT_Flatten(Geom.GetGeometryType()) == ogr.wkbMultiPolygon:
+        return Geom.GetGeometryCount()
+      return 1
+
+    self.assertGreater(len(Features['multipolygon']),0)
+    for Mode in ['dissolve','none']:
+      self.assertEqual(sorted(Features[Mode].keys()),sorted(Features['multipolygon'].keys()))
+
+    for Id,(Geom,X,Y) in Features['multipolygon'].items():
+      # attributes only, positions being the centroids of the SU
+      NoneGeom,NoneX,NoneY = Features['none'][Id]
+      self.assertIsNone(NoneGeom)
+      self.assertAlmostEqual(NoneX,X,delta=1e-6*max(1,abs(X)))
+      self.assertAlmostEqual(NoneY,Y,delta=1e-6*max(1,abs(Y)))
+
+      # dissolved SU, covering the same area
+      Dissolved,DissolvedX,DissolvedY = Features['dissolve'][Id]
+      self.assertIn(ogr.GT_Flatten(Dissolved.GetGeometryType()),[ogr.wkbPolygon,ogr.wkbMultiPolygon])
+      self.assertTrue(Dissolved.IsValid())
+      self.assertAlmostEqual(Dissolved.GetArea(),Geom.GetArea(),delta=1e-6*Geom.GetArea())
+      self.assertLessEqual(getPartsCount(Dissolved),getPartsCount(Geom))
+      self.assertAlmostEqual(DissolvedX,X,delta=1e-6*max(1,abs(X)))
+      self.assertAlmostEqual(DissolvedY,Y,delta=1e-6*max(1,abs(Y)))
+
+
+  ######################################################
+
+
+  def testZone0OutputPrecision(self):
+    Options = {'overwrite' : True,'export_graph_view' : False}
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-full'),dict(Options))
+    BS.run()
+    Options.update({'coordinate_precision' : 2,'snap_grid' : 0.5,'simplify' : 1.0})
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-reduced'),Options)
+    BS.run()
+
+    Sizes = [os.path.getsize(os.path.join(self._getOutput(Name),'SU.geojson')) for Name in ['zone0-full','zone0-reduced']]
+    self.assertLess(Sizes[1],Sizes[0])
+    self.assertTrue(filecmp.cmp(os.path.join(self._getOutput('zone0-full'),'domain.fluidx'),
+                                os.path.join(self._getOutput('zone0-reduced'),'domain.fluidx'),shallow=False))
+
+    Layer = ogr.Open(os.path.join(self._getOutput('zone0-reduced'),'SU.shp')).GetLayer(0)
+    for Feature in Layer:
+      for X,Y in Feature.GetGeometryRef().GetGeometryRef(0).GetPoints():
+        self.assertAlmostEqual(X*2,round(X*2),6)
+        self.assertAlmostEqual(Y*2,round(Y*2),6)
+
+
+  ######################################################
+
+
+  def testSnapToGridFallback(self):
+    # rounding of the coordinates without the GEOS precision reducer (GDAL < 3.9)
+    Rand = random.Random(0)
+    Line = ogr.Geometry(ogr.wkbLineString)
+    for i in range(200):
+      Line.AddPoint_2D(Rand.uniform(0,100000),Rand.uniform(0,100000))
+
+    with unittest.mock.patch.object(Geometry,'UsePrecisionReducer',False):
+      for GridSize,Digits in [(0.1,1),(0.01,2),(0.5,1),(5.0,0)]:
+        Snapped = Geometry.snapToGrid(Line,GridSize)
+        for Point in Snapped.GetPoints():
+          for Coord in Point:
+            self.assertEqual(Coord,round(Coord,Digits))
+            self.assertLessEqual(len(repr(Coord).partition('.')[2]),max(1,Digits))
+            self.assertAlmostEqual(Coord/GridSize,round(Coord/GridSize),6)
+
+    self.assertEqual(Geometry.roundToGrid(123.46,0.1),123.5)
+
+
+  ######################################################
+
+
+  def testZone0GUWorkers(self):
+    Options = {'overwrite' : True,'export_graph_view' : False}
+    for OutputName,Workers in [('zone0-gu-serial',1),('zone0-gu-parallel',2)]:
+      Options['gu_workers'] = Workers
+      BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput(OutputName),dict(Options))
+      BS.run()
+
+    for FileName in ['domain.fluidx','GU.geojson']:
+      self.assertTrue(filecmp.cmp(os.path.join(self._getOutput('zone0-gu-serial'),FileName),
+                                  os.path.join(self._getOutput('zone0-gu-parallel'),FileName),shallow=False))
+
+
+  ######################################################
+
+
+  def testZone0OutputFormats(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-gpkg'),
+                                 {'overwrite' : True,'export_graph_view' : False,'output_format' : 'gpkg'})
+    BS.run()
+    self.assertTrue(os.path.isfile(os.path.join(self._getOutput('zone0-gpkg'),'outputs.gpkg')))
+    self.assertFalse(os.path.isfile(os.path.join(self._getOutput('zone0-gpkg'),'SU.shp')))
+
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-fgb'),
+                                 {'overwrite' : True,'export_graph_view' : False,'output_format' : 'fgb'})
+    BS.run()
+    self.assertTrue(os.path.isfile(os.path.join(self._getOutput('zone0-fgb'),'SU.fgb')))
+
+
+  ######################################################
+
+
+  def testZone0Cache(self):
+    CacheDir = self._getOutput('zone0-cache')
+    shutil.rmtree(CacheDir,ignore_errors=True)
+
+    for OutputName in ['zone0-cold','zone0-warm']:
+      BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput(OutputName),
+                                   {'overwrite' : True,'export_graph_view' : False,'cache_dir' : CacheDir})
+      BS.run()
+
+    self.assertEqual(len(os.listdir(CacheDir)),5)
+
+    # entries referencing a class that no longer exists are recomputed
+    for FileName in os.listdir(CacheDir):
+      with open(os.path.join(CacheDir,FileName),'wb') as File:
+        File.write(b"cboogiescape.RemovedModule\nRemovedClass\n.")
+
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-stale'),
+                                 {'overwrite' : True,'export_graph_view' : False,'cache_dir' : CacheDir})
+    BS.run()
+
+    Files = sorted(F for F in os.listdir(self._getOutput('zone0-cold')) if F != 'run_report.json')
+    for OutputName in ['zone0-warm','zone0-stale']:
+      Match,Mismatch,Errors = filecmp.cmpfiles(self._getOutput('zone0-cold'),self._getOutput(OutputName),Files,shallow=False)
+      self.assertEqual(Mismatch,[])
+      self.assertEqual(Errors,[])
+
+
+  ######################################################
+
+
+  def testZone0ConcurrentLoading(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-concurrent'),
+                                 {'overwrite' : True,'export_graph_view' : False,'input_workers' : 3})
+    BS.run()
+    self.assertEqual(len(BS._SUData),48)
+
+    # only RS is available: SU and RE errors are both reported
+    InputPath = self._getOutput('zone0-rs-only')
+    shutil.rmtree(InputPath,ignore_errors=True)
+    os.makedirs(InputPath)
+    for FileName in os.listdir(self._getInput('zone0')):
+      if FileName.startswith('RS.'):
+        shutil.copy(os.path.join(self._getInput('zone0'),FileName),InputPath)
+
+    BS = BoogieScape.BoogieScape(InputPath,self._getOutput('zone0-rs-only-out'),
+                                 {'overwrite' : True,'export_graph_view' : False,'input_workers' : 3})
+    with self.assertRaises(BoogieScape.BoogieScapeError) as Context:
+      BS.run()
+    self.assertIn('SU, RE',str(Context.exception))
+
+
+  ######################################################
+
+
+  def testZone0ProcessOrders(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-pcsorder'),
+                                 {'overwrite' : True,'export_graph_view' : False,'auto_pcsorder' : True})
+    BS.run()
+
+    AllData = { "AP" : BS._APData, "GU" : BS._GUData, "RE" : BS._REData, "RS" : BS._RSData, "SU" : BS._SUData }
+    for UnitsClass,UnitsData in AllData.items():
+      for Id,Unit in UnitsData.items():
+        self.assertGreaterEqual(Unit.PcsOrd,1)
+        for ToUnit in Unit.To:
+          if ToUnit[1] in AllData[ToUnit[0]]:
+            self.assertLess(Unit.PcsOrd,AllData[ToUnit[0]][ToUnit[1]].PcsOrd)
+
+
+  ######################################################
+
+
+  def testGUMultipleTargets(self):
+    # SU#1 flows to RS#1 and to SU#2, which flows to RS#2: SU#1 belongs to both GU
+    def makeUnit(Id,To,Attributes,Geometry=None):
+      Unit = Data.SpatialUnit()
+      Unit.Id = Id
+      Unit.PcsOrd = 1
+      Unit.To = To
+      Unit.Attributes = Attributes
+      Unit.Geometry = Geometry
+      return Unit
+
+    BS = BoogieScape.BoogieScape(None,None,{'export_graph_view' : False})
+    BS._RSData = { Id : makeUnit(Id,[],{ 'GUconnect' : 1 }) for Id in [1,2] }
+    BS._SUData = { 1 : makeUnit(1,[["RS",1],["SU",2]],{ 'area' : 1.0 },ogr.CreateGeometryFromWkt("POLYGON ((0 0,1 0,1 1,0 1,0 0))")),
+                   2 : makeUnit(2,[["RS",2]],{ 'area' : 1.0 },ogr.CreateGeometryFromWkt("POLYGON ((1 0,2 0,2 1,1 1,1 0))")) }
+
+    G = BS._buildUnitsGraph()
+    self.assertEqual(sorted(G.edges),[("SU#1","RS#1"),("SU#1","SU#2"),("SU#2","RS#2")])
+
+    GULinks = BS._buildGU(G)
+    self.assertEqual(len(BS._GUData),2)
+    self.assertEqual([BS._GUData[Id].Attributes['area'] for Id in [1,2]],[1.0,2.0])
+    self.assertEqual(sorted(zip(*GULinks["SU"])),[(1,1),(1,2),(2,2)])
+
+
+  ######################################################
+
+
+  def testZone0Validation(self):
+    OutputPath = self._getOutput('zone0-validation')
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),OutputPath,
+                                 {'overwrite' : True,'export_graph_view' : False,'validate_only' : True})
+    BS.run()
+
+    with open(os.path.join(OutputPath,'validation.json')) as File:
+      Report = json.load(File)
+    self.assertEqual(Report['errors'],0)
+    self.assertFalse(os.path.isfile(os.path.join(OutputPath,'domain.fluidx')))
+
+
+  ######################################################
+
+
+  def testZone0ValidationInvalidFromAP(self):
+    InputPath = self._getOutput('zone0-bad-fromap')
+    shutil.rmtree(InputPath,ignore_errors=True)
+    shutil.copytree(self._getInput('zone0'),InputPath)
+
+    Source = ogr.Open(os.path.join(InputPath,'SU.shp'),1)
+    Layer = Source.GetLayer(0)
+    Feature = Layer.GetNextFeature()
+    Feature.SetField('FROM_AP','not-an-id')
+    Layer.SetFeature(Feature)
+    Source = None
+
+    OutputPath = self._getOutput('zone0-bad-fromap-out')
+    BS = BoogieScape.BoogieScape(InputPath,OutputPath,{'overwrite' : True,'export_graph_view' : False,'validate' : True})
+    with self.assertRaises(BoogieScape.BoogieScapeError) as Context:
+      BS.run()
+    self.assertEqual(Context.exception.Code,2)
+
+    with open(os.path.join(OutputPath,'validation.json')) as File:
+      Report = json.load(File)
+    self.assertIn(('invalid-value','FROM_AP'),[(Issue['code'],Issue['field']) for Issue in Report['issues']])
+
+    # failed runs are reported too
+    with open(os.path.join(OutputPath,'run_report.json')) as File:
+      Report = json.load(File)
+    self.assertEqual(Report['status'],'failed')
+    self.assertEqual([(Stage['stage'],Stage['status']) for Stage in Report['stages']],[('prepare','ok'),('validate','failed')])
+
+
+  ######################################################
+
+
+  def testZone0Readers(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-readers'),{})
+    for FileName,Fields in [('RS.shp',BS._InputRSFields),('SU.shp',BS._InputSUFields),('RE.shp',BS._InputREFields)]:
+      Source = BoogieScape.BoogieScape._SHPDriver.Open(BS.getInputPath(FileName),0)
+      Layer = Source.GetLayer(0)
+      Batches = BoogieScape.BoogieScape._readLayerBatches(Layer,Fields)
+      if Batches is None:
+        self.skipTest("Arrow stream API not available")
+      Layer.ResetReading()
+      Features = BoogieScape.BoogieScape._readLayerFeatures(Layer,Fields)
+
+      self.assertEqual(Batches[1],Features[1])
+      for Field in Fields:
+        Values = Batches[0][Field]
+        self.assertEqual(Values.tolist() if hasattr(Values,'tolist') else Values,Features[0][Field])
+
+
+  ######################################################
+
+
+  def testZone0InMemory(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-files'),
+                                 {'overwrite' : True,'export_graph_view' : False})
+    BS.run()
+
+    # inputs given as OGR data sources and as units data, no input or output directory
+    Sources = dict()
+    MBS = BoogieScape.BoogieScape(None,None,{'export_graph_view' : False})
+    for UnitsClass in ["RS","RE"]:
+      Sources[UnitsClass] = ogr.Open(os.path.join(self._getInput('zone0'),UnitsClass+".shp"))
+      MBS.setInput(UnitsClass,Sources[UnitsClass])
+    SUData = BoogieScape.BoogieScape._loadShapefile(os.path.join(self._getInput('zone0'),"SU.shp"),MBS._InputSUFields,"SU")
+    Slopes = SUData.getValues("slope")
+    MBS.setInput("SU",SUData)
+    Units = MBS.process()
+
+    # given units data are left unchanged and can be processed again
+    self.assertEqual(SUData.getValues("slope"),Slopes)
+    self.assertTrue(all(ToUnit[0] != "GU" for Unit in SUData.values() for ToUnit in Unit.To))
+    OtherBS = BoogieScape.BoogieScape(None,None,{})
+    for UnitsClass in ["RS","RE"]:
+      OtherBS.setInput(UnitsClass,Sources[UnitsClass])
+    OtherBS.setInput("SU",SUData)
+    OtherBS.process()
+    self.assertEqual(OtherBS.getDomainFluidX(),MBS.getDomainFluidX())
+
+    self.assertRaises(BoogieScape.BoogieScapeError,BoogieScape.BoogieScape(None,None,{'export_graph_view' : True}).process)
+
+    self.assertEqual({ UnitsClass : len(UnitsData) for UnitsClass,UnitsData in Units.items() },BS._getUnitsCounts())
+    with open(os.path.join(self._getOutput('zone0-files'),'domain.fluidx')) as File:
+      self.assertEqual(MBS.getDomainFluidX(),File.read())
+    with open(os.path.join(self._getOutput('zone0-files'),'datastore.fluidx')) as File:
+      self.assertEqual(MBS.getDatastoreFluidX(),File.read())
+
+    MBS.writeOutputs('/vsimem/zone0')
+    for FileName in ['SU.shp','GU.geojson','outputs.qgs','domain.fluidx']:
+      self.assertIsNotNone(gdal.VSIStatL('/vsimem/zone0/'+FileName))
+    self.assertEqual(ogr.Open('/vsimem/zone0/GU.shp').GetLayer(0).GetFeatureCount(),len(Units["GU"]))
+    for FileName in gdal.ReadDir('/vsimem/zone0'):
+      gdal.Unlink('/vsimem/zone0/'+FileName)
+
+
+  ######################################################
+
+
+  def testZone0RunReport(self):
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-quiet'),
+                                 {'overwrite' : True,'export_graph_view' : False,'quiet' : True})
+    Events = list()
+    BS.getInstrumentation().addListener(Events.append)
+    BS.run()
+
+    Stages = [E['stage'] for E in Events if E['event'] == 'stage-done']
+    self.assertEqual(Stages,['prepare','create-AP','create-GU','cleanup','write-outputs'])
+
+    with open(os.path.join(self._getOutput('zone0-quiet'),'run_report.json')) as File:
+      Report = json.load(File)
+    self.assertEqual(Report['status'],'ok')
+    self.assertEqual([S['stage'] for S in Report['stages']],Stages)
+    self.assertEqual(Report['units']['SU'],48)
+    self.assertEqual(Report['units']['GU'],len(BS._GUData))
+    self.assertTrue(all(S['peak_python_mb'] is None for S in Report['stages']))
+
+    BS = BoogieScape.BoogieScape(self._getInput('zone0'),self._getOutput('zone0-quiet'),
+                                 {'overwrite' : True,'export_graph_view' : False,'quiet' : True,'trace_memory' : True})
+    BS.run()
+    self.assertFalse(tracemalloc.is_tracing())
+
+    with open(os.path.join(self._getOutput('zone0-quiet'),'run_report.json')) as File:
+      Report = json.load(File)
+    self.assertTrue(all(S['peak_python_mb'] > 0 for S in Report['stages']))
+
+
+  ######################################################
+
+
+  def testBatch(self):
+    Zones = Batch.findZones(os.path.join(os.path.dirname(os.path.realpath(__file__)),'datasets'))
+    self.assertEqual([Zone[0] for Zone in Zones],['zone0'])
+
+    Zones.append(('missing',self._getInput('missing'),None))
+    OutputRoot = self._getOutput('batch')
+    Results = Batch.runBatch(Zones,OutputRoot,{'overwrite' : True,'export_graph_view' : False},2)
+    Report = Batch.writeReport(Results,os.path.join(OutputRoot,'batch_report.json'))
+
+    self.assertEqual(Report['succeeded'],1)
+    self.assertEqual(Report['failed'],1)
+    self.assertEqual(Results[1]['zone'],'missing')
+    self.assertTrue(os.path.isfile(os.path.join(OutputRoot,'zone0','domain.fluidx')))
+    self.assertTrue(os.path.isfile(os.path.join(OutputRoot,'missing.log')))
+
+
+  ######################################################
+
+
+  def testBatchCrashedWorker(self):
+    # the worker process running the crash zone dies: the zones it did not start are run in a new pool
+    Run = BoogieScape.BoogieScape.run
+
+    def runOrCrash(BS):
+      if BS.getOutputPath().endswith('crash'):
+        os._exit(1)
+      Run(BS)
+
+    Zones = [('crash',self._getInput('zone0'),None),('zone0',self._getInput('zone0'),None)]
+    OutputRoot = self._getOutput('batch-crash')
+    with unittest.mock.patch.object(BoogieScape.BoogieScape,'run',runOrCrash):
+      Results = Batch.runBatch(Zones,OutputRoot,{'overwrite' : True,'export_graph_view' : False},1)
+
+    self.assertEqual([Result['status'] for Result in Results],['failed','ok'])
+    self.assertIn('BrokenProcessPool',Results[0]['error'])
+    self.assertTrue(os.path.isfile(os.path.join(OutputRoot,'zone0','domain.fluidx')))
+
+
+  ######################################################
+
+
+  def testBatchManifestNames(self):
+    # zones with the same directory name are written to distinct outputs and logs
+    ManifestPath = self._getOutput('batch-manifest.txt')
+    os.makedirs(os.path.dirname(ManifestPath),exist_ok=True)
+    with open(ManifestPath,'w') as File:
+      File.write("a/zone0\nb/zone0\nc/zone0-2\nd/zone0\n")
+
+    Zones = Batch.readManifest(ManifestPath)
+    self.assertEqual([Zone[0] for Zone in Zones],['zone0','zone0-2','zone0-2-2','zone0-3'])
+    self.assertEqual(Zones[1][1],os.path.join(os.path.dirname(ManifestPath),'b','zone0'))
+
+
+  ######################################################
+
+
+  def testSynthetic(self):
+    Synthetic.generateZone(self._getOutput('synthetic-input'),SUCount=505,GUCount=5,Depth=10,RECount=3)
+    BS = BoogieScape.BoogieScape(self._getOutput('synthetic-input'),self._getOutput('synthetic'),
+                                 {'overwrite' : True,'export_graph_view' : False})
+    BS.run()
+
+    self.assertEqual(len(BS._SUData),505)
+    self.assertEqual(len(BS._RSData),sum(Synthetic.getLayout(505,5,10)[1]))
+    self.assertEqual(len(BS._APData),3+5)
+    self.assertEqual(len(BS._GUData),5)
+
+
+  ######################################################
+
+
+  def testSyntheticPartitioned(self):
+    Synthetic.generateZone(self._getOutput('synthetic-partitioned-input'),SUCount=600,GUCount=6,Depth=10,RECount=4)
+    BS = BoogieScape.BoogieScape(self._getOutput('synthetic-partitioned-input'),self._getOutput('synthetic-whole'),
+                                 {'overwrite' : True,'export_graph_view' : False})
+    BS.run()
+
+    for Workers in [1,3]:
+      OutputPath = self._getOutput('synthetic-partitioned-{}'.format(Workers))
+      PBS = BoogieScape.BoogieScape(self._getOutput('synthetic-partitioned-input'),OutputPath,
+                                    {'overwrite' : True,'export_graph_view' : False,'partitioned' : True,
+                                     'partition_size' : 150,'partition_workers' : Workers})
+      PBS.run()
+
+      self.assertEqual(PBS._getUnitsCounts(),BS._getUnitsCounts())
+      self.assertEqual(sorted(os.listdir(OutputPath)),sorted(os.listdir(self._getOutput('synthetic-whole'))))
+      with open(os.path.join(OutputPath,'domain.fluidx')) as File:
+        Domain = File.read()
+      self.assertEqual(Domain.count('<unit class="GU"'),6)
+      self.assertEqual(Domain.count('<to class="GU"'),600+4)
+      self.assertEqual(Domain.count('<unit class="SU"'),600)
+
+    Report = json.load(open(os.path.join(OutputPath,'run_report.json')))
+    self.assertEqual([Stage['stage'] for Stage in Report['stages']],['prepare','cleanup','partition','process-partitions'])
+
+
+  ######################################################
+
+
+  def testSyntheticPartitionWorkers(self):
+    Synthetic.generateZone(self._getOutput('synthetic-partitioned-input'),SUCount=600,GUCount=6,Depth=10,RECount=4)
+    OutputPath = self._getOutput('synthetic-partitioned-parallel')
+    if os.path.exists(OutputPath+'.spans'):
+      os.remove(OutputPath+'.spans')
+
+    with unittest.mock.patch.object(BoogieScape.BoogieScape,'_processPartition',staticmethod(processPartitionSlowly)):
+      PBS = BoogieScape.BoogieScape(self._getOutput('synthetic-partitioned-input'),OutputPath,
+                                    {'overwrite' : True,'export_graph_view' : False,'partitioned' : True,
+                                     'partition_size' : 150,'partition_workers' : 3})
+      PBS.run()
+
+    with open(OutputPath+'.spans') as File:
+      Spans = sorted([float(Value) for Value in Line.split()] for Line in File)
+    self.assertEqual(len(Spans),len(PBS._Partitions))
+
+    # partitions are processed by other processes, some of them at the same time
+    Pids = set(int(Span[0]) for Span in Spans)
+    self.assertNotIn(os.getpid(),Pids)
+    self.assertGreater(len(Pids),1)
+    Spans.sort(key=lambda Span: Span[1])
+    self.assertTrue(any(Spans[i+1][1] < Spans[i][2] for i in range(len(Spans)-1)))
+
+
+  ######################################################
+
+
+  def testSyntheticConnectivity(self):
+    Synthetic.generateZone(self._getOutput('synthetic-linked'),SUCount=300,GUCount=3,Depth=5)
+    Synthetic.generateZone(self._getOutput('synthetic-unlinked'),SUCount=300,GUCount=3,Depth=5,SULinks=False)
+
+    BS = BoogieScape.BoogieScape(self._getOutput('synthetic-linked'),self._getOutput('synthetic-linked-out'),
+                                 {'overwrite' : True,'export_graph_view' : False})
+    BS.run()
+    Expected = { Id : [list(Link) for Link in Unit.To] for Id,Unit in BS._SUData.items() }
+
+    for Mode in ['nearest','boundary']:
+      BS = BoogieScape.BoogieScape(self._getOutput('synthetic-unlinked'),self._getOutput('synthetic-'+Mode),
+                                   {'overwrite' : True,'export_graph_view' : False,'derive_connectivity' : Mode})
+      BS.run()
+      self.assertEqual({ Id : [list(Link) for Link in Unit.To] for Id,Unit in BS._SUData.items() },Expected)
+
+
 ######################################################
 ######################################################
 